@@ -1,62 +1,149 @@
+import asyncio
+import contextlib
+import contextvars
+import hashlib
+import json
 import os
+import queue
 import re
+import threading
+import time
+import weakref
 from dotenv import load_dotenv
-from groq import Groq
+from groq import AsyncGroq
+from cache import get_plan_store, response_cache, response_cache_key
+from models import model_for, model_stats, route, task_deadline
+from ratelimit import get_limiter
+from resilience import hedge_delay, hedged, retry_delay
+from telemetry import metrics, record_llm_call, span, usage_tokens
+from transport import async_client
+from plan import ROLE_DEPENDENT_SECTIONS, SECTION_TITLES, AccountPlan, order_titles, parse_sections
+from router import ROUTER, USER_CONTEXTS
+from retrieval import EVIDENCE_TOKEN_BUDGET, estimate_tokens, format_evidence, pack_evidence_by_section, render_evidence
+from search import search_company, search_news
+from singleflight import SINGLE_FLIGHT_ENABLED, AsyncSingleFlight
+from utils import clean_text, format_age
 
 load_dotenv()
 API_KEY = os.getenv("GROQ_API_KEY")
 MOCK = not API_KEY
+# Model full plans are routed to first (see models.py for per-task routing)
+MODEL = model_for("plan")
 
-if not MOCK:
-    client = Groq(api_key=API_KEY)
+# "single" = one completion for the whole plan, "parallel" = one completion per section
+PLAN_ENGINE = os.getenv("PLAN_ENGINE", "single")
+PLAN_MAX_WORKERS = int(os.getenv("PLAN_MAX_WORKERS", "6"))
+
+# Ground plans in SerpAPI results when a key is configured
+GROUNDED_GENERATION = os.getenv("GROUNDED_GENERATION", "1") != "0"
+
+# Also answer a role switch with a short role-specific summary of the plan (one extra completion)
+ROLE_SWITCH_SUMMARY = os.getenv("ROLE_SWITCH_SUMMARY", "0") != "0"
+
+# Optional endpoint override (e.g. a local stand-in server for benchmarks)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
 
 # ------------------------------------------------------
-# Section Titles (fixed sequence)
+# Context-specific instructions
 # ------------------------------------------------------
-SECTION_TITLES = [
-    "Company Overview",
-    "Recent News",
-    "Products / Services",
-    "Competitors",
-    "Key Opportunities / Signals",
-    "Suggested Next Steps",
-]
+CONTEXT_INSTRUCTIONS = {
+    "sales": "Focus on: pain points, decision makers, buying signals, competitive advantages, pricing intel, sales opportunities",
+    "student": "Focus on: company culture, tech stack used, hiring process, growth opportunities, employee reviews, skills needed",
+    "investor": "Focus on: financials, market position, growth metrics, risks, competitive moat, revenue streams",
+    "partner": "Focus on: integration possibilities, partnership opportunities, procurement process, collaboration areas",
+    "competitor": "Focus on: competitive analysis, market positioning, strengths/weaknesses, differentiation",
+    "recruiter": "Focus on: company culture, team structure, hiring patterns, employee retention, benefits",
+    "general": "Provide a comprehensive overview suitable for general business intelligence"
+}
 
 # ------------------------------------------------------
 # User Context Detection
 # ------------------------------------------------------
-USER_CONTEXTS = {
-    "sales": ["sales", "account executive", "business development", "selling", "sales rep", "account manager", "bdm"],
-    "student": ["student", "placement", "interview", "campus", "college", "intern", "graduate", "university"],
-    "investor": ["investor", "investment", "funding", "portfolio", "venture", "equity"],
-    "partner": ["partner", "vendor", "integration", "collaborate", "partnership"],
-    "competitor": ["competitor", "competitive", "versus", "vs", "competing"],
-    "recruiter": ["recruiter", "recruiting", "hiring", "hr", "talent"],
-}
-
-
 def detect_user_context(text: str):
     """Detect user role/context from their message"""
-    text_lower = text.lower()
-    
-    for context, keywords in USER_CONTEXTS.items():
-        if any(kw in text_lower for kw in keywords):
-            return context
-    
-    return "general"
+    return ROUTER.detect_context(text)
 
 
 # ------------------------------------------------------
 # Utility: Split HTML plan into sections
 # ------------------------------------------------------
 def split_into_sections(plan_text: str):
-    sections = {}
+    return parse_sections(str(plan_text))
+
+
+# ------------------------------------------------------
+# Utility: Assemble sections back into plan HTML
+# ------------------------------------------------------
+def assemble_plan(sections: dict) -> str:
+    """Join section bodies in canonical SECTION_TITLES order (inverse of split_into_sections)."""
+    rebuilt = ""
     for title in SECTION_TITLES:
-        pattern = rf"<div class='section-title'>{title}</div>(.*?)(?=<div class='section-title'>|$)"
-        match = re.search(pattern, plan_text, re.S)
-        if match:
-            sections[title] = match.group(1).strip()
-    return sections
+        rebuilt += f"<div class='section-title'>{title}</div>\n"
+        rebuilt += sections.get(title, "") + "\n\n"
+    return rebuilt
+
+
+# ------------------------------------------------------
+# Utility: Incrementally split a streamed plan into sections
+# ------------------------------------------------------
+SECTION_MARKER = "<div class='section-title'>"
+
+
+def _parse_section_block(block: str):
+    """Split "<div class='section-title'>Title</div>body" into (title, body)."""
+    title, _, body = block[len(SECTION_MARKER):].partition("</div>")
+    return title.strip(), body.strip()
+
+
+class SectionSplitter:
+    """
+    Incremental plan parser: feed() streamed text chunks and get back the
+    (title, body_html) pairs completed so far, i.e. those whose next section
+    heading has started; finish() flushes the last one when the stream ends.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.scan_from = 0
+
+    def feed(self, chunk: str):
+        self.buffer += chunk
+        done = []
+        while True:
+            start = self.buffer.find(SECTION_MARKER)
+            if start == -1:
+                break
+            nxt = self.buffer.find(SECTION_MARKER, max(start + len(SECTION_MARKER), self.scan_from))
+            if nxt == -1:
+                # Re-scan only the tail next time; a marker may be split across chunks
+                self.scan_from = max(0, len(self.buffer) - len(SECTION_MARKER))
+                break
+            done.append(_parse_section_block(self.buffer[start:nxt]))
+            self.buffer = self.buffer[nxt:]
+            self.scan_from = 0
+        return done
+
+    def finish(self):
+        start = self.buffer.find(SECTION_MARKER)
+        return [_parse_section_block(self.buffer[start:])] if start != -1 else []
+
+
+def iter_plan_sections(chunks):
+    """Yield (title, body_html) from an iterable of streamed chunks as each section completes."""
+    splitter = SectionSplitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    yield from splitter.finish()
+
+
+async def aiter_plan_sections(chunks):
+    """Async-iterable counterpart of iter_plan_sections."""
+    splitter = SectionSplitter()
+    async for chunk in chunks:
+        for section in splitter.feed(chunk):
+            yield section
+    for section in splitter.finish():
+        yield section
 
 
 # ------------------------------------------------------
@@ -64,6 +151,11 @@ def split_into_sections(plan_text: str):
 # ------------------------------------------------------
 def markdown_to_html(text: str) -> str:
     """Convert markdown formatting to HTML"""
+    with span("markdown_to_html"):
+        return _markdown_to_html(text)
+
+
+def _markdown_to_html(text: str) -> str:
     # Convert **bold** to <strong>
     text = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', text)
     
@@ -82,13 +174,344 @@ def markdown_to_html(text: str) -> str:
     return text
 
 
+# ------------------------------------------------------
+# LLM: Async Groq client (one per event loop)
+# ------------------------------------------------------
+_clients = weakref.WeakKeyDictionary()
+
+
+def _groq():
+    """
+    AsyncGroq bound to the running loop, on the loop's shared keep-alive pool
+    (transport.async_client); async connection pools must not cross loops.
+
+    The SDK's own retries are off: _complete retries within the call's deadline.
+    """
+    loop = asyncio.get_running_loop()
+    groq_client = _clients.get(loop)
+    if groq_client is None:
+        groq_client = _clients[loop] = AsyncGroq(api_key=API_KEY, base_url=GROQ_BASE_URL, max_retries=0,
+                                                 http_client=async_client("groq"))
+    return groq_client
+
+
+# ------------------------------------------------------
+# LLM: Single completion call (routed by task, with optional response cache)
+# ------------------------------------------------------
+def _record(model: str, task: str, duration: float, status: str = "ok", **kwargs):
+    record_llm_call(model, duration, status=status, task=task, **kwargs)
+    if not kwargs.get("cached"):
+        model_stats.record(model, duration, status, task)
+
+
+def _fallback(task: str, model: str, next_model: str, error: BaseException):
+    reason = f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+    print(f"{model} failed for '{task}' ({reason}); falling back to {next_model}")
+    metrics.inc("llm_fallbacks_total", task=task, model=model)
+
+
+async def _complete(prompt: str, max_tokens: int, cacheable: bool = False, force_refresh: bool = False,
+                    task: str = "plan") -> str:
+    """
+    Run one chat completion for `task` and return the stripped text.
+
+    The task picks the model (models.route) and a deadline (models.task_deadline)
+    that bounds the whole call. Rate limits, server and connection errors are
+    retried with jittered backoff, an attempt slower than the model's recent p95
+    for this task is hedged with a duplicate request, and on a timeout or
+    exhausted retries the call moves to the fallback model; past the deadline it
+    raises TimeoutError.
+    When `cacheable` is set, identical (model, max_tokens, prompt) calls are
+    served from the in-process response cache; `force_refresh` skips the lookup
+    but still stores the fresh answer. Only answers from the task's own model
+    are cached.
+    """
+    attempts = route(task)
+    key = response_cache_key(attempts[0][0], prompt, max_tokens) if cacheable else None
+    if key and not force_refresh:
+        start = time.perf_counter()
+        cached = response_cache.get(key)
+        if cached is not None:
+            _record(attempts[0][0], task, time.perf_counter() - start, cached=True)
+            return cached
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + task_deadline(task)
+    for i, (model, timeout) in enumerate(attempts):
+        try:
+            content = await _complete_with_retries(model, prompt, max_tokens, task, timeout, deadline)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if i == len(attempts) - 1 or loop.time() >= deadline:
+                raise
+            _fallback(task, model, attempts[i + 1][0], e)
+            continue
+        if key and i == 0:
+            response_cache.set(key, content)
+        return content
+
+
+def _time_left(task: str, deadline: float) -> float:
+    """Seconds until `deadline` (loop time); TimeoutError once it has passed."""
+    remaining = deadline - asyncio.get_running_loop().time()
+    if remaining <= 0:
+        raise asyncio.TimeoutError(f"'{task}' call passed its {task_deadline(task):g}s deadline")
+    return remaining
+
+
+async def _retry_pause(model: str, task: str, error: Exception, retry: int, deadline: float) -> bool:
+    """Sleep before retrying `error` on `model`; False if it is not retryable or the wait would pass the deadline."""
+    delay = retry_delay(error, retry)
+    if delay is None or asyncio.get_running_loop().time() + delay >= deadline:
+        return False
+    metrics.inc("llm_retries_total", task=task, model=model)
+    await asyncio.sleep(delay)
+    return True
+
+
+async def _complete_with_retries(model: str, prompt: str, max_tokens: int, task: str, timeout: float,
+                                 deadline: float) -> str:
+    """_complete_once on `model`, hedged and retried until it succeeds, gives up, or `deadline` passes."""
+    loop = asyncio.get_running_loop()
+
+    def attempt():
+        return _complete_once(model, prompt, max_tokens, task, min(timeout, max(0.0, deadline - loop.time())))
+
+    retry = 0
+    while True:
+        _time_left(task, deadline)
+        try:
+            # A hedge that would queue behind its own primary in the limiter only adds load
+            return await hedged(attempt, hedge_delay(model, task), name=model,
+                                can_hedge=get_limiter("groq", model).has_capacity)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not await _retry_pause(model, task, e, retry, deadline):
+                raise
+        retry += 1
+
+
+async def _complete_once(model: str, prompt: str, max_tokens: int, task: str, timeout: float = None) -> str:
+    """One completion on `model`; `timeout` covers rate-limit queueing and the request."""
+    start = time.perf_counter()
+    try:
+        async with get_limiter("groq", model).slot_async(timeout):
+            sent = time.perf_counter()
+            # Timed out inside the slot, so the limiter sees a timeout (and backs off), not a cancellation
+            resp = await asyncio.wait_for(
+                _groq().chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=max_tokens,
+                ),
+                None if timeout is None else max(0.0, timeout - (sent - start)),
+            )
+    except asyncio.CancelledError:
+        _record(model, task, time.perf_counter() - start, status="cancelled")
+        raise
+    except asyncio.TimeoutError:
+        _record(model, task, time.perf_counter() - start, status="timeout")
+        raise
+    except Exception:
+        _record(model, task, time.perf_counter() - start, status="error")
+        raise
+    content = resp.choices[0].message.content.strip()
+    done = time.perf_counter()
+    prompt_tokens, completion_tokens = usage_tokens(getattr(resp, "usage", None))
+    # Non-streamed: the first token arrives with the whole response
+    _record(model, task, done - start, ttft=done - sent, prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens, queued_ms=round((sent - start) * 1000, 3))
+    return content
+
+
+async def _complete_stream(prompt: str, max_tokens: int, cacheable: bool = False, force_refresh: bool = False,
+                           task: str = "plan"):
+    """
+    Streaming variant of _complete: yields text chunks as Groq produces them.
+
+    Retries and falls back only if the stream fails or times out before its first
+    chunk; once text has been yielded a failure is raised to the caller. Streams
+    are not hedged. The task deadline also bounds the rest of the stream.
+    """
+    attempts = route(task)
+    key = response_cache_key(attempts[0][0], prompt, max_tokens) if cacheable else None
+    if key and not force_refresh:
+        start = time.perf_counter()
+        cached = response_cache.get(key)
+        if cached is not None:
+            _record(attempts[0][0], task, time.perf_counter() - start, stream=True, cached=True)
+            yield cached
+            return
+
+    deadline = asyncio.get_running_loop().time() + task_deadline(task)
+    for i, (model, timeout) in enumerate(attempts):
+        retry = 0
+        while True:
+            stream = _stream_once(model, prompt, max_tokens, task, min(timeout, _time_left(task, deadline)))
+            try:
+                try:
+                    first = await anext(stream)
+                except StopAsyncIteration:
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if await _retry_pause(model, task, e, retry, deadline):
+                        retry += 1
+                        continue
+                    if i == len(attempts) - 1 or asyncio.get_running_loop().time() >= deadline:
+                        raise
+                    _fallback(task, model, attempts[i + 1][0], e)
+                    break
+
+                parts = [first]
+                yield first
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(anext(stream), _time_left(task, deadline))
+                    except StopAsyncIteration:
+                        break
+                    parts.append(chunk)
+                    yield chunk
+                if key and i == 0:
+                    response_cache.set(key, "".join(parts).strip())
+                return
+            finally:
+                await stream.aclose()
+
+
+async def _stream_once(model: str, prompt: str, max_tokens: int, task: str, timeout: float = None):
+    """One streamed completion on `model`; `timeout` covers queueing and the wait for the first chunk."""
+    start = time.perf_counter()
+    state = {"sent": None, "first": None, "usage": None}
+    status = "error"
+
+    async def deltas(stream):
+        async for chunk in stream:
+            # Groq reports usage on the final chunk under x_groq
+            state["usage"] = (getattr(getattr(chunk, "x_groq", None), "usage", None)
+                              or getattr(chunk, "usage", None) or state["usage"])
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if state["first"] is None:
+                    state["first"] = time.perf_counter()
+                yield delta
+
+    # Recorded by hand rather than with span(): a generator may be finished from another context
+    try:
+        async with contextlib.AsyncExitStack() as stack:
+            async def open_stream():
+                # The slot is held until the stream is fully consumed
+                await stack.enter_async_context(get_limiter("groq", model).slot_async())
+                state["sent"] = time.perf_counter()
+                stream = await _groq().chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=max_tokens,
+                    stream=True,
+                )
+                # Drop the HTTP response when the consumer stops early or is cancelled
+                stack.push_async_callback(stream.close)
+                chunks = deltas(stream)
+                stack.push_async_callback(chunks.aclose)
+                return chunks, await anext(chunks, None)
+
+            try:
+                chunks, first = await asyncio.wait_for(open_stream(), timeout)
+            except asyncio.TimeoutError:
+                status = "timeout"
+                raise
+            if first is not None:
+                yield first
+                async for delta in chunks:
+                    yield delta
+        status = "ok"
+    except (asyncio.CancelledError, GeneratorExit):
+        status = "cancelled"
+        raise
+    finally:
+        sent, first = state["sent"], state["first"]
+        prompt_tokens, completion_tokens = usage_tokens(state["usage"])
+        _record(model, task, time.perf_counter() - start, ttft=first - sent if first else None, stream=True,
+                prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, status=status)
+
+
+# ------------------------------------------------------
+# Research: Search evidence packed per section
+# ------------------------------------------------------
+def grounding_enabled() -> bool:
+    """True when plans should be grounded in search results (flag on and SerpAPI configured)."""
+    return GROUNDED_GENERATION and bool(os.getenv("SERPAPI_KEY"))
+
+
+def gather_evidence(company: str, budget_tokens: int = None):
+    """
+    Search the company and pack the most relevant snippets for each section into
+    `budget_tokens` (default EVIDENCE_TOKEN_BUDGET). Returns {} when grounding is
+    disabled or search is unavailable, so generation falls back to model knowledge.
+    """
+    if not grounding_enabled():
+        return {}
+    try:
+        items = search_company(company)
+    except Exception as e:
+        print(f"Search for {company} failed, generating without evidence: {e}")
+        return {}
+    with span("evidence_pack", items=len(items)):
+        return pack_evidence_by_section(items, budget_tokens if budget_tokens is not None else EVIDENCE_TOKEN_BUDGET)
+
+
+def _evidence_prompt_block(evidence_text: str) -> str:
+    if not evidence_text:
+        return ""
+    return f"""
+RESEARCH EVIDENCE (recent web search results; prefer these facts over prior knowledge):
+{evidence_text}
+"""
+
+
 # ------------------------------------------------------
 # LLM: Generate Full Account Plan
 # ------------------------------------------------------
-def generate_plan(company: str, user_context: str = "general"):
+plan_flights = AsyncSingleFlight("plan")
+
+
+def _plan_flight_key(company: str, user_context: str, force_refresh: bool, evidence: dict):
+    """Requests with the same key would produce the same plan, so they can share one generation."""
+    evidence_key = None
+    if evidence is not None:
+        evidence_key = hashlib.sha256(json.dumps(evidence, sort_keys=True).encode("utf-8")).hexdigest()
+    return (clean_text(company).lower(), user_context, MODEL, PLAN_ENGINE, force_refresh, evidence_key)
 
+
+async def generate_plan_async(company: str, user_context: str = "general", force_refresh: bool = False,
+                              on_section=None, evidence: dict = None):
+    """
+    Generate the full account plan HTML.
+
+    If `on_section(title, body_html)` is given, the callback fires as soon as each
+    section is complete; the full plan is still returned.
+    `evidence` ({section: [items]}) defaults to gather_evidence(company).
+
+    Identical concurrent requests (same normalized company, context and model) share
+    one generation: late callers get the sections finished so far replayed, then the
+    rest live. Cancelling one caller leaves the shared generation running for the others.
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return await _generate_plan(company, user_context, force_refresh, on_section, evidence)
+    # The shared run always streams, so callers that want sections get them whoever started it
+    return await plan_flights.do(
+        _plan_flight_key(company, user_context, force_refresh, evidence),
+        lambda emit: _generate_plan(company, user_context, force_refresh, emit, evidence),
+        on_event=on_section,
+    )
+
+
+async def _generate_plan(company: str, user_context: str, force_refresh: bool, on_section, evidence: dict):
     if MOCK:
-        return f"""
+        plan = f"""
 <div class='section-title'>Company Overview</div>
 Mock overview for {company} ({user_context} focused).
 
@@ -107,23 +530,24 @@ Mock opportunities for {user_context}.
 <div class='section-title'>Suggested Next Steps</div>
 Mock strategic actions for {user_context}.
 """.strip()
+        if on_section:
+            for title, body in split_into_sections(plan).items():
+                on_section(title, body)
+        return plan
 
-    # Context-specific instructions
-    context_instructions = {
-        "sales": "Focus on: pain points, decision makers, buying signals, competitive advantages, pricing intel, sales opportunities",
-        "student": "Focus on: company culture, tech stack used, hiring process, growth opportunities, employee reviews, skills needed",
-        "investor": "Focus on: financials, market position, growth metrics, risks, competitive moat, revenue streams",
-        "partner": "Focus on: integration possibilities, partnership opportunities, procurement process, collaboration areas",
-        "competitor": "Focus on: competitive analysis, market positioning, strengths/weaknesses, differentiation",
-        "recruiter": "Focus on: company culture, team structure, hiring patterns, employee retention, benefits",
-        "general": "Provide a comprehensive overview suitable for general business intelligence"
-    }
+    if evidence is None:
+        # SerpAPI's client is blocking; keep it off the event loop
+        evidence = await asyncio.to_thread(gather_evidence, company)
+
+    if PLAN_ENGINE == "parallel":
+        return await generate_plan_parallel_async(company, user_context, force_refresh=force_refresh,
+                                                  on_section=on_section, evidence=evidence)
 
     prompt = f"""
 Generate a professional company account plan for **{company}**.
 
 USER CONTEXT: {user_context}
-FOCUS AREAS: {context_instructions.get(user_context, context_instructions["general"])}
+FOCUS AREAS: {CONTEXT_INSTRUCTIONS.get(user_context, CONTEXT_INSTRUCTIONS["general"])}
 
 Return in HTML format ONLY with the following EXACT headings:
 
@@ -141,24 +565,97 @@ Rules:
 - Use <ul> and <li> for bullet points
 - Provide concise, factual content
 - Tailor the content based on the USER CONTEXT and FOCUS AREAS provided above
-"""
+{_evidence_prompt_block(render_evidence(evidence))}"""
 
-    resp = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=1400,
-    )
+    if on_section is None:
+        content = await _complete(prompt, max_tokens=1400, cacheable=True, force_refresh=force_refresh)
+    else:
+        parts = []
+
+        async def collect(chunks):
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+
+        stream = _complete_stream(prompt, max_tokens=1400, cacheable=True, force_refresh=force_refresh)
+        try:
+            async for title, body in aiter_plan_sections(collect(stream)):
+                on_section(title, markdown_to_html(body))
+        finally:
+            await stream.aclose()
+        content = "".join(parts).strip()
 
-    content = resp.choices[0].message.content.strip()
     content = markdown_to_html(content)
     
     return content
 
 
+# ------------------------------------------------------
+# LLM: Generate Plan One Section Per Request (parallel engine)
+# ------------------------------------------------------
+async def generate_section_async(section_name: str, company: str, user_context: str = "general",
+                                 force_refresh: bool = False, evidence: list = None):
+    """Write one section of a fresh account plan with a small, section-scoped request."""
+
+    if MOCK:
+        return f"Mock {section_name.lower()} for {company} ({user_context} focused)."
+
+    prompt = f"""
+Write ONLY the '{section_name}' section of a professional company account plan for **{company}**.
+
+USER CONTEXT: {user_context}
+FOCUS AREAS: {CONTEXT_INSTRUCTIONS.get(user_context, CONTEXT_INSTRUCTIONS["general"])}
+
+Rules:
+- DO NOT return the title or section heading.
+- NO asterisks for bold, use <strong> tags instead
+- NO markdown formatting, use HTML tags only
+- Use <ul> and <li> for bullet points
+- Provide concise, factual content
+{_evidence_prompt_block(chr(10).join(format_evidence(item) for item in evidence or []))}"""
+
+    content = await _complete(prompt, max_tokens=350, cacheable=True, force_refresh=force_refresh)
+    return markdown_to_html(content)
+
+
+async def generate_plan_parallel_async(company: str, user_context: str = "general", force_refresh: bool = False,
+                                       on_section=None, max_workers: int = None, evidence: dict = None):
+    """
+    Generate every section concurrently (at most `max_workers` in flight) and assemble
+    the plan in SECTION_TITLES order, so wall-clock time tracks the slowest section.
+
+    `on_section(title, body_html)` fires in canonical order as soon as each section
+    and all sections before it are done. If one section fails or the caller is
+    cancelled, the remaining section requests are cancelled too.
+    """
+    max_workers = max_workers or PLAN_MAX_WORKERS
+    if evidence is None:
+        evidence = await asyncio.to_thread(gather_evidence, company)
+    gate = asyncio.Semaphore(max_workers)
+
+    async def bounded(title):
+        async with gate:
+            return await generate_section_async(title, company, user_context, force_refresh, evidence.get(title))
+
+    tasks = [(title, asyncio.ensure_future(bounded(title))) for title in SECTION_TITLES]
+    sections = {}
+    try:
+        for title, task in tasks:
+            sections[title] = await task
+            if on_section:
+                on_section(title, sections[title])
+    finally:
+        for _, task in tasks:
+            task.cancel()
+
+    return assemble_plan(sections).strip()
+
+
 # ------------------------------------------------------
 # LLM: Regenerate Specific Section
 # ------------------------------------------------------
-def regenerate_section(section_name: str, company: str, user_context: str = "general"):
+async def regenerate_section_async(section_name: str, company: str, user_context: str = "general",
+                                   force_refresh: bool = False):
 
     if MOCK:
         return f"Mock regenerated content for {section_name} ({user_context} focused)."
@@ -174,13 +671,8 @@ Use <strong> tags for emphasis, NOT asterisks.
 Use <ul> and <li> for lists.
 """
 
-    resp = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=400
-    )
-
-    content = resp.choices[0].message.content.strip()
+    content = await _complete(prompt, max_tokens=400, cacheable=True, force_refresh=force_refresh,
+                              task="section")
     content = markdown_to_html(content)
     
     return content
@@ -189,17 +681,19 @@ Use <ul> and <li> for lists.
 # ------------------------------------------------------
 # LLM: Answer Follow-up Questions
 # ------------------------------------------------------
-def answer_followup_question(question: str, current_plan: str, user_context: str):
+async def answer_followup_question_async(question: str, current_plan, user_context: str):
     """Answer specific questions about the generated plan"""
     
     if MOCK:
         return f"Mock answer to your question (from {user_context} perspective)."
     
-    sections = split_into_sections(current_plan)
-    context_text = "\n".join([f"{k}: {v}" for k, v in sections.items()])
+    # Only the plan sentences relevant to the question, within FOLLOWUP_TOKEN_BUDGET
+    with span("followup_context") as stage:
+        context_text = AccountPlan.coerce(current_plan).relevant_context(question)
+        stage.set(context_tokens=estimate_tokens(context_text))
     
     prompt = f"""
-Based on this account plan:
+Based on this account plan (excerpts relevant to the question):
 {context_text}
 
 User context: {user_context}
@@ -210,19 +704,13 @@ If asking about opportunities, tech stack, or specific insights, extract from re
 Tailor your response to be relevant for someone in the {user_context} role.
 """
     
-    resp = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=300
-    )
-    
-    return resp.choices[0].message.content.strip()
+    return await _complete(prompt, max_tokens=300, task="followup")
 
 
 # ------------------------------------------------------
 # LLM: Provide Context-Specific Summary
 # ------------------------------------------------------
-def provide_context_specific_summary(current_plan: str, new_context: str):
+async def provide_context_specific_summary_async(current_plan, new_context: str):
     """
     Provide a context-specific summary without full regeneration.
     More efficient for quick context switches.
@@ -231,8 +719,7 @@ def provide_context_specific_summary(current_plan: str, new_context: str):
     if MOCK:
         return f"Mock {new_context}-specific insights from the plan."
     
-    sections = split_into_sections(current_plan)
-    context_text = "\n".join([f"{k}: {v}" for k, v in sections.items()])
+    context_text = AccountPlan.coerce(current_plan).context_text()
     
     context_focus = {
         "sales": "Highlight: competitive advantages, decision makers, pain points, pricing strategies, and sales opportunities",
@@ -253,203 +740,497 @@ The user is a {new_context}.
 Provide a brief, focused summary (3-4 key points) explaining how this information is specifically relevant and actionable for them.
 """
     
-    resp = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=400
-    )
-    
-    return resp.choices[0].message.content.strip()
+    return await _complete(prompt, max_tokens=400, task="summary")
+
+
+# ------------------------------------------------------
+# Utility: Company a plan was written for
+# ------------------------------------------------------
+def _plan_company(plan: AccountPlan, default: str) -> str:
+    """Use the stored company name, else guess it from the overview's first capitalized word."""
+    if plan.company:
+        return plan.company
+    overview = plan.get("Company Overview")
+    if overview:
+        match_company = re.search(r"\b([A-Z][A-Za-z0-9]+)\b", overview)
+        if match_company:
+            return match_company.group(1)
+    return default
+
+
+# ------------------------------------------------------
+# Plan edit: Regenerate one section in place
+# ------------------------------------------------------
+async def refresh_section_async(plan: AccountPlan, section_name: str, user_context: str = None) -> AccountPlan:
+    """
+    Regenerate one section of `plan` in place and return the plan.
+
+    Recent News is refreshed incrementally (refresh_news_async) when search is available.
+    """
+    if section_name == "Recent News" and grounding_enabled():
+        await refresh_news_async(plan, user_context)
+        return plan
+
+    company_guess = _plan_company(plan, "the company")
+    # An explicit edit request must never be answered with the cached text
+    new_section_text = await regenerate_section_async(section_name, company_guess, user_context or "general",
+                                                      force_refresh=True)
+
+    # Only the edited section is re-rendered; the rest reuse cached fragments
+    plan.update_section(section_name, new_section_text)
+    return plan
+
+
+# ------------------------------------------------------
+# Plan edit: Incremental Recent News refresh
+# ------------------------------------------------------
+# Seen links kept per plan (most recent last)
+NEWS_LINKS_LIMIT = int(os.getenv("NEWS_LINKS_LIMIT", "100"))
+
+
+class NewsRefreshError(Exception):
+    """The news search failed, so Recent News could not be checked for new articles."""
+
+
+def current_news_links(company: str) -> list:
+    """Links the company's news query returns right now (usually a search cache hit); [] if search fails."""
+    try:
+        return [item["link"] for item in search_news(company) if item.get("link")]
+    except Exception as e:
+        print(f"News search for {company} failed: {e}")
+        return []
+
+
+async def refresh_news_async(plan: AccountPlan, user_context: str = None) -> int:
+    """
+    Bring Recent News up to date in place and return the number of new articles.
+
+    Only the news query is re-run. Its results are diffed by link against
+    `plan.news_links`; with no new links the plan is left untouched and no LLM
+    call is made. Otherwise Recent News is rewritten from the current section
+    plus the new articles only. A plan with unknown news_links treats every
+    result as new.
+
+    Raises NewsRefreshError if the news search fails; the plan, including its
+    seen links, is then left untouched.
+    """
+    company = _plan_company(plan, "the company")
+    with span("news_refresh") as stage:
+        try:
+            items = await asyncio.to_thread(search_news, company)
+        except Exception as e:
+            print(f"News search for {company} failed, keeping Recent News: {e}")
+            metrics.inc("news_refresh_total", result="failed")
+            # Not "no new articles": the caller must be able to tell the user the refresh did not happen
+            raise NewsRefreshError(str(e) or type(e).__name__) from e
+        seen = set(plan.news_links or [])
+        fresh = [item for item in items if item.get("link") and item["link"] not in seen]
+        stage.set(results=len(items), new=len(fresh))
+        metrics.inc("news_refresh_total", result="updated" if fresh else "unchanged")
+        if not fresh:
+            return 0
+
+        body = await update_news_section_async(company, user_context or plan.user_context or "general",
+                                               plan.get("Recent News", ""), fresh)
+        plan.update_section("Recent News", body)
+        links = (plan.news_links or []) + [item["link"] for item in fresh]
+        plan.news_links = links[-NEWS_LINKS_LIMIT:]
+        return len(fresh)
+
+
+async def update_news_section_async(company: str, user_context: str, current_body: str, new_items: list):
+    """Rewrite Recent News to lead with `new_items` while keeping still-relevant existing items."""
+
+    if MOCK:
+        return f"Mock news update for {company}: {len(new_items)} new article(s)."
+
+    prompt = f"""
+Update the 'Recent News' section of the account plan for **{company}** with newly published articles.
+
+USER CONTEXT: {user_context}
+
+CURRENT SECTION:
+{current_body or "(empty)"}
+
+NEW ARTICLES:
+{chr(10).join(format_evidence(item) for item in new_items)}
+
+Rules:
+- Lead with the new developments, then keep the existing items that are still relevant
+- Keep at most 6 bullet points; drop the oldest items first
+- DO NOT return the title or section heading.
+- NO asterisks for bold, use <strong> tags instead
+- Use <ul> and <li> for bullet points
+"""
+
+    content = await _complete(prompt, max_tokens=400, cacheable=True, task="section")
+    return markdown_to_html(content)
+
+
+# ------------------------------------------------------
+# Plan edit: Re-target a plan at a new role
+# ------------------------------------------------------
+async def generate_role_section_async(section_name: str, company: str, user_context: str, plan_facts: str,
+                                      force_refresh: bool = False):
+    """Write one role-dependent section from the plan's role-independent sections."""
+
+    if MOCK:
+        return f"Mock {section_name.lower()} for {company} ({user_context} focused)."
+
+    prompt = f"""
+Write ONLY the '{section_name}' section of a professional company account plan for **{company}**.
+
+USER CONTEXT: {user_context}
+FOCUS AREAS: {CONTEXT_INSTRUCTIONS.get(user_context, CONTEXT_INSTRUCTIONS["general"])}
+
+Base it on these sections of the existing plan:
+{plan_facts}
+
+Rules:
+- DO NOT return the title or section heading.
+- NO asterisks for bold, use <strong> tags instead
+- NO markdown formatting, use HTML tags only
+- Use <ul> and <li> for bullet points
+- Provide concise, factual content
+"""
+
+    content = await _complete(prompt, max_tokens=350, cacheable=True, force_refresh=force_refresh,
+                              task="section")
+    return markdown_to_html(content)
+
+
+async def switch_plan_context_async(plan: AccountPlan, new_context: str, on_section=None, on_summary=None):
+    """
+    Re-target `plan` at `new_context` and return (new_plan, summary).
+
+    Only ROLE_DEPENDENT_SECTIONS are rewritten, concurrently and from the sections
+    that are kept, so no search and no full-plan completion is needed. Plans missing
+    every role-independent section are generated from scratch instead.
+    `on_section(title, body_html)` fires for every section in plan order: kept
+    sections immediately, rewritten ones as they finish. When ROLE_SWITCH_SUMMARY is
+    set, a short role-specific summary is started first and passed to
+    `on_summary(text)` as soon as it is ready; it is a best-effort preview, so if it
+    fails or is still running when the sections are done, `summary` is None and the
+    switch completes anyway.
+    """
+    company = _plan_company(plan, "this company")
+    kept = {title: body for title, body in plan.sections().items() if title not in ROLE_DEPENDENT_SECTIONS}
+    if not kept:
+        new_plan = AccountPlan.from_html(
+            await generate_plan_async(company, new_context, on_section=on_section), company, new_context
+        )
+        if not new_plan:
+            raise RuntimeError(f"plan generation for {company} returned no content")
+        return new_plan, None
+
+    with span("role_switch", sections=len(ROLE_DEPENDENT_SECTIONS)):
+        facts = AccountPlan(kept, company=company, user_context=new_context)
+
+        async def preview():
+            try:
+                summary = await provide_context_specific_summary_async(facts, new_context)
+                if on_summary:
+                    on_summary(summary)
+                return summary
+            except Exception as e:
+                print(f"Role-switch summary for {company} failed: {e}")
+                return None
+
+        # The fast summary starts before the heavy rewrites, so the preview arrives first
+        summary_task = asyncio.ensure_future(preview()) if ROLE_SWITCH_SUMMARY else None
+        pending = {
+            title: asyncio.ensure_future(generate_role_section_async(title, company, new_context, facts.context_text()))
+            for title in ROLE_DEPENDENT_SECTIONS
+        }
+
+        # Copy, so a cancelled switch leaves the caller's plan untouched; kept sections keep their versions
+        new_plan = AccountPlan.from_dict(plan.to_dict())
+        new_plan.company = company
+        new_plan.user_context = new_context
+        try:
+            for title in order_titles(list(new_plan.sections()) + ROLE_DEPENDENT_SECTIONS):
+                if title in pending:
+                    new_plan.update_section(title, await pending[title])
+                if on_section and title in new_plan:
+                    on_section(title, new_plan.get(title))
+        finally:
+            for task in pending.values():
+                task.cancel()
+            summary = summary_task.result() if summary_task and summary_task.done() else None
+            if summary_task:
+                summary_task.cancel()
+    return new_plan, summary
+
+
+# ------------------------------------------------------
+# Warm plans (prefetched by prefetch.py)
+# ------------------------------------------------------
+def warm_plan(company: str, user_context: str):
+    """The prefetched plan for this company and context if it is fresh enough, else None."""
+    store = get_plan_store()
+    data = store.get(company, user_context) if store is not None else None
+    metrics.inc("warm_plan_lookups_total", result="hit" if data else "miss")
+    return AccountPlan.from_dict(data) if data else None
 
 
 # ------------------------------------------------------
 # Main Natural Language Handler
 # ------------------------------------------------------
-def process_user_message(text: str, current_plan: str = "", user_context: str = None):
+async def _handle_context_switch(route, text, plan, on_section, on_summary=None):
+    company_name = _plan_company(plan, "this company")
+    new_plan, summary = await switch_plan_context_async(plan, route.context, on_section=on_section,
+                                                        on_summary=on_summary)
+    reply = f"Great question! I've tailored the account plan for {company_name} to a {route.context} focus. This should now be more relevant to your needs."
+    if summary:
+        reply += f"\n\n{summary}"
+    return (reply, new_plan, route.context)
+
+
+async def _handle_role_question(route, text, plan, on_section, on_summary=None):
+    answer = await answer_followup_question_async(text, plan, route.context)
+    return (answer, None, route.context)
+
+
+async def _handle_generate_plan(route, text, plan, on_section, on_summary=None):
+    context_label = f" ({route.context}-focused)" if route.context != "general" else ""
+    # SQLite lookup: off the event loop, like the searches
+    new_plan = await asyncio.to_thread(warm_plan, route.company, route.context)
+    if new_plan is not None:
+        if on_section:
+            for title, body in new_plan.sections().items():
+                on_section(title, body)
+        return (
+            f"Loaded the prefetched account plan{context_label} for {route.company} (generated {format_age(new_plan.age())}).",
+            new_plan,
+            route.context
+        )
+
+    new_plan = AccountPlan.from_html(
+        await generate_plan_async(route.company, route.context, on_section=on_section), route.company, route.context
+    )
+    if not new_plan:
+        # Nothing usable came back: keep the current plan rather than report an empty one as generated
+        metrics.inc("plan_generation_failures_total", reason="empty")
+        return (f"Sorry, I couldn't generate an account plan for {route.company}; the model returned no content. "
+                "Please try again.", None, route.context)
+    if grounding_enabled():
+        # Same query and params as the plan's own search, so this is a search cache hit
+        new_plan.news_links = await asyncio.to_thread(current_news_links, route.company)
+    return (
+        f"Generated account plan{context_label} for {route.company}.", 
+        new_plan, 
+        route.context
+    )
+
+
+async def _handle_role_stated(route, text, plan, on_section, on_summary=None):
+    if plan:
+        return (
+            f"Understood! You're focused on {route.context}. Would you like me to regenerate the account plan with a {route.context} focus?",
+            None,
+            route.context
+        )
+    return (
+        f"Got it! I'll tailor the account plan for {route.context} needs. Which company would you like to research?",
+        None,
+        route.context
+    )
+
+
+async def _handle_update_section(route, text, plan, on_section, on_summary=None):
+    version = plan.section_version(route.section)
+    try:
+        await refresh_section_async(plan, route.section, route.context)
+    except NewsRefreshError as e:
+        return (f"Couldn't refresh news: {e}", plan, route.context)
+    if plan.section_version(route.section) == version:
+        # Incremental news refresh found nothing new
+        return (f"{route.section} is already up to date; no new articles since the last update.", plan, route.context)
+    return (f"Updated {route.section} section.", plan, route.context)
+
+
+async def _handle_followup(route, text, plan, on_section, on_summary=None):
+    context_to_use = route.context if route.context else "general"
+    answer = await answer_followup_question_async(text, plan, context_to_use)
+    return (answer, None, route.context)
+
+
+async def _handle_default(route, text, plan, on_section, on_summary=None):
+    return ("I can help you research companies. Just tell me which company you'd like to analyze!", None, route.context)
+
+
+INTENT_HANDLERS = {
+    "context_switch": _handle_context_switch,
+    "role_question": _handle_role_question,
+    "generate_plan": _handle_generate_plan,
+    "role_stated": _handle_role_stated,
+    "update_section": _handle_update_section,
+    "followup": _handle_followup,
+    "default": _handle_default,
+}
+
+
+async def process_user_message_async(text: str, current_plan=None, user_context: str = None, on_section=None,
+                                     on_summary=None):
     """
     Process user message with dynamic context switching support.
     
     Args:
         text: User's input message
-        current_plan: Existing account plan (if any)
+        current_plan: Existing AccountPlan or plan HTML (if any)
         user_context: Previously detected user context (None = not yet determined)
+        on_section: Optional callback(title, body_html), called as each section of a
+            newly generated plan finishes streaming
+        on_summary: Optional callback(text), called with the short role-specific
+            preview of a role switch as soon as it is ready, before the rewritten sections
+
+    Cancelling the awaiting task (e.g. the user abandoned the request) cancels the
+    in-flight Groq calls and frees their rate-limit slots.
     
     Returns:
-        (response_message, updated_plan, user_context)
+        (response_message, updated_plan, user_context) where updated_plan is an
+        AccountPlan or None if the plan did not change
     """
     
-    text_lower = text.lower().strip()
-    
-    # --------------------------------------------------
-    # 1️⃣ Pattern: User reveals context AFTER plan is generated
-    # --------------------------------------------------
-    context_reveal_match = re.search(
-        r"(?:how|what).*(?:useful|relevant|helpful|mean).*(?:for me|to me).*(?:as a|as an|i'm|i am)\s+(?:a\s+)?(\w+)",
-        text_lower
-    )
-    
-    if not context_reveal_match:
-        context_reveal_match = re.search(
-            r"(?:i'm|i am|as a|as an)\s+(?:a\s+)?(\w+).*(?:what|how|tell me|explain)",
-            text_lower
-        )
-    
-    if context_reveal_match and current_plan:
-        role_hint = context_reveal_match.group(1)
-        new_context = detect_user_context(role_hint)
-        
-        if new_context != "general" and new_context != user_context:
-            extracted = split_into_sections(current_plan)
-            company_name = "this company"
-            if "Company Overview" in extracted:
-                match_company = re.search(r"\b([A-Z][A-Za-z0-9]+)\b", extracted["Company Overview"])
-                if match_company:
-                    company_name = match_company.group(1)
-            
-            new_plan = generate_plan(company_name, new_context)
-            
-            return (
-                f"Great question! I've regenerated the account plan for {company_name} with a {new_context} focus. This should now be more relevant to your needs.",
-                new_plan,
-                new_context
-            )
-    
-    # --------------------------------------------------
-    # 2️⃣ Pattern: "As a [role], what opportunities..."
-    # --------------------------------------------------
-    role_question_match = re.search(
-        r"(?:as a|as an|i'm|i am)\s+(?:a\s+)?(\w+).*(?:what|how|which|tell|show)",
-        text_lower
-    )
-    
-    if role_question_match and current_plan:
-        role_hint = role_question_match.group(1)
-        new_context = detect_user_context(role_hint)
-        
-        if new_context != "general":
-            answer = answer_followup_question(text, current_plan, new_context)
-            return (answer, None, new_context)
-    
-    # --------------------------------------------------
-    # 3️⃣ Detect context ONLY if not already set
-    # --------------------------------------------------
-    if user_context is None:
-        detected_context = detect_user_context(text)
-        if detected_context != "general":
-            user_context = detected_context
-    
-    # --------------------------------------------------
-    # 4️⃣ Pattern: Explicit role + company in same message
-    # --------------------------------------------------
-    match = re.search(
-        r"(?:i'm|i am|as a)\s+(?:a\s+)?(\w+).*?(?:create|generate|make|build).*?(?:plan|research).*?(?:for|about|of)\s+(.+)",
-        text_lower
-    )
-    if match:
-        role_hint = match.group(1)
-        company = match.group(2).strip().title()
-        detected_context = detect_user_context(role_hint)
-        new_plan = generate_plan(company, detected_context)
-        
-        context_label = f" ({detected_context}-focused)" if detected_context != "general" else ""
-        return (
-            f"Generated account plan{context_label} for {company}.", 
-            new_plan, 
-            detected_context
-        )
-    
-    # --------------------------------------------------
-    # 5️⃣ Pattern: Standard "create account plan for X"
-    # --------------------------------------------------
-    match = re.search(r"(?:account\s+)?plan\s+(?:for|of|about|on)\s+(.+)", text_lower)
-    if match:
-        company = match.group(1).strip().title()
-        context_to_use = user_context if user_context else "general"
-        new_plan = generate_plan(company, context_to_use)
-        
-        context_label = f" ({context_to_use}-focused)" if context_to_use != "general" else ""
-        return (
-            f"Generated account plan{context_label} for {company}.", 
-            new_plan, 
-            context_to_use
-        )
-    
-    # --------------------------------------------------
-    # 6️⃣ Pattern: Simple company name
-    # --------------------------------------------------
-    if len(text.split()) <= 3 and text.replace(" ", "").replace("-", "").isalpha():
-        company = text.strip().title()
-        context_to_use = user_context if user_context else "general"
-        new_plan = generate_plan(company, context_to_use)
-        
-        context_label = f" ({context_to_use}-focused)" if context_to_use != "general" else ""
-        return (
-            f"Generated account plan{context_label} for {company}.", 
-            new_plan, 
-            context_to_use
-        )
-    
-    # --------------------------------------------------
-    # 7️⃣ Pattern: User just stating their role
-    # --------------------------------------------------
-    role_match = re.search(r"(?:i'm|i am|as a)\s+(?:a\s+)?(\w+)", text_lower)
-    if role_match and not any(word in text_lower for word in ["create", "generate", "make"]):
-        role_hint = role_match.group(1)
-        detected_context = detect_user_context(role_hint)
-        
-        if detected_context != "general":
-            if current_plan:
-                return (
-                    f"Understood! You're focused on {detected_context}. Would you like me to regenerate the account plan with a {detected_context} focus?",
-                    None,
-                    detected_context
-                )
+    with span("chat_turn") as turn:
+        current_plan = AccountPlan.coerce(current_plan)
+        with span("route"):
+            route = ROUTER.route(text, has_plan=bool(current_plan), user_context=user_context)
+        turn.set(intent=route.intent, user_context=route.context)
+        metrics.inc("chat_turns_total", intent=route.intent)
+        return await INTENT_HANDLERS[route.intent](route, text, current_plan, on_section, on_summary=on_summary)
+
+
+# ------------------------------------------------------
+# Sync API: thin wrappers over the async API (app.py, batch.py)
+# ------------------------------------------------------
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+
+def _background_loop():
+    """Shared event loop on a daemon thread, so sync callers reuse one AsyncGroq connection pool."""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="agent-event-loop", daemon=True)
+            _loop_thread.start()
+    return _loop
+
+
+# Callback kwargs that _run_sync invokes on the calling thread
+_RELAYED_CALLBACKS = ("on_section", "on_summary")
+
+
+def _run_sync(coro_fn, *args, timeout: float = None, **kwargs):
+    """
+    Run `coro_fn(*args, **kwargs)` on the background loop and block for its result.
+
+    `on_section` and `on_summary` callbacks are relayed back and invoked on the calling
+    thread (so Streamlit placeholders keep working). If the caller is interrupted, e.g. the
+    callback raises because Streamlit is rerunning, or `timeout` seconds pass
+    (TimeoutError), the coroutine is cancelled.
+    """
+    loop = _background_loop()
+    if threading.current_thread() is _loop_thread:
+        raise RuntimeError("Synchronous agent API called from the agent event loop; await the *_async variant")
+
+    events = queue.SimpleQueue()
+    callbacks = {name: kwargs[name] for name in _RELAYED_CALLBACKS if kwargs.get(name) is not None}
+    for name in callbacks:
+        kwargs[name] = lambda *args, name=name: events.put((name, args))
+
+    async def run():
+        try:
+            events.put(("result", await coro_fn(*args, **kwargs)))
+        except BaseException as e:
+            events.put(("error", e))
+            if not isinstance(e, Exception):
+                raise
+
+    deadline = time.monotonic() + timeout if timeout else None
+    tasks = []
+    # Created inside a copy of the caller's context so telemetry spans join the caller's trace
+    loop.call_soon_threadsafe(lambda: tasks.append(loop.create_task(run())), context=contextvars.copy_context())
+    try:
+        while True:
+            try:
+                kind, payload = events.get(timeout=max(0.0, deadline - time.monotonic()) if deadline else None)
+            except queue.Empty:
+                raise TimeoutError(f"{coro_fn.__name__} did not finish within {timeout}s") from None
+            if kind in callbacks:
+                callbacks[kind](*payload)
+            elif kind == "result":
+                return payload
             else:
-                return (
-                    f"Got it! I'll tailor the account plan for {detected_context} needs. Which company would you like to research?",
-                    None,
-                    detected_context
-                )
-    
-    # --------------------------------------------------
-    # 8️⃣ Pattern: Update specific section
-    # --------------------------------------------------
-    for section in SECTION_TITLES:
-        sec_lower = section.lower()
-        
-        if sec_lower in text_lower and any(
-            cmd in text_lower for cmd in ["update", "change", "regenerate", "rewrite"]
-        ):
-            extracted = split_into_sections(current_plan)
-            
-            company_guess = "the company"
-            if "Company Overview" in extracted:
-                match_company = re.search(r"\b([A-Z][A-Za-z0-9]+)\b", extracted["Company Overview"])
-                if match_company:
-                    company_guess = match_company.group(1)
-            
-            context_to_use = user_context if user_context else "general"
-            new_section_text = regenerate_section(section, company_guess, context_to_use)
-            
-            updated = extracted
-            updated[section] = new_section_text
-            
-            rebuilt = ""
-            for title in SECTION_TITLES:
-                rebuilt += f"<div class='section-title'>{title}</div>\n"
-                rebuilt += updated.get(title, "") + "\n\n"
-            
-            return (f"Updated {section} section.", rebuilt, user_context)
-    
-    # --------------------------------------------------
-    # 9️⃣ Pattern: Follow-up questions
-    # --------------------------------------------------
-    if current_plan and any(q in text_lower for q in ["what", "how", "which", "tell me", "show me", "opportunities", "useful", "relevant", "technologies", "tech stack"]):
-        context_to_use = user_context if user_context else "general"
-        answer = answer_followup_question(text, current_plan, context_to_use)
-        return (answer, None, user_context)
-    
-    # --------------------------------------------------
-    # 🔟 Default response
-    # --------------------------------------------------
-    return ("I can help you research companies. Just tell me which company you'd like to analyze!", None, user_context)
\ No newline at end of file
+                raise payload
+    except BaseException:
+        loop.call_soon_threadsafe(lambda: tasks and tasks[0].cancel())
+        raise
+
+
+def generate_plan(company: str, user_context: str = "general", force_refresh: bool = False, on_section=None,
+                  evidence: dict = None):
+    """Blocking generate_plan_async."""
+    return _run_sync(generate_plan_async, company, user_context, force_refresh=force_refresh,
+                     on_section=on_section, evidence=evidence)
+
+
+def generate_section(section_name: str, company: str, user_context: str = "general", force_refresh: bool = False,
+                     evidence: list = None):
+    """Blocking generate_section_async."""
+    return _run_sync(generate_section_async, section_name, company, user_context, force_refresh=force_refresh,
+                     evidence=evidence)
+
+
+def generate_plan_parallel(company: str, user_context: str = "general", force_refresh: bool = False,
+                           on_section=None, max_workers: int = None, evidence: dict = None):
+    """Blocking generate_plan_parallel_async."""
+    return _run_sync(generate_plan_parallel_async, company, user_context, force_refresh=force_refresh,
+                     on_section=on_section, max_workers=max_workers, evidence=evidence)
+
+
+def regenerate_section(section_name: str, company: str, user_context: str = "general", force_refresh: bool = False,
+                       timeout: float = None):
+    """Blocking regenerate_section_async (cancelled with TimeoutError after `timeout` seconds)."""
+    return _run_sync(regenerate_section_async, section_name, company, user_context, force_refresh=force_refresh,
+                     timeout=timeout)
+
+
+def refresh_section(plan: AccountPlan, section_name: str, user_context: str = None, timeout: float = None):
+    """Blocking refresh_section_async (cancelled with TimeoutError after `timeout` seconds)."""
+    return _run_sync(refresh_section_async, plan, section_name, user_context, timeout=timeout)
+
+
+def refresh_news(plan: AccountPlan, user_context: str = None, timeout: float = None):
+    """Blocking refresh_news_async (cancelled with TimeoutError after `timeout` seconds)."""
+    return _run_sync(refresh_news_async, plan, user_context, timeout=timeout)
+
+
+def answer_followup_question(question: str, current_plan, user_context: str):
+    """Blocking answer_followup_question_async."""
+    return _run_sync(answer_followup_question_async, question, current_plan, user_context)
+
+
+def switch_plan_context(plan: AccountPlan, new_context: str, on_section=None, on_summary=None,
+                        timeout: float = None):
+    """Blocking switch_plan_context_async (cancelled with TimeoutError after `timeout` seconds)."""
+    return _run_sync(switch_plan_context_async, plan, new_context, on_section=on_section, on_summary=on_summary,
+                     timeout=timeout)
+
+
+def provide_context_specific_summary(current_plan, new_context: str):
+    """Blocking provide_context_specific_summary_async."""
+    return _run_sync(provide_context_specific_summary_async, current_plan, new_context)
+
+
+def process_user_message(text: str, current_plan=None, user_context: str = None, on_section=None,
+                         on_summary=None, timeout: float = None):
+    """
+    Blocking process_user_message_async (same arguments and return value); the turn is
+    cancelled with TimeoutError after `timeout` seconds.
+    """
+    return _run_sync(process_user_message_async, text, current_plan, user_context, on_section=on_section,
+                     on_summary=on_summary, timeout=timeout)
@@ -1,11 +1,20 @@
 # app.py
 """
 Account Plan Generator with Chat Interface
-Requires: streamlit, agent module with process_user_message function
+Requires: streamlit, agent module with process_user_message function, pdf_export module
 """
 
+import html
+import os
+
 import streamlit as st
 from agent import process_user_message
+from pdf_export import get_plan_pdf, pdf_cache
+from telemetry import METRICS_PORT, span, start_metrics_server
+from utils import format_age
+
+# Seconds between checks for a PDF being built in the background
+PDF_POLL_INTERVAL = float(os.getenv("PDF_POLL_INTERVAL", "1"))
 
 st.set_page_config(
     page_title="Account Plan Generator",
@@ -13,6 +22,10 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Prometheus-style /metrics endpoint (started once per process, reused across reruns)
+if METRICS_PORT:
+    start_metrics_server(METRICS_PORT)
+
 # -------------------------------
 # DARK MODE CSS (ENHANCED)
 # -------------------------------
@@ -337,8 +350,9 @@ st.markdown(
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# Account plan is an agent AccountPlan (None until one is generated)
 if "account_plan" not in st.session_state:
-    st.session_state.account_plan = ""
+    st.session_state.account_plan = None
 
 if "processing" not in st.session_state:
     st.session_state.processing = False
@@ -378,137 +392,25 @@ def render_chat_messages():
 def clear_chat():
     """Clear chat history and account plan"""
     st.session_state.messages = []
-    st.session_state.account_plan = ""
+    st.session_state.account_plan = None
     # 🆕 NEW: Also clear user context
     st.session_state.user_context = None
     st.rerun()
 
+def render_plan_html(plan):
+    """Wrap plan HTML in the plan container, removing extra <br><br> gaps generated by LLM"""
+    clean_plan = (
+        plan
+        .replace("<br><br>", "")      # Remove double line gaps
+        .replace("<br>", "")          # Remove single breaks (optional)
+    )
+    return f"<div class='plan-container'>{clean_plan}</div>"
+
 def download_plan():
-    """Generate downloadable PDF content for the account plan"""
+    """Generate downloadable PDF content for the account plan (cached by plan content)"""
     if st.session_state.account_plan:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-        from reportlab.lib.units import inch
-        from reportlab.lib.colors import HexColor
-        from html.parser import HTMLParser
-        import io
-        import re
-        
-        # HTML to text converter
-        class HTMLStripper(HTMLParser):
-            def __init__(self):
-                super().__init__()
-                self.reset()
-                self.strict = False
-                self.convert_charrefs = True
-                self.text = []
-            
-            def handle_data(self, data):
-                self.text.append(data)
-            
-            def get_data(self):
-                return ''.join(self.text)
-        
-        def strip_html_tags(html):
-            """Remove all HTML tags and return plain text"""
-            stripper = HTMLStripper()
-            try:
-                stripper.feed(html)
-                return stripper.get_data()
-            except:
-                # Fallback to regex if parser fails
-                return re.sub('<[^<]+?>', '', html)
-        
-        # Create PDF buffer
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, 
-                               rightMargin=72, leftMargin=72,
-                               topMargin=72, bottomMargin=18)
-        
-        # Container for PDF elements
-        story = []
-        
-        # Define styles
-        styles = getSampleStyleSheet()
-        
-        # Custom title style
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=HexColor('#1e88e5'),
-            spaceAfter=30,
-            alignment=1,  # Center alignment
-            fontName='Helvetica-Bold'
-        )
-        
-        # Custom heading style
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=HexColor('#2c2c2c'),
-            spaceAfter=12,
-            spaceBefore=20,
-            fontName='Helvetica-Bold'
-        )
-        
-        # Custom body style
-        body_style = ParagraphStyle(
-            'CustomBody',
-            parent=styles['BodyText'],
-            fontSize=11,
-            textColor=HexColor('#333333'),
-            spaceAfter=12,
-            leading=14
-        )
-        
-        # Parse HTML content
-        content = st.session_state.account_plan
-        
-        # Add title
-        story.append(Paragraph("Account Plan", title_style))
-        story.append(Spacer(1, 0.2*inch))
-        
-        # Split content into sections
-        lines = content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Detect if it's a section heading
-            if "class='section-title'" in line or '<h1' in line.lower() or '<h2' in line.lower() or '<h3' in line.lower():
-                clean_line = strip_html_tags(line).strip()
-                if clean_line:
-                    story.append(Paragraph(clean_line, heading_style))
-            # Detect if it contains strong/bold tags
-            elif '<strong>' in line.lower() or '<b>' in line.lower():
-                clean_line = strip_html_tags(line).strip()
-                if clean_line:
-                    story.append(Paragraph(clean_line, heading_style))
-            else:
-                # Regular content
-                clean_line = strip_html_tags(line).strip()
-                if clean_line:
-                    # Escape special characters for ReportLab
-                    clean_line = clean_line.replace('&', '&amp;')
-                    clean_line = clean_line.replace('<', '&lt;')
-                    clean_line = clean_line.replace('>', '&gt;')
-                    story.append(Paragraph(clean_line, body_style))
-        
-        # Build PDF
-        try:
-            doc.build(story)
-            pdf_data = buffer.getvalue()
-            buffer.close()
-            return pdf_data
-        except Exception as e:
-            print(f"PDF generation error: {e}")
-            buffer.close()
-            return None
+        with span("pdf_export"):
+            return get_plan_pdf(st.session_state.account_plan.to_html())
     return None
 
 # -------------------------------
@@ -545,44 +447,14 @@ with left:
         st.session_state.messages.append(("user", user_input))
         st.rerun()
 
-    # Process message if in processing state
-    if st.session_state.processing and st.session_state.messages:
-        last_role, last_msg = st.session_state.messages[-1]
-        
-        if last_role == "user":
-            try:
-                # 🆕 UPDATED: Process using agent with context support
-                bot_reply, updated_plan, new_context = process_user_message(
-                    last_msg,
-                    current_plan=st.session_state.account_plan,
-                    user_context=st.session_state.user_context  # Pass current context
-                )
-                
-                # Save bot reply
-                st.session_state.messages.append(("assistant", bot_reply))
-                
-                # Update account plan if provided
-                if updated_plan:
-                    st.session_state.account_plan = updated_plan
-                
-                # 🆕 NEW: Update user context if changed
-                if new_context:
-                    st.session_state.user_context = new_context
-                
-            except Exception as e:
-                error_msg = f"⚠️ An error occurred: {str(e)}"
-                st.session_state.messages.append(("assistant", error_msg))
-            
-            finally:
-                # Reset processing flag
-                st.session_state.processing = False
-                st.rerun()
-
 with right:
     # Header with download button
     col1, col2 = st.columns([0.7, 0.3])
     with col1:
         st.markdown("<div class='account-plan-title'>📋 Generated Account Plan</div>", unsafe_allow_html=True)
+        if st.session_state.account_plan:
+            # Prefetched plans can be hours old; show when the plan was written
+            st.caption(f"🕒 Generated {format_age(st.session_state.account_plan.age())}")
     with col2:
         if st.session_state.account_plan:
             plan_pdf = download_plan()
@@ -594,24 +466,77 @@ with right:
                     mime="application/pdf",
                     help="Download account plan as PDF file"
                 )
+            elif pdf_cache.has_failed(st.session_state.account_plan.to_html()):
+                st.caption("⚠️ PDF export failed")
+            elif pdf_cache.background:
+                # Built on a worker thread: poll until it is done, then rerun to show the button
+                @st.fragment(run_every=PDF_POLL_INTERVAL)
+                def wait_for_pdf():
+                    st.caption("⏳ Preparing PDF…")
+                    if not pdf_cache.is_pending(st.session_state.account_plan.to_html()):
+                        st.rerun()
+
+                wait_for_pdf()
     
-    # Display account plan
+    # Display account plan (placeholder is refilled while a new plan streams in)
+    plan_placeholder = st.empty()
     if st.session_state.account_plan:
-
-        # Remove extra <br><br> gaps generated by LLM
-        clean_plan = (
-            st.session_state.account_plan
-            .replace("<br><br>", "")      # Remove double line gaps
-            .replace("<br>", "")          # Remove single breaks (optional)
-        )
-
-        st.markdown(
-            f"<div class='plan-container'>{clean_plan}</div>",
-            unsafe_allow_html=True
-        )
+        plan_placeholder.markdown(render_plan_html(st.session_state.account_plan.to_html()), unsafe_allow_html=True)
 
     else:
-        st.markdown(
+        plan_placeholder.markdown(
             "<div class='plan-container'><div class='empty-state'>💡 Your account plan will appear here after you request one from the assistant...</div></div>",
             unsafe_allow_html=True
-        )
\ No newline at end of file
+        )
+
+# -------------------------------
+# PROCESS PENDING MESSAGE
+# (after both panels exist, so streamed sections can fill the plan panel)
+# -------------------------------
+if st.session_state.processing and st.session_state.messages:
+    last_role, last_msg = st.session_state.messages[-1]
+
+    if last_role == "user":
+        streamed_sections = []
+
+        def show_streamed_section(title, body):
+            """Render each plan section into the right panel as soon as it is complete"""
+            with span("render_section", section=title):
+                streamed_sections.append(f"<div class='section-title'>{title}</div>\n{body}")
+                plan_placeholder.markdown(render_plan_html("\n".join(streamed_sections)), unsafe_allow_html=True)
+
+        def show_role_preview(summary):
+            """Show the role-switch preview at the top of the plan panel while sections are rewritten"""
+            streamed_sections.insert(0, f"<div class='section-title'>Role Preview</div>\n<p style='white-space: pre-wrap'>{html.escape(summary)}</p>")
+            plan_placeholder.markdown(render_plan_html("\n".join(streamed_sections)), unsafe_allow_html=True)
+
+        try:
+            # 🆕 UPDATED: Process using agent with context support
+            with span("ui_turn"):
+                bot_reply, updated_plan, new_context = process_user_message(
+                    last_msg,
+                    current_plan=st.session_state.account_plan,
+                    user_context=st.session_state.user_context,  # Pass current context
+                    on_section=show_streamed_section,
+                    on_summary=show_role_preview
+                )
+
+            # Save bot reply
+            st.session_state.messages.append(("assistant", bot_reply))
+
+            # Update account plan if provided
+            if updated_plan:
+                st.session_state.account_plan = updated_plan
+
+            # 🆕 NEW: Update user context if changed
+            if new_context:
+                st.session_state.user_context = new_context
+
+        except Exception as e:
+            error_msg = f"⚠️ An error occurred: {str(e)}"
+            st.session_state.messages.append(("assistant", error_msg))
+
+        finally:
+            # Reset processing flag
+            st.session_state.processing = False
+            st.rerun()
\ No newline at end of file
@@ -0,0 +1,203 @@
+"""
+Bulk account-plan generation.
+
+Reads companies (and an optional user_context) from CSV or JSONL, researches and
+generates plans with bounded concurrency, and appends one JSON line per company
+to the output file. The output file doubles as the checkpoint: rerunning the same
+command skips companies that already have a successful result.
+
+Usage:
+    python batch.py companies.csv --out plans.jsonl [--html-dir plans_html] [--workers 4]
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from agent import generate_plan, grounding_enabled
+from retrieval import pack_evidence_by_section
+from search import search_company
+from utils import percentile, timestamp
+
+STAGES = ("search", "generate", "total")
+
+
+def job_key(company: str, user_context: str) -> str:
+    """Normalized identity of one batch job, used for resume."""
+    return f"{' '.join(company.lower().split())}|{user_context}"
+
+
+def read_companies(path: str, default_context: str = "general"):
+    """Yield {"company", "user_context"} rows from a .csv (header: company[,user_context]) or .jsonl file."""
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+
+    for row in rows:
+        company = (row.get("company") or "").strip()
+        if company:
+            yield {"company": company, "user_context": (row.get("user_context") or "").strip() or default_context}
+
+
+def load_completed(out_path: str) -> set:
+    """Keys of jobs that already succeeded in a previous (possibly crashed) run."""
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A crash can leave a half-written last line; that job simply reruns (see drop_partial_line)
+                continue
+            if record.get("status") == "ok":
+                done.add(job_key(record["company"], record["user_context"]))
+    return done
+
+
+def run_job(job: dict, fresh: bool = False) -> dict:
+    """
+    Research + generate one plan, timing each stage.
+
+    `fresh` bypasses the search and response caches (results are still cached), for
+    scheduled refreshes that must not re-serve what they produced last time.
+    """
+    company, user_context = job["company"], job["user_context"]
+    timings = {}
+    start = time.perf_counter()
+    try:
+        evidence = {}
+        if grounding_enabled():
+            stage = time.perf_counter()
+            evidence = pack_evidence_by_section(search_company(company, force_refresh=fresh))
+            timings["search"] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        plan = generate_plan(company, user_context, force_refresh=fresh, evidence=evidence)
+        timings["generate"] = time.perf_counter() - stage
+        timings["total"] = time.perf_counter() - start
+        return {"company": company, "user_context": user_context, "status": "ok",
+                "plan": plan, "timings": timings, "generated_at": timestamp()}
+    except Exception as e:
+        timings["total"] = time.perf_counter() - start
+        return {"company": company, "user_context": user_context, "status": "error",
+                "error": str(e), "timings": timings, "generated_at": timestamp()}
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-") or "plan"
+
+
+def write_html(html_dir: str, record: dict):
+    path = os.path.join(html_dir, f"{_slug(record['company'])}-{_slug(record['user_context'])}.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"<html><head><meta charset='utf-8'><title>{record['company']} account plan</title></head><body>\n")
+        f.write(record["plan"])
+        f.write("\n</body></html>\n")
+
+
+def drop_partial_line(out_path: str, chunk_size: int = 64 * 1024):
+    """Truncate a half-written last line (left by a crash) so appended records start on a line of their own."""
+    if not os.path.exists(out_path):
+        return
+    with open(out_path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        # Scan back from the end for the last newline
+        while pos > 0:
+            start = max(0, pos - chunk_size)
+            f.seek(start)
+            chunk = f.read(pos - start)
+            if pos == end and chunk.endswith(b"\n"):
+                return
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                f.truncate(start + newline + 1)
+                return
+            pos = start
+        f.truncate(0)
+
+
+def run_batch(jobs, out_path: str, html_dir: str = None, workers: int = 4, progress_every: int = 25) -> dict:
+    """
+    Run all jobs not already completed in `out_path`, streaming results to it.
+
+    Returns a summary with counts, throughput (plans/min) and per-stage latency percentiles.
+    """
+    done = load_completed(out_path)
+    drop_partial_line(out_path)
+    pending = [job for job in jobs if job_key(job["company"], job["user_context"]) not in done]
+    if html_dir:
+        os.makedirs(html_dir, exist_ok=True)
+
+    stage_times = {stage: [] for stage in STAGES}
+    counts = {"ok": 0, "error": 0, "skipped": len(jobs) - len(pending)}
+    start = time.perf_counter()
+
+    with open(out_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_job, job) for job in pending]
+        for i, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            # Results are written from this thread only; flush each so a crash loses at most in-flight jobs
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+
+            counts[record["status"]] += 1
+            for stage, seconds in record["timings"].items():
+                stage_times[stage].append(seconds)
+            if record["status"] == "ok" and html_dir:
+                write_html(html_dir, record)
+            if record["status"] == "error":
+                print(f"[{timestamp()}] {record['company']} failed: {record['error']}")
+            if progress_every and i % progress_every == 0:
+                print(f"[{timestamp()}] {i}/{len(pending)} done")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "processed": counts["ok"] + counts["error"],
+        "ok": counts["ok"],
+        "error": counts["error"],
+        "skipped": counts["skipped"],
+        "elapsed_s": elapsed,
+        "plans_per_min": counts["ok"] / elapsed * 60 if elapsed else 0.0,
+        "latency": {
+            stage: {f"p{p}": percentile(values, p) for p in (50, 90, 95, 99)}
+            for stage, values in stage_times.items() if values
+        },
+    }
+
+
+def print_summary(summary: dict):
+    print(f"\nProcessed {summary['processed']} ({summary['ok']} ok, {summary['error']} failed, "
+          f"{summary['skipped']} already done) in {summary['elapsed_s']:.1f}s")
+    print(f"Throughput: {summary['plans_per_min']:.1f} plans/min")
+    for stage, stats in summary["latency"].items():
+        row = "  ".join(f"{name}={value:.2f}s" for name, value in stats.items())
+        print(f"  {stage:<9} {row}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate account plans for a list of companies.")
+    parser.add_argument("input", help="CSV (company[,user_context]) or JSONL file")
+    parser.add_argument("--out", default="plans.jsonl", help="JSONL results file (also the resume checkpoint)")
+    parser.add_argument("--html-dir", help="also write one HTML file per plan into this directory")
+    parser.add_argument("--workers", type=int, default=4, help="companies processed concurrently")
+    parser.add_argument("--context", default="general", help="user_context for rows that do not set one")
+    args = parser.parse_args()
+
+    jobs = list(read_companies(args.input, default_context=args.context))
+    summary = run_batch(jobs, args.out, html_dir=args.html_dir, workers=args.workers)
+    print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Near-duplicate filter benchmark: exact-only vs MinHash/LSH search.clean_results.
+
+Generates synthetic search snippets: distinct stories, each returned one or more
+times as a syndicated variant (source suffix, truncation, a changed or dropped
+word), as overlapping search_company queries do. Reports time, items/bytes
+removed and, since the true duplicate groups are known, precision/recall of the
+near-duplicate removals.
+
+Run from the repository root:
+    python -m benchmarks.bench_dedup [--sizes 10000,20000,40000] [--threshold 0.7]
+"""
+
+import argparse
+import random
+import time
+
+from search import clean_results
+
+SOURCES = [" - Reuters", " | Yahoo Finance", " (Bloomberg)", " - MarketWatch", " via PR Newswire"]
+
+
+def make_vocabulary(rng: random.Random, size: int = 5000):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+
+
+def variant(rng: random.Random, words, vocabulary):
+    """A syndicated copy of a story: source suffix, truncation, or one word changed/dropped."""
+    words = list(words)
+    kind = rng.randrange(4)
+    if kind == 0:
+        return " ".join(words) + rng.choice(SOURCES)
+    if kind == 1:
+        return " ".join(words[:max(8, len(words) - rng.randint(2, 4))]) + " ..."
+    position = rng.randrange(len(words))
+    if kind == 2:
+        words[position] = rng.choice(vocabulary)
+    else:
+        del words[position]
+    return " ".join(words)
+
+
+def make_items(count: int, seed: int = 7):
+    """(items, group ids): about half the items are variants of an earlier story."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    items, groups, stories = [], [], []
+    while len(items) < count:
+        if stories and rng.random() < 0.5:
+            group = rng.randrange(len(stories))
+            text = variant(rng, stories[group], vocabulary)
+        else:
+            group = len(stories)
+            stories.append([rng.choice(vocabulary) for _ in range(rng.randint(18, 32))])
+            text = " ".join(stories[group])
+        items.append({"title": f"Story {group % 97}", "snippet": text, "link": f"https://example.com/{len(items)}"})
+        groups.append(group)
+    return items, groups
+
+
+def evaluate(items, groups, kept):
+    """Precision/recall of removals against the known duplicate groups."""
+    kept_ids = {id(item) for item in kept}
+    seen_groups, true_dups, removed, correct = set(), 0, 0, 0
+    for item, group in zip(items, groups):
+        is_dup = group in seen_groups
+        seen_groups.add(group)
+        true_dups += is_dup
+        if id(item) not in kept_ids:
+            removed += 1
+            correct += is_dup
+    precision = correct / removed if removed else 1.0
+    recall = correct / true_dups if true_dups else 1.0
+    return precision, recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,20000,40000", help="comma-separated snippet counts")
+    parser.add_argument("--threshold", type=float, default=None, help="Jaccard threshold (default env/0.7)")
+    args = parser.parse_args()
+
+    print(f"{'items':>7} {'mode':>6} {'time':>8} {'items/s':>9} {'kept':>7} {'removed':>8} {'bytes removed':>14} "
+          f"{'precision':>10} {'recall':>7}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        items, groups = make_items(size)
+        total_bytes = sum(len(it["title"]) + len(it["snippet"]) for it in items)
+        for mode, near in (("exact", False), ("near", True)):
+            stats = {}
+            start = time.perf_counter()
+            kept = clean_results(items, near_duplicates=near, threshold=args.threshold, stats=stats)
+            elapsed = time.perf_counter() - start
+            precision, recall = evaluate(items, groups, kept)
+            print(f"{size:>7} {mode:>6} {elapsed:>7.2f}s {size / elapsed:>9.0f} {stats['kept']:>7} "
+                  f"{size - stats['kept']:>8} {stats['bytes_removed'] / total_bytes:>13.1%} "
+                  f"{precision:>10.3f} {recall:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
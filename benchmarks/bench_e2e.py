@@ -0,0 +1,182 @@
+"""
+Offline end-to-end latency benchmark.
+
+Starts local fake Groq and SerpAPI servers (benchmarks/fake_servers.py), points the
+real clients at them, then drives process_user_message through scripted
+conversations and search_company through a batch of lookups. Reports
+p50/p95/p99 latency per intent and overall throughput. No network access needed.
+
+Run from the repository root:
+    python -m benchmarks.bench_e2e [--conversations 24] [--concurrency 8] [--stream]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_servers import LatencyProfile, start_fake_groq, start_fake_serpapi
+from utils import percentile
+
+# Each conversation researches its own company so response caches do not hide latency
+CONVERSATIONS = [
+    [
+        "I'm a sales rep",
+        "create an account plan for {company}",
+        "what are the key opportunities?",
+        "please update the competitors section",
+        "how is this useful for me as an investor?",
+    ],
+    [
+        "{company}",
+        "which competitors matter most?",
+        "rewrite the suggested next steps section",
+        "as a recruiter what should I know?",
+    ],
+    [
+        "I am a student, can you generate research about {company}",
+        "what tech stack do they use?",
+        "update recent news",
+        "tell me about their culture",
+    ],
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=24, help="scripted conversations to run")
+    parser.add_argument("--concurrency", type=int, default=8, help="conversations in flight at once")
+    parser.add_argument("--searches", type=int, default=20, help="standalone search_company lookups")
+    parser.add_argument("--stream", action="store_true", help="stream plans (records time to first section)")
+    parser.add_argument("--groq-median", type=float, default=0.3, help="median time to first token (s)")
+    parser.add_argument("--groq-sigma", type=float, default=0.5, help="log-normal sigma of first-token latency")
+    parser.add_argument("--groq-tps", type=float, default=250.0, help="generated tokens per second")
+    parser.add_argument("--groq-error-rate", type=float, default=0.0)
+    parser.add_argument("--serp-median", type=float, default=0.5, help="median SerpAPI response time (s)")
+    parser.add_argument("--serp-sigma", type=float, default=0.4)
+    parser.add_argument("--serp-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def configure_environment(groq_url: str, serp_url: str, cache_dir: str):
+    """Point the agent at the fake servers; must run before agent/search are imported."""
+    os.environ["GROQ_API_KEY"] = "fake-groq-key"
+    os.environ["GROQ_BASE_URL"] = groq_url
+    os.environ["SERPAPI_KEY"] = "fake-serpapi-key"
+    os.environ["SERPAPI_BASE_URL"] = serp_url
+    os.environ["SEARCH_CACHE_PATH"] = os.path.join(cache_dir, "search_cache.sqlite3")
+    # A throwaway plan store: warm plans from earlier runs (or the real .cache) would skip generation
+    os.environ["PLAN_STORE_PATH"] = os.path.join(cache_dir, "plans.sqlite3")
+    # Local servers have no provider quota; keep the shared limiters out of the way unless overridden
+    for name, value in {"GROQ_RPS": "1000", "GROQ_BURST": "1000", "GROQ_MAX_CONCURRENCY": "256",
+                        "SERPAPI_RPS": "1000", "SERPAPI_BURST": "1000", "SERPAPI_MAX_CONCURRENCY": "256"}.items():
+        os.environ.setdefault(name, value)
+
+
+def summarize(label: str, values):
+    if not values:
+        return f"{label:<16} {'-':>6}"
+    return (f"{label:<16} n={len(values):<5} p50={percentile(values, 50):6.2f}s  "
+            f"p95={percentile(values, 95):6.2f}s  p99={percentile(values, 99):6.2f}s  max={max(values):6.2f}s")
+
+
+def main():
+    args = parse_args()
+    groq = start_fake_groq(LatencyProfile(args.groq_median, args.groq_sigma, args.groq_tps, args.groq_error_rate), seed=args.seed)
+    serp = start_fake_serpapi(LatencyProfile(args.serp_median, args.serp_sigma, 0, args.serp_error_rate), seed=args.seed + 1)
+    cache_dir = tempfile.mkdtemp(prefix="bench_e2e_")
+    configure_environment(groq.url, serp.url, cache_dir)
+
+    import agent
+    from router import ROUTER
+    from search import search_company
+
+    latencies = defaultdict(list)
+    first_section = []
+    errors = defaultdict(int)
+    lock = threading.Lock()
+
+    def run_conversation(index: int):
+        script = CONVERSATIONS[index % len(CONVERSATIONS)]
+        company = f"Benchco{index}"
+        plan, context = None, None
+        for template in script:
+            message = template.format(company=company)
+            intent = ROUTER.route(message, has_plan=bool(plan), user_context=context).intent
+            start = time.perf_counter()
+            first = []
+
+            def on_section(title, body):
+                if not first:
+                    first.append(time.perf_counter() - start)
+
+            try:
+                reply, new_plan, context = agent.process_user_message(
+                    message, current_plan=plan, user_context=context,
+                    on_section=on_section if args.stream else None,
+                )
+                if new_plan:
+                    plan = new_plan
+            except Exception as e:
+                with lock:
+                    errors[type(e).__name__] += 1
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies[intent].append(elapsed)
+                latencies["all turns"].append(elapsed)
+                first_section.extend(first)
+
+    print(f"Fake Groq at {groq.url}, fake SerpAPI at {serp.url}")
+    print(f"Running {args.conversations} conversations, {args.concurrency} concurrent"
+          f"{' (streaming)' if args.stream else ''}...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(run_conversation, range(args.conversations)))
+    chat_elapsed = time.perf_counter() - start
+
+    search_latencies = []
+
+    def run_search(index: int):
+        t0 = time.perf_counter()
+        try:
+            search_company(f"Searchco{index}")
+        except Exception as e:
+            with lock:
+                errors[f"search {type(e).__name__}"] += 1
+            return
+        with lock:
+            search_latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(run_search, range(args.searches)))
+    search_elapsed = time.perf_counter() - start
+
+    turns = len(latencies["all turns"])
+    print("\nChat turns (process_user_message)")
+    for intent in sorted(latencies, key=lambda k: (k != "all turns", k)):
+        print("  " + summarize(intent, latencies[intent]))
+    if args.stream:
+        print("  " + summarize("first section", first_section))
+    print(f"  throughput: {turns / chat_elapsed:.2f} turns/s over {chat_elapsed:.1f}s")
+
+    print("\nsearch_company")
+    print("  " + summarize("lookup", search_latencies))
+    print(f"  throughput: {len(search_latencies) / search_elapsed:.2f} lookups/s")
+
+    print(f"\nFake Groq    : {groq.stats}")
+    print(f"Fake SerpAPI : {serp.stats}")
+    if errors:
+        print(f"Errors       : {dict(errors)}")
+
+    groq.stop()
+    serp.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Follow-up context benchmark: whole plan vs AccountPlan.relevant_context.
+
+Asks a fixed set of follow-up questions against a sample plan and reports, per
+token budget, the plan tokens that would go into each prompt and the share of
+questions whose answer fact is still in the context (a stand-in for answer
+quality: the model cannot answer from a sentence it was not given).
+
+Run from the repository root:
+    python -m benchmarks.bench_followup [--budgets 200,400,800] [--repeat 200]
+"""
+
+import argparse
+import time
+
+from agent import markdown_to_html
+from plan import AccountPlan
+from retrieval import estimate_tokens
+from utils import percentile
+
+SAMPLE_PLAN = {
+    "Company Overview": """
+- Northwind Analytics was founded in 2009 and is headquartered in Austin, Texas.
+- The CEO is Maria Alvarez, who joined from Oracle in 2018.
+- Annual revenue reached $1.4B in fiscal 2024, up 18% year over year.
+- The company employs about 5,200 people across 14 countries.
+- Northwind went public on NASDAQ in 2016 under the ticker NWAN.
+- Its customer base includes 40% of the Fortune 500, mainly in retail and logistics.
+""",
+    "Recent News": """
+- In March 2025 Northwind acquired Lumen Data, a streaming ETL startup, for $320M.
+- The company announced a strategic partnership with Snowflake for native data sharing.
+- Q4 earnings beat analyst estimates, with cloud subscription revenue up 31%.
+- Northwind opened a new engineering hub in Warsaw, Poland, hiring 400 engineers.
+- A data breach disclosed in January affected 12,000 customer accounts; no payment data was exposed.
+""",
+    "Products / Services": """
+- Northwind Cloud is the flagship SaaS analytics platform, priced per seat starting at $75 per month.
+- Northwind Edge runs analytics on in-store devices for real-time inventory tracking.
+- The Forecast module uses machine learning to predict demand up to 26 weeks ahead.
+- Professional services cover data migration, dashboard design and staff training.
+- The platform integrates with SAP, Salesforce, Shopify and Microsoft Dynamics.
+- Most new customers start with a 90-day pilot before signing multi-year contracts.
+""",
+    "Competitors": """
+- Tableau (Salesforce) competes on visualization and has a larger partner ecosystem.
+- Microsoft Power BI undercuts Northwind on price for customers already on Microsoft 365.
+- Looker (Google Cloud) is strongest with data teams that are standardized on BigQuery.
+- Domo targets the same mid-market retail buyers with an all-in-one positioning.
+- Northwind differentiates on retail-specific demand forecasting and edge deployment.
+""",
+    "Key Opportunities / Signals": """
+- Job postings for data platform engineers rose 60% this quarter, signalling a platform rebuild.
+- The Lumen Data acquisition creates demand for streaming infrastructure and consulting.
+- Leadership has said expanding into European grocery chains is a top priority for 2025.
+- The breach response plan includes a budget increase for security tooling and audits.
+- Renewals of several large logistics contracts are due in the second half of the year.
+""",
+    "Suggested Next Steps": """
+1. Reach out to the VP of Data Platform about the streaming migration following the Lumen deal.
+2. Prepare a security and compliance brief referencing the January incident.
+3. Propose a European grocery pilot aligned with the 2025 expansion priority.
+4. Map the buying committee: CEO Maria Alvarez, CFO David Chen and the CIO.
+5. Time outreach for logistics renewals ahead of the second-half contract cycle.
+""",
+}
+
+# (question, fact that a correct answer needs)
+QUESTIONS = [
+    ("Who is the CEO?", "Maria Alvarez"),
+    ("Where is the company headquartered?", "Austin"),
+    ("What was their revenue last year?", "$1.4B"),
+    ("How many employees do they have?", "5,200"),
+    ("What did they acquire recently?", "Lumen Data"),
+    ("Any partnerships announced?", "Snowflake"),
+    ("Was there a security breach?", "12,000"),
+    ("How much does their flagship product cost?", "$75"),
+    ("Which systems does the platform integrate with?", "Salesforce"),
+    ("How far ahead can the forecast module predict demand?", "26 weeks"),
+    ("Who are their main competitors?", "Power BI"),
+    ("How does Northwind differentiate from competitors?", "edge deployment"),
+    ("What hiring signals are there?", "60%"),
+    ("Which markets are they expanding into?", "European grocery"),
+    ("When are the logistics contracts up for renewal?", "second half"),
+    ("Who should I contact first?", "VP of Data Platform"),
+    ("Who is on the buying committee?", "David Chen"),
+    ("When did they go public?", "2016"),
+    ("Where is the new engineering hub?", "Warsaw"),
+    ("How do new customers usually start?", "90-day pilot"),
+]
+
+
+def build_plan() -> AccountPlan:
+    sections = {title: markdown_to_html(body.strip()) for title, body in SAMPLE_PLAN.items()}
+    return AccountPlan(sections, company="Northwind Analytics", user_context="sales")
+
+
+def run(plan: AccountPlan, budget: int, repeat: int):
+    tokens, hits, timings = [], 0, []
+    for question, fact in QUESTIONS:
+        context = plan.relevant_context(question, budget)
+        tokens.append(estimate_tokens(context))
+        hits += fact in context
+        start = time.perf_counter()
+        for _ in range(repeat):
+            plan.relevant_context(question, budget)
+        timings.append((time.perf_counter() - start) / repeat)
+    return tokens, hits, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budgets", default="200,400,800", help="comma-separated token budgets")
+    parser.add_argument("--repeat", type=int, default=200, help="selections per question for timing")
+    args = parser.parse_args()
+
+    plan = build_plan()
+    full = estimate_tokens(plan.context_text())
+    print(f"{len(QUESTIONS)} questions, whole-plan context: {full} tokens")
+    print(f"{'budget':>8} {'avg tokens':>11} {'max tokens':>11} {'saved':>7} {'fact recall':>12} {'select p50':>11}")
+    for budget in (int(b) for b in args.budgets.split(",")):
+        tokens, hits, timings = run(plan, budget, args.repeat)
+        avg = sum(tokens) / len(tokens)
+        print(
+            f"{budget:>8} {avg:>11.0f} {max(tokens):>11} {1 - avg / full:>7.0%} "
+            f"{hits}/{len(QUESTIONS):<9} {percentile(timings, 50) * 1e6:>9.0f}us"
+        )
+    print(f"{'whole':>8} {full:>11} {full:>11} {0:>7.0%} "
+          f"{sum(f in plan.context_text() for _, f in QUESTIONS)}/{len(QUESTIONS):<9}")
+
+
+if __name__ == "__main__":
+    main()
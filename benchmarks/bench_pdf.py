@@ -0,0 +1,219 @@
+"""
+PDF export benchmark: previous line-by-line renderer vs pdf_export.build_plan_pdf.
+
+Renders a synthetic account plan large enough for 100+ pages with both
+renderers and reports wall time, peak Python memory (tracemalloc) and page count.
+
+Run from the repository root:
+    python -m benchmarks.bench_pdf [--sections 60] [--bullets 40] [--repeat 3] [--plain]
+
+--plain drops the <strong> tags from the synthetic plan, to separate the layout
+cost of inline bold (which the legacy renderer discarded) from the rest.
+"""
+
+import argparse
+import random
+import re
+import time
+import tracemalloc
+
+from pdf_export import build_plan_pdf
+from plan import SECTION_TITLES
+
+WORDS = (
+    "revenue growth platform customers enterprise cloud market share pipeline partners "
+    "expansion pricing strategy hiring signals retention analytics security integration "
+    "roadmap acquisition leadership segment regional demand margin forecast"
+).split()
+
+
+# ------------------------------------------------------
+# Previous renderer (before the single-pass builder), kept for comparison
+# ------------------------------------------------------
+def legacy_build_plan_pdf(content: str):
+    """Previous renderer: one HTMLStripper per line, styles rebuilt per call."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.units import inch
+    from reportlab.lib.colors import HexColor
+    from html.parser import HTMLParser
+    import io
+    import re
+    
+    # HTML to text converter
+    class HTMLStripper(HTMLParser):
+        def __init__(self):
+            super().__init__()
+            self.reset()
+            self.strict = False
+            self.convert_charrefs = True
+            self.text = []
+        
+        def handle_data(self, data):
+            self.text.append(data)
+        
+        def get_data(self):
+            return ''.join(self.text)
+    
+    def strip_html_tags(html):
+        """Remove all HTML tags and return plain text"""
+        stripper = HTMLStripper()
+        try:
+            stripper.feed(html)
+            return stripper.get_data()
+        except:
+            # Fallback to regex if parser fails
+            return re.sub('<[^<]+?>', '', html)
+    
+    # Create PDF buffer
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, 
+                           rightMargin=72, leftMargin=72,
+                           topMargin=72, bottomMargin=18)
+    
+    # Container for PDF elements
+    story = []
+    
+    # Define styles
+    styles = getSampleStyleSheet()
+    
+    # Custom title style
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=HexColor('#1e88e5'),
+        spaceAfter=30,
+        alignment=1,  # Center alignment
+        fontName='Helvetica-Bold'
+    )
+    
+    # Custom heading style
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=HexColor('#2c2c2c'),
+        spaceAfter=12,
+        spaceBefore=20,
+        fontName='Helvetica-Bold'
+    )
+    
+    # Custom body style
+    body_style = ParagraphStyle(
+        'CustomBody',
+        parent=styles['BodyText'],
+        fontSize=11,
+        textColor=HexColor('#333333'),
+        spaceAfter=12,
+        leading=14
+    )
+    
+    # Add title
+    story.append(Paragraph("Account Plan", title_style))
+    story.append(Spacer(1, 0.2*inch))
+    
+    # Split content into sections
+    lines = content.split('\n')
+    
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        
+        # Detect if it's a section heading
+        if "class='section-title'" in line or '<h1' in line.lower() or '<h2' in line.lower() or '<h3' in line.lower():
+            clean_line = strip_html_tags(line).strip()
+            if clean_line:
+                story.append(Paragraph(clean_line, heading_style))
+        # Detect if it contains strong/bold tags
+        elif '<strong>' in line.lower() or '<b>' in line.lower():
+            clean_line = strip_html_tags(line).strip()
+            if clean_line:
+                story.append(Paragraph(clean_line, heading_style))
+        else:
+            # Regular content
+            clean_line = strip_html_tags(line).strip()
+            if clean_line:
+                # Escape special characters for ReportLab
+                clean_line = clean_line.replace('&', '&amp;')
+                clean_line = clean_line.replace('<', '&lt;')
+                clean_line = clean_line.replace('>', '&gt;')
+                story.append(Paragraph(clean_line, body_style))
+    
+    # Build PDF
+    try:
+        doc.build(story)
+        pdf_data = buffer.getvalue()
+        buffer.close()
+        return pdf_data
+    except Exception as e:
+        print(f"PDF generation error: {e}")
+        buffer.close()
+
+
+# ------------------------------------------------------
+# Benchmark
+# ------------------------------------------------------
+def synthetic_plan(sections: int, bullets: int, seed: int = 7, bold: bool = True) -> str:
+    """Plan HTML shaped like LLM output: titles, paragraphs with bold (unless `bold=False`), bullet lists."""
+    rng = random.Random(seed)
+
+    def sentence(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+    parts = []
+    for i in range(sections):
+        parts.append(f"<div class='section-title'>{SECTION_TITLES[i % len(SECTION_TITLES)]}</div>")
+        parts.append(f"<p>{sentence(30)} <strong>{sentence(4)}</strong> {sentence(25)}</p>")
+        parts.append("<ul>")
+        for _ in range(bullets):
+            parts.append(f"<li><strong>{sentence(3)}</strong> {sentence(18)}</li>")
+        parts.append("</ul>")
+        parts.append(f"{sentence(20)}<br><br>{sentence(20)}")
+    html = "\n".join(parts)
+    return html if bold else re.sub(r"</?strong>", "", html)
+
+
+def page_count(pdf: bytes) -> int:
+    return len(re.findall(rb"/Type\s*/Page[^s]", pdf or b""))
+
+
+def measure(render, content, repeat):
+    """Best wall time over `repeat` untraced runs, then peak memory from one traced run."""
+    best = None
+    pdf = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pdf = render(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    # tracemalloc slows allocation-heavy code several-fold, so it stays out of the timed runs
+    tracemalloc.start()
+    render(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, pdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=60)
+    parser.add_argument("--bullets", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--plain", action="store_true", help="no inline bold in the synthetic plan")
+    args = parser.parse_args()
+
+    content = synthetic_plan(args.sections, args.bullets, bold=not args.plain)
+    print(f"Synthetic plan: {len(content) / 1024:.0f} KiB HTML, {args.sections} sections x {args.bullets} bullets"
+          f"{' (no inline bold)' if args.plain else ''}")
+
+    for name, render in (("legacy line-by-line", legacy_build_plan_pdf), ("single-pass builder", build_plan_pdf)):
+        elapsed, peak, pdf = measure(render, content, args.repeat)
+        print(f"{name:<20} {elapsed:7.2f}s  peak {peak / 2**20:7.1f} MiB  {page_count(pdf):4d} pages  "
+              f"{len(pdf or b'') / 1024:7.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
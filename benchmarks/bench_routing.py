@@ -0,0 +1,148 @@
+"""
+Intent routing benchmark: legacy regex/keyword cascade vs router.IntentRouter.
+
+Replays the recorded chat messages in benchmarks/chat_messages.jsonl, checks that
+both routers reach the same (intent, context, company, section) decision, and
+reports messages/sec for each.
+
+Run from the repository root:
+    python -m benchmarks.bench_routing [--repeat 2000]
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+
+from plan import SECTION_TITLES
+from router import ROUTER, USER_CONTEXTS, Route
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat_messages.jsonl")
+
+
+# ------------------------------------------------------
+# Legacy routing (the cascade process_user_message used before IntentRouter)
+# ------------------------------------------------------
+def legacy_detect_user_context(text: str):
+    text_lower = text.lower()
+    for context, keywords in USER_CONTEXTS.items():
+        if any(kw in text_lower for kw in keywords):
+            return context
+    return "general"
+
+
+def legacy_route(text: str, has_plan: bool = False, user_context: str = None) -> Route:
+    text_lower = text.lower().strip()
+
+    context_reveal_match = re.search(
+        r"(?:how|what).*(?:useful|relevant|helpful|mean).*(?:for me|to me).*(?:as a|as an|i'm|i am)\s+(?:a\s+)?(\w+)",
+        text_lower
+    )
+    if not context_reveal_match:
+        context_reveal_match = re.search(
+            r"(?:i'm|i am|as a|as an)\s+(?:a\s+)?(\w+).*(?:what|how|tell me|explain)",
+            text_lower
+        )
+    if context_reveal_match and has_plan:
+        new_context = legacy_detect_user_context(context_reveal_match.group(1))
+        if new_context != "general" and new_context != user_context:
+            return Route("context_switch", new_context, role=context_reveal_match.group(1))
+
+    role_question_match = re.search(
+        r"(?:as a|as an|i'm|i am)\s+(?:a\s+)?(\w+).*(?:what|how|which|tell|show)",
+        text_lower
+    )
+    if role_question_match and has_plan:
+        new_context = legacy_detect_user_context(role_question_match.group(1))
+        if new_context != "general":
+            return Route("role_question", new_context, role=role_question_match.group(1))
+
+    if user_context is None:
+        detected_context = legacy_detect_user_context(text)
+        if detected_context != "general":
+            user_context = detected_context
+
+    match = re.search(
+        r"(?:i'm|i am|as a)\s+(?:a\s+)?(\w+).*?(?:create|generate|make|build).*?(?:plan|research).*?(?:for|about|of)\s+(.+)",
+        text_lower
+    )
+    if match:
+        return Route("generate_plan", legacy_detect_user_context(match.group(1)),
+                     company=match.group(2).strip().title(), role=match.group(1))
+
+    match = re.search(r"(?:account\s+)?plan\s+(?:for|of|about|on)\s+(.+)", text_lower)
+    if match:
+        return Route("generate_plan", user_context or "general", company=match.group(1).strip().title())
+
+    if len(text.split()) <= 3 and text.replace(" ", "").replace("-", "").isalpha():
+        return Route("generate_plan", user_context or "general", company=text.strip().title())
+
+    role_match = re.search(r"(?:i'm|i am|as a)\s+(?:a\s+)?(\w+)", text_lower)
+    if role_match and not any(word in text_lower for word in ["create", "generate", "make"]):
+        detected_context = legacy_detect_user_context(role_match.group(1))
+        if detected_context != "general":
+            return Route("role_stated", detected_context, role=role_match.group(1))
+
+    for section in SECTION_TITLES:
+        if section.lower() in text_lower and any(
+            cmd in text_lower for cmd in ["update", "change", "regenerate", "rewrite"]
+        ):
+            return Route("update_section", user_context, section=section)
+
+    if has_plan and any(q in text_lower for q in ["what", "how", "which", "tell me", "show me", "opportunities", "useful", "relevant", "technologies", "tech stack"]):
+        return Route("followup", user_context)
+
+    return Route("default", user_context)
+
+
+# ------------------------------------------------------
+# Benchmark
+# ------------------------------------------------------
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def decision(route: Route):
+    return (route.intent, route.context, route.company, route.section)
+
+
+def throughput(route_fn, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for msg in corpus:
+            route_fn(msg["text"], msg["has_plan"], msg["user_context"])
+    elapsed = time.perf_counter() - start
+    return repeat * len(corpus) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000, help="passes over the corpus per router")
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+
+    mismatches = []
+    for msg in corpus:
+        old = decision(legacy_route(msg["text"], msg["has_plan"], msg["user_context"]))
+        new = decision(ROUTER.route(msg["text"], msg["has_plan"], msg["user_context"]))
+        if old != new:
+            mismatches.append((msg["text"], old, new))
+
+    legacy_rate = throughput(legacy_route, corpus, args.repeat)
+    router_rate = throughput(ROUTER.route, corpus, args.repeat)
+
+    print(f"Corpus: {len(corpus)} messages x {args.repeat} passes")
+    print(f"Legacy cascade : {legacy_rate:12,.0f} messages/sec")
+    print(f"IntentRouter   : {router_rate:12,.0f} messages/sec  ({router_rate / legacy_rate:.2f}x)")
+    print(f"Same decision  : {len(corpus) - len(mismatches)}/{len(corpus)}")
+    for text, old, new in mismatches:
+        # Expected only where a context keyword matched mid-word in the legacy substring scan
+        print(f"  differs: {text!r}\n    legacy: {old}\n    router: {new}")
+
+
+if __name__ == "__main__":
+    main()
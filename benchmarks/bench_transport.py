@@ -0,0 +1,107 @@
+"""
+Connection reuse benchmark: a fresh connection per search vs the shared pool.
+
+Sends the same SerpAPI-style requests to a local fake server (zero server-side
+latency, so connection setup dominates) twice: once opening a new client per
+request, as the per-query search client used to, and once through the shared
+keep-alive pool (transport.client). Reports per-request latency and how many
+connections each mode opened. With --tls the fake server speaks HTTPS with a
+throwaway self-signed certificate (needs the openssl CLI), which adds the TLS
+handshake that pooling saves.
+
+Run from the repository root:
+    python -m benchmarks.bench_transport [--requests 200] [--concurrency 4] [--tls]
+"""
+
+import argparse
+import os
+import ssl
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+import transport
+from benchmarks.fake_servers import LatencyProfile, start_fake_serpapi
+from utils import percentile
+
+
+def make_certificate(directory: str):
+    """Self-signed certificate for localhost; returns (cert_path, key_path)."""
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+         "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def run(get, urls, concurrency: int):
+    def timed(url):
+        start = time.perf_counter()
+        get(url).raise_for_status()
+        return time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        timings = list(pool.map(timed, urls))
+    return timings, time.perf_counter() - started
+
+
+def report(name: str, timings, elapsed: float, connections: int):
+    print(
+        f"  {name:<8} p50={percentile(timings, 50) * 1000:6.2f}ms  p95={percentile(timings, 95) * 1000:6.2f}ms  "
+        f"{len(timings) / elapsed:7.0f} req/s  connections={connections}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per mode")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("--tls", action="store_true", help="serve HTTPS with a self-signed certificate")
+    args = parser.parse_args()
+
+    server = start_fake_serpapi(LatencyProfile(median=0.0))
+    base = server.url
+    cafile = None
+    tmp = tempfile.TemporaryDirectory()
+    if args.tls:
+        cert, key = make_certificate(tmp.name)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.httpd.socket = context.wrap_socket(server.httpd.socket, server_side=True)
+        base = base.replace("http://127.0.0.1", "https://localhost")
+        # The shared client reads SSL_CERT_FILE when it is first created; trust the throwaway cert
+        os.environ["SSL_CERT_FILE"] = cafile = cert
+
+    urls = [f"{base}/search.json?engine=google&q=Company+{i}&num=6" for i in range(args.requests)]
+    print(f"{args.requests} requests, {args.concurrency} concurrent, {'HTTPS' if args.tls else 'HTTP'} "
+          f"(pool size {transport.HTTP_POOL_SIZE}, HTTP/2 {'on' if transport.HTTP2_ENABLED else 'off'})")
+
+    # Built once, so the fresh mode pays for connections and handshakes, not for loading CA bundles
+    verify = ssl.create_default_context(cafile=cafile)
+
+    def fresh(url):
+        with httpx.Client(verify=verify) as http:
+            return http.get(url)
+
+    timings, elapsed = run(fresh, urls, args.concurrency)
+    report("fresh", timings, elapsed, len(urls))
+
+    pooled = transport.client("serpapi")
+    timings, elapsed = run(pooled.get, urls, args.concurrency)
+    stats = transport.pool_stats()["providers"]["serpapi"]
+    report("pooled", timings, elapsed, stats["new_connections"])
+    print(f"  pooled reuse ratio: {stats['reuse_ratio']:.1%}, TLS handshakes: {stats['tls_handshakes']}")
+
+    transport.close()
+    server.stop()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Local stand-ins for the Groq chat-completions and SerpAPI search endpoints.
+
+Both servers are plain stdlib HTTP servers on 127.0.0.1 with configurable latency
+distributions and error rates, so the real client libraries can be exercised
+end to end without any network access.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from plan import SECTION_TITLES
+
+FILLER = (
+    "revenue growth platform customers enterprise cloud market share pipeline partners expansion "
+    "pricing strategy hiring signals retention analytics security integration roadmap leadership"
+).split()
+
+
+@dataclass
+class LatencyProfile:
+    """
+    Latency model for one fake endpoint.
+
+    Time to first byte is log-normal around `median` seconds (`sigma` controls the
+    tail); streamed LLM output is then paced at `tokens_per_sec`.
+    """
+
+    median: float = 0.3
+    sigma: float = 0.5
+    tokens_per_sec: float = 250.0
+    error_rate: float = 0.0
+    error_status: int = 429
+
+    def first_byte_delay(self, rng: random.Random) -> float:
+        return rng.lognormvariate(0, self.sigma) * self.median if self.median > 0 else 0.0
+
+    def should_fail(self, rng: random.Random) -> bool:
+        return self.error_rate > 0 and rng.random() < self.error_rate
+
+
+class _Server:
+    """Run a ThreadingHTTPServer on an ephemeral localhost port in a daemon thread."""
+
+    def __init__(self, handler_cls, profile: LatencyProfile, seed: int):
+        handler = type(handler_cls.__name__, (handler_cls,), {
+            "profile": profile,
+            "rng": random.Random(seed),
+            "rng_lock": threading.Lock(),
+            "stats": {"requests": 0, "errors": 0},
+        })
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.handler = handler
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def stats(self) -> dict:
+        return dict(self.handler.stats)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _BaseHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, a reused connection waits on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _draw(self):
+        """Sample (delay, fail) under a lock so concurrent requests stay reproducible."""
+        with self.rng_lock:
+            self.stats["requests"] += 1
+            fail = self.profile.should_fail(self.rng)
+            if fail:
+                self.stats["errors"] += 1
+            return self.profile.first_byte_delay(self.rng), fail, self.rng.random()
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# ------------------------------------------------------
+# Fake Groq (OpenAI-compatible chat completions)
+# ------------------------------------------------------
+def _fake_completion(prompt: str, max_tokens: int, seed: float) -> str:
+    rng = random.Random(seed)
+
+    def words(n):
+        return " ".join(rng.choice(FILLER) for _ in range(n))
+
+    if "EXACT headings" in prompt:
+        per_section = max(10, max_tokens // (len(SECTION_TITLES) * 2))
+        return "\n".join(
+            f"<div class='section-title'>{title}</div>\n<ul><li><strong>{words(2)}</strong> {words(per_section)}</li></ul>"
+            for title in SECTION_TITLES
+        )
+    return f"<ul><li>{words(max(5, max_tokens // 3))}</li></ul>"
+
+
+class GroqHandler(_BaseHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "not found"}})
+
+        delay, fail, seed = self._draw()
+        time.sleep(delay)
+        if fail:
+            return self._send_json(self.profile.error_status, {"error": {"message": "fake upstream error", "type": "rate_limit_exceeded"}})
+
+        prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+        text = _fake_completion(prompt, int(request.get("max_tokens") or 256), seed)
+        tokens = text.split(" ")
+        model = request.get("model", "fake")
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(tokens), "total_tokens": len(prompt) // 4 + len(tokens)}
+        rate = self.profile.tokens_per_sec
+
+        if not request.get("stream"):
+            time.sleep(len(tokens) / rate if rate else 0)
+            return self._send_json(200, {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            chunk = {
+                "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {"content": token if i == 0 else " " + token}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            if rate:
+                time.sleep(1 / rate)
+        final = {
+            "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            "x_groq": {"usage": usage},
+        }
+        self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.wfile.flush()
+        self.close_connection = True
+
+
+# ------------------------------------------------------
+# Fake SerpAPI (Google web + news results)
+# ------------------------------------------------------
+class SerpApiHandler(_BaseHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path not in ("/search", "/search.json"):
+            return self._send_json(404, {"error": "not found"})
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        delay, fail, seed = self._draw()
+        time.sleep(delay)
+        if fail:
+            return self._send_json(self.profile.error_status, {"error": "fake upstream error"})
+
+        rng = random.Random(seed)
+        query = params.get("q", "")
+        company = re.split(r"\s+", query.strip())[0] if query.strip() else "Company"
+        num = int(params.get("num", 10))
+        results = [
+            {
+                "position": i + 1,
+                "title": f"{company} {' '.join(rng.choice(FILLER) for _ in range(4))}",
+                "snippet": f"{company} " + " ".join(rng.choice(FILLER) for _ in range(25)) + ".",
+                "link": f"https://example.com/{company.lower()}/{params.get('tbm', 'web')}/{rng.randrange(10**6)}",
+            }
+            for i in range(num)
+        ]
+        self._send_json(200, {"search_metadata": {"status": "Success"}, "organic_results": results})
+
+
+def start_fake_groq(profile: LatencyProfile = None, seed: int = 1) -> _Server:
+    return _Server(GroqHandler, profile or LatencyProfile(), seed).start()
+
+
+def start_fake_serpapi(profile: LatencyProfile = None, seed: int = 2) -> _Server:
+    return _Server(SerpApiHandler, profile or LatencyProfile(median=0.5, sigma=0.4), seed).start()
@@ -0,0 +1,336 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ------------------------------------------------------
+# Persistent search cache (SQLite, per-mode TTL)
+# ------------------------------------------------------
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", ".cache/search_cache.sqlite3")
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(24 * 3600)))
+SEARCH_CACHE_NEWS_TTL = int(os.getenv("SEARCH_CACHE_NEWS_TTL", str(30 * 60)))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "5000"))
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "1") != "0"
+
+# Only these params change what SerpAPI returns (api_key must never be a key part)
+CACHE_KEY_PARAMS = ("q", "num", "tbm", "gl", "hl")
+
+
+def search_cache_key(params: dict) -> str:
+    """Build a normalized cache key from the query-shaping params."""
+    normalized = {}
+    for name in CACHE_KEY_PARAMS:
+        value = params.get(name)
+        if value is None:
+            continue
+        value = " ".join(str(value).lower().split())
+        normalized[name] = value
+    return json.dumps(normalized, sort_keys=True)
+
+
+class SearchCache:
+    """
+    On-disk TTL cache for search results, shared by every process using the same file.
+
+    News lookups expire after `news_ttl` seconds, everything else after `ttl`.
+    When the table grows past `max_entries` the least recently used rows are evicted.
+    """
+
+    def __init__(self, path=SEARCH_CACHE_PATH, ttl=SEARCH_CACHE_TTL,
+                 news_ttl=SEARCH_CACHE_NEWS_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.news_ttl = news_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS search_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_accessed ON search_cache (accessed_at)")
+        self._conn.commit()
+
+    def ttl_for(self, params: dict) -> int:
+        return self.news_ttl if params.get("tbm") == "nws" else self.ttl
+
+    def get(self, params: dict):
+        """Return cached items for these params, or None on miss/expiry."""
+        key = search_cache_key(params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE search_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, params: dict, items):
+        """Store items for these params and evict if over the size bound."""
+        key = search_cache_key(params)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(items), now + self.ttl_for(params), now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """Drop expired rows first, then least recently used rows beyond max_entries."""
+        cur = self._conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (now,))
+        self.evictions += cur.rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cur = self._conn.execute(
+                "DELETE FROM search_cache WHERE key IN "
+                "(SELECT key FROM search_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += cur.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": size,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    """Return the process-wide SearchCache (created lazily), or None when disabled."""
+    global _search_cache
+    if not SEARCH_CACHE_ENABLED:
+        return None
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None:
+                _search_cache = SearchCache()
+    return _search_cache
+
+
+# ------------------------------------------------------
+# In-process LLM response cache (LRU bounded by bytes)
+# ------------------------------------------------------
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "0")) or None
+
+
+def response_cache_key(model: str, prompt: str, max_tokens: int) -> str:
+    """Hash the fully rendered prompt together with the model settings."""
+    raw = f"{model}\0{max_tokens}\0{prompt}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache for completion text.
+
+    Capacity is bounded by the UTF-8 size of the stored values (`max_bytes`);
+    entries older than `ttl` seconds are treated as misses when `ttl` is set.
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_MAX_BYTES, ttl=RESPONSE_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries = OrderedDict()  # key -> (value, size, stored_at)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._bytes -= size
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = len(self._entries), self._bytes
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+response_cache = ResponseCache()
+
+
+# ------------------------------------------------------
+# Warm plan store (SQLite, filled ahead of time by prefetch.py)
+# ------------------------------------------------------
+PLAN_STORE_PATH = os.getenv("PLAN_STORE_PATH", ".cache/plans.sqlite3")
+# Older prefetched plans are not served to interactive requests
+PLAN_STORE_MAX_AGE = int(os.getenv("PLAN_STORE_MAX_AGE", str(24 * 3600)))
+PLAN_STORE_ENABLED = os.getenv("PLAN_STORE_ENABLED", "1") != "0"
+
+
+def plan_store_key(company: str, user_context: str) -> str:
+    """Normalized company + user context."""
+    return f"{' '.join(company.lower().split())}|{user_context or 'general'}"
+
+
+class PlanStore:
+    """
+    Prefetched plans (AccountPlan.to_dict() snapshots) keyed by company and user context.
+
+    Shared through the SQLite file by the prefetcher process and every process
+    serving interactive requests.
+    """
+
+    def __init__(self, path=PLAN_STORE_PATH, max_age=PLAN_STORE_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS plans (
+                key TEXT PRIMARY KEY,
+                plan TEXT NOT NULL,
+                generated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, company: str, user_context: str, max_age: float = None):
+        """The stored plan dict, or None if missing or older than `max_age` (default self.max_age)."""
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT plan, generated_at FROM plans WHERE key = ?", (plan_store_key(company, user_context),)
+            ).fetchone()
+            if row is None or row[1] < time.time() - max_age:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, company: str, user_context: str, plan: dict, generated_at: float = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plans (key, plan, generated_at) VALUES (?, ?, ?)",
+                (plan_store_key(company, user_context), json.dumps(plan), generated_at or time.time()),
+            )
+            self._conn.commit()
+
+    def generated_at(self) -> dict:
+        """{key: generated_at} for every stored plan, however old."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT key, generated_at FROM plans").fetchall())
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM plans")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": size,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_plan_store = None
+_plan_store_lock = threading.Lock()
+
+
+def get_plan_store():
+    """Return the process-wide PlanStore (created lazily), or None when disabled."""
+    global _plan_store
+    if not PLAN_STORE_ENABLED:
+        return None
+    if _plan_store is None:
+        with _plan_store_lock:
+            if _plan_store is None:
+                _plan_store = PlanStore()
+    return _plan_store
@@ -0,0 +1,116 @@
+import hashlib
+import os
+from collections import deque
+
+from retrieval import tokenize
+
+# ------------------------------------------------------
+# Near-duplicate detection (MinHash + LSH bands)
+# ------------------------------------------------------
+NEAR_DUPLICATE_FILTER = os.getenv("NEAR_DUPLICATE_FILTER", "1") != "0"
+# Word/word-pair Jaccard similarity at or above which two snippets count as near-duplicates
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.7"))
+# Texts remembered per LSH bucket (most recent kept), bounding the exact comparisons per text
+NEAR_DUPLICATE_BUCKET_LIMIT = int(os.getenv("NEAR_DUPLICATE_BUCKET_LIMIT", "16"))
+
+NUM_BINS = 64  # MinHash signature length
+EMPTY = 1 << 64
+# Added per bin of distance when densifying, so borrowed values never equal real ones
+DENSIFY_OFFSET = 1 << 58
+
+
+def lsh_rows(threshold: float, num_bins: int = NUM_BINS, recall: float = 0.95) -> int:
+    """
+    Most rows per band (fewest, most selective buckets) that still make a pair at
+    `threshold` similarity share a bucket with probability >= `recall`.
+    """
+    best = 1
+    for rows in range(1, num_bins + 1):
+        bands = num_bins // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            best = rows
+    return best
+
+
+class NearDuplicateFilter:
+    """
+    Streaming near-duplicate filter: `seen(text)` is True if an earlier text has
+    Jaccard similarity >= `threshold` with it (over words and word pairs); otherwise
+    the text is remembered and False is returned.
+
+    Each text gets a 64-bin one-permutation MinHash (one hash per feature, densified
+    for empty bins). Signatures are cut into bands; only texts sharing a band bucket
+    are compared exactly. A bucket keeps only its `bucket_limit` most recent texts:
+    a feature shared by most texts (e.g. a word in every title) can fill one band of
+    short texts through densification, and that bucket would otherwise grow with
+    the input and make the filter quadratic.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD, bucket_limit: int = NEAR_DUPLICATE_BUCKET_LIMIT):
+        self.threshold = threshold
+        self.bucket_limit = bucket_limit
+        self.rows = lsh_rows(threshold)
+        self.bands = NUM_BINS // self.rows
+        self.buckets = [{} for _ in range(self.bands)]  # per band: key -> indexes of recent texts
+        self.texts = []  # feature sets of the remembered texts, by index
+        self._hashes = {}  # feature -> 64-bit hash, shared by every text in this run
+
+    def features(self, text: str) -> frozenset:
+        tokens = tokenize(text)
+        result = set()
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            h = self._hashes.get(feature)
+            if h is None:
+                h = self._hashes[feature] = int.from_bytes(
+                    hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little"
+                )
+            result.add(h)
+        return frozenset(result)
+
+    @staticmethod
+    def signature(features) -> list:
+        """One-permutation MinHash: low 6 bits pick the bin, the rest is the value kept at its minimum."""
+        sig = [EMPTY] * NUM_BINS
+        for h in features:
+            b, value = h & (NUM_BINS - 1), h >> 6
+            if value < sig[b]:
+                sig[b] = value
+        # Densify: an empty bin borrows from the next non-empty bin to its right
+        if EMPTY in sig:
+            dense = list(sig)
+            for b in range(NUM_BINS):
+                if sig[b] == EMPTY:
+                    distance = 1
+                    while sig[(b + distance) % NUM_BINS] == EMPTY:
+                        distance += 1
+                    dense[b] = sig[(b + distance) % NUM_BINS] + distance * DENSIFY_OFFSET
+            sig = dense
+        return sig
+
+    def seen(self, text: str) -> bool:
+        features = self.features(text)
+        if not features:
+            return False
+        sig = self.signature(features)
+        rows = self.rows
+        # One int per band: hashing the slice once is cheaper than keying dicts by tuples,
+        # and a rare hash collision only costs an extra exact comparison
+        keys = [hash(tuple(sig[start:start + rows])) for start in range(0, self.bands * rows, rows)]
+        texts = self.texts
+        checked = set()
+        for buckets, key in zip(self.buckets, keys):
+            for index in buckets.get(key, ()):
+                if index in checked:
+                    continue
+                checked.add(index)
+                other = texts[index]
+                if len(features & other) >= self.threshold * len(features | other):
+                    return True
+        index = len(texts)
+        texts.append(features)
+        for buckets, key in zip(self.buckets, keys):
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = deque(maxlen=self.bucket_limit)
+            bucket.append(index)
+        return False
@@ -0,0 +1,135 @@
+import os
+import threading
+from collections import deque
+
+from utils import percentile
+
+# ------------------------------------------------------
+# Model tiers and task routing (overridable via env)
+# ------------------------------------------------------
+MODEL_TIERS = {
+    "heavy": os.getenv("GROQ_HEAVY_MODEL", "llama-3.3-70b-versatile"),
+    "fast": os.getenv("GROQ_FAST_MODEL", "llama-3.1-8b-instant"),
+}
+
+# Seconds one attempt may run (including rate-limit queueing) before the next model is tried
+TIER_TIMEOUTS = {
+    "heavy": float(os.getenv("GROQ_HEAVY_TIMEOUT", "60")),
+    "fast": float(os.getenv("GROQ_FAST_TIMEOUT", "10")),
+}
+
+# Default tier per task; MODEL_TIER_<TASK>=fast|heavy overrides one (e.g. MODEL_TIER_SECTION=fast)
+TASK_TIERS = {
+    "plan": "heavy",      # full plans, in one completion or one per section
+    "section": "heavy",   # rewriting one section of an existing plan
+    "followup": "fast",   # questions about the plan
+    "summary": "fast",    # role-specific summaries
+}
+
+# Seconds a whole call may take, retries and fallback included; LLM_DEADLINE_<TASK> overrides one
+TASK_DEADLINES = {
+    "plan": 120.0,
+    "section": 45.0,
+    "followup": 15.0,
+    "summary": 15.0,
+}
+
+# On error or timeout, retry the call on the other tier's model
+MODEL_FALLBACK = os.getenv("MODEL_FALLBACK", "1") != "0"
+
+# Recent successful calls kept per model, and per (model, task), for latency percentiles
+LATENCY_WINDOW = int(os.getenv("MODEL_LATENCY_WINDOW", "200"))
+
+
+def task_tier(task: str) -> str:
+    tier = os.getenv(f"MODEL_TIER_{task.upper()}") or TASK_TIERS.get(task, "heavy")
+    if tier not in MODEL_TIERS:
+        raise ValueError(f"Unknown model tier {tier!r} for task {task!r}; expected one of {list(MODEL_TIERS)}")
+    return tier
+
+
+def task_deadline(task: str) -> float:
+    return float(os.getenv(f"LLM_DEADLINE_{task.upper()}") or TASK_DEADLINES.get(task, TASK_DEADLINES["plan"]))
+
+
+def route(task: str):
+    """[(model, timeout_seconds)] to try for `task`, in order: its tier's model, then the fallback."""
+    primary = task_tier(task)
+    tiers = [primary] + ([tier for tier in MODEL_TIERS if tier != primary] if MODEL_FALLBACK else [])
+    attempts = []
+    for tier in tiers:
+        if MODEL_TIERS[tier] not in (model for model, _ in attempts):
+            attempts.append((MODEL_TIERS[tier], TIER_TIMEOUTS[tier]))
+    return attempts
+
+
+def model_for(task: str) -> str:
+    """The model a task is routed to first."""
+    return route(task)[0][0]
+
+
+class ModelStats:
+    """
+    Per-model call outcomes and rolling windows of successful latencies, for reviewing
+    routing and for hedging. Latencies are also kept per (model, task), since one model
+    serves tasks of very different lengths (full plans vs one-section rewrites).
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, duration: float, status: str = "ok", task: str = None):
+        with self._lock:
+            entry = self._models.get(model)
+            if entry is None:
+                entry = self._models[model] = {"latencies": deque(maxlen=self.window), "statuses": {}, "tasks": {},
+                                               "task_latencies": {}}
+            entry["statuses"][status] = entry["statuses"].get(status, 0) + 1
+            if task:
+                entry["tasks"][task] = entry["tasks"].get(task, 0) + 1
+            if status == "ok":
+                entry["latencies"].append(duration)
+                if task:
+                    window = entry["task_latencies"].get(task)
+                    if window is None:
+                        window = entry["task_latencies"][task] = deque(maxlen=self.window)
+                    window.append(duration)
+
+    def latency(self, model: str, pct: float, min_samples: int = 1, task: str = None):
+        """
+        Recent `pct` percentile latency of successful calls to `model` (only those for
+        `task`, if given), or None with fewer than `min_samples`.
+        """
+        with self._lock:
+            entry = self._models.get(model)
+            if entry is None:
+                latencies = []
+            elif task is None:
+                latencies = list(entry["latencies"])
+            else:
+                latencies = list(entry["task_latencies"].get(task, ()))
+        return percentile(latencies, pct) if latencies and len(latencies) >= min_samples else None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            models = {model: (list(e["latencies"]), dict(e["statuses"]), dict(e["tasks"]))
+                      for model, e in self._models.items()}
+        return {
+            model: {
+                "calls": statuses,
+                "tasks": tasks,
+                "p50_s": percentile(latencies, 50) if latencies else None,
+                "p95_s": percentile(latencies, 95) if latencies else None,
+            }
+            for model, (latencies, statuses, tasks) in models.items()
+        }
+
+
+model_stats = ModelStats()
+
+
+def routing_table() -> dict:
+    """{task: [models in fallback order]} as currently configured."""
+    return {task: [model for model, _ in route(task)] for task in TASK_TIERS}
@@ -0,0 +1,370 @@
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+
+from reportlab.lib.colors import HexColor
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+from telemetry import span
+
+# ------------------------------------------------------
+# PDF cache settings
+# ------------------------------------------------------
+PDF_CACHE_SIZE = int(os.getenv("PDF_CACHE_SIZE", "16"))
+# Build PDFs on a background worker so a Streamlit rerun never waits on ReportLab
+PDF_BACKGROUND = os.getenv("PDF_BACKGROUND", "0") == "1"
+# Seconds a failed build is remembered, so reruns do not resubmit it every time
+PDF_FAILURE_TTL = float(os.getenv("PDF_FAILURE_TTL", "60"))
+
+
+# ------------------------------------------------------
+# Paragraph styles (built once)
+# ------------------------------------------------------
+_base_styles = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_base_styles['Heading1'],
+    fontSize=24,
+    textColor=HexColor('#1e88e5'),
+    spaceAfter=30,
+    alignment=1,  # Center alignment
+    fontName='Helvetica-Bold'
+)
+
+HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_base_styles['Heading2'],
+    fontSize=16,
+    textColor=HexColor('#2c2c2c'),
+    spaceAfter=12,
+    spaceBefore=20,
+    fontName='Helvetica-Bold'
+)
+
+BODY_STYLE = ParagraphStyle(
+    'CustomBody',
+    parent=_base_styles['BodyText'],
+    fontSize=11,
+    textColor=HexColor('#333333'),
+    spaceAfter=12,
+    leading=14
+)
+
+BULLET_STYLE = ParagraphStyle(
+    'CustomBullet',
+    parent=BODY_STYLE,
+    spaceAfter=4
+)
+
+LIST_INDENT = 18  # points per nesting level
+_bullet_styles = {}
+
+
+def bullet_style(depth: int) -> ParagraphStyle:
+    """BULLET_STYLE indented for list nesting `depth` (1 = top level), bullet in the gutter."""
+    style = _bullet_styles.get(depth)
+    if style is None:
+        style = _bullet_styles[depth] = ParagraphStyle(
+            f'CustomBullet{depth}',
+            parent=BULLET_STYLE,
+            leftIndent=LIST_INDENT * depth,
+            bulletIndent=LIST_INDENT * depth - 12,
+            bulletFontSize=8,
+        )
+    return style
+
+
+# ------------------------------------------------------
+# HTML -> ReportLab flowables (single streaming parse)
+# ------------------------------------------------------
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+INLINE_TAGS = {"strong": "b", "b": "b", "em": "i", "i": "i", "u": "u"}
+BLOCK_TAGS = {"p", "div", "section", "article", "blockquote", "tr"}
+PARAGRAPH_BREAK_RE = re.compile(r"\n[ \t]*\n")
+WHITESPACE_RE = re.compile(r"\s+")
+ADJACENT_TAGS_RE = re.compile(r"</([biu])><\1>")
+
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+class PlanFlowableBuilder(HTMLParser):
+    """
+    Turn plan HTML into ReportLab flowables in one pass.
+
+    Section titles and <h*> become headings, <ul>/<ol> items become indented
+    paragraphs with a bullet (or number) each, <strong>/<em> stay inline
+    bold/italic, and blank lines or <br><br> split paragraphs.
+
+    A paragraph with no visible inline styling is emitted as one plain run, so
+    ReportLab lays it out with its single-fragment line breaker; styled ones take
+    the per-fragment breaker, which is roughly 2-3x slower per paragraph.
+
+    List items are separate top-level flowables rather than one ListFlowable per
+    list: ReportLab re-splits a large ListFlowable at every page break, which made
+    long lists quadratic to lay out.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.story = []
+        self._markup = []      # ReportLab inline markup of the paragraph being built
+        self._has_text = False
+        self._styled = False   # the paragraph has text inside an inline tag
+        self._inline = []      # open inline tags (b / i / u)
+        self._heading = 0      # > 0 while inside a heading element
+        self._divs = []        # per open <div>: True if it is a section title
+        self._lists = []       # open lists: {"ordered": bool, "count": items started}
+        self._bullet = None    # bullet text for the next paragraph of the current <li>
+
+    # ---------- paragraph assembly ----------
+    def _flush(self):
+        while self._markup and self._markup[-1] == "<br/>":
+            self._markup.pop()
+        if self._has_text:
+            styled = self._styled or "<br/>" in self._markup
+            if styled:
+                markup = "".join(self._markup) + "".join(f"</{tag}>" for tag in reversed(self._inline))
+                markup = ADJACENT_TAGS_RE.sub("", markup)
+            else:
+                # Tags wrap only whitespace: keep the (escaped, so never "<"-led) text as one plain run
+                markup = "".join(part for part in self._markup if not part.startswith("<"))
+            if self._heading:
+                para = Paragraph(markup.strip(), HEADING_STYLE)
+            elif self._lists:
+                # Only an item's first paragraph carries the bullet; later ones align with its text
+                para = Paragraph(markup.strip(), bullet_style(len(self._lists)), bulletText=self._bullet)
+                self._bullet = None
+            else:
+                para = Paragraph(markup.strip(), BODY_STYLE)
+            if not styled and len(para.frags) > 1:
+                # ReportLab starts a fragment at every entity (&amp; ...); all share one style here
+                para.frags = [para.frags[0].clone(text="".join(frag.text for frag in para.frags))]
+            self.story.append(para)
+        # Inline formatting that spans a paragraph break continues in the next paragraph
+        self._markup = [f"<{tag}>" for tag in self._inline]
+        self._has_text = False
+        self._styled = False
+
+    # ---------- HTMLParser callbacks ----------
+    def handle_starttag(self, tag, attrs):
+        if tag in INLINE_TAGS:
+            self._inline.append(INLINE_TAGS[tag])
+            self._markup.append(f"<{INLINE_TAGS[tag]}>")
+        elif tag == "br":
+            if self._markup and self._markup[-1] == "<br/>":
+                self._markup.pop()
+                self._flush()
+            elif self._has_text:
+                self._markup.append("<br/>")
+        elif tag in ("ul", "ol"):
+            self._flush()
+            self._bullet = None
+            self._lists.append({"ordered": tag == "ol", "count": 0})
+        elif tag == "li":
+            self._flush()
+            if self._lists:
+                lst = self._lists[-1]
+                lst["count"] += 1
+                self._bullet = f"{lst['count']}." if lst["ordered"] else "\u2022"
+        elif tag in HEADING_TAGS:
+            self._flush()
+            self._heading += 1
+        elif tag == "div":
+            self._flush()
+            is_title = "section-title" in (dict(attrs).get("class") or "")
+            self._divs.append(is_title)
+            if is_title:
+                self._heading += 1
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_startendtag(self, tag, attrs):
+        if tag == "br":
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in INLINE_TAGS:
+            mapped = INLINE_TAGS[tag]
+            if mapped in self._inline:
+                # Close in nesting order even if the HTML itself was sloppy
+                index = len(self._inline) - 1 - self._inline[::-1].index(mapped)
+                for open_tag in reversed(self._inline[index:]):
+                    self._markup.append(f"</{open_tag}>")
+                reopened = self._inline[index + 1:]
+                del self._inline[index:]
+                for open_tag in reopened:
+                    self._inline.append(open_tag)
+                    self._markup.append(f"<{open_tag}>")
+        elif tag in ("ul", "ol"):
+            self._flush()
+            self._bullet = None
+            if self._lists:
+                self._lists.pop()
+        elif tag == "li":
+            self._flush()
+        elif tag in HEADING_TAGS:
+            self._flush()
+            self._heading = max(0, self._heading - 1)
+        elif tag == "div":
+            self._flush()
+            if self._divs and self._divs.pop():
+                self._heading = max(0, self._heading - 1)
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        parts = PARAGRAPH_BREAK_RE.split(data)
+        for i, part in enumerate(parts):
+            if i:
+                self._flush()
+            text = WHITESPACE_RE.sub(" ", part)
+            if not text.strip() and not self._has_text:
+                continue
+            self._markup.append(_escape(text))
+            if text.strip():
+                self._has_text = True
+                self._styled = self._styled or bool(self._inline)
+
+    def finish(self):
+        """Close anything left open and return the flowables."""
+        self.close()
+        self._flush()
+        while self._lists:
+            self.handle_endtag("ol" if self._lists[-1]["ordered"] else "ul")
+        # Hand the flowables over: doc.build() drops each one once laid out, unless we still hold it
+        story, self.story = self.story, []
+        return story
+
+
+def build_plan_pdf(content: str):
+    """Render account plan HTML to PDF bytes (None if ReportLab fails)"""
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter,
+                            rightMargin=72, leftMargin=72,
+                            topMargin=72, bottomMargin=18)
+
+    story = [Paragraph("Account Plan", TITLE_STYLE), Spacer(1, 0.2*inch)]
+
+    try:
+        with span("pdf_build", chars=len(content)) as stage:
+            builder = PlanFlowableBuilder()
+            builder.feed(content)
+            story.extend(builder.finish())
+            doc.build(story)
+            pdf = buffer.getvalue()
+            stage.set(bytes=len(pdf))
+            return pdf
+    except Exception as e:
+        print(f"PDF generation error: {e}")
+        return None
+    finally:
+        buffer.close()
+
+
+# ------------------------------------------------------
+# Memoized export
+# ------------------------------------------------------
+def plan_digest(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class PdfCache:
+    """
+    Bounded LRU of rendered PDFs keyed by a hash of the plan HTML.
+
+    get_pdf() renders only when the plan content changed; with `background=True`
+    it returns None while a worker thread builds the PDF and the bytes on a later call.
+    A failed build is remembered for `failure_ttl` seconds: get_pdf() returns None
+    for that content (see has_failed) instead of rendering it again.
+    """
+
+    def __init__(self, max_entries=PDF_CACHE_SIZE, background=PDF_BACKGROUND, renderer=build_plan_pdf,
+                 failure_ttl=PDF_FAILURE_TTL):
+        self.max_entries = max_entries
+        self.background = background
+        self.renderer = renderer
+        self.failure_ttl = failure_ttl
+        self.builds = 0
+        self.hits = 0
+        self._entries = OrderedDict()  # digest -> pdf bytes
+        self._pending = {}             # digest -> Future
+        self._failed = {}              # digest -> monotonic time of the failed build
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf") if background else None
+
+    def _store(self, digest, pdf):
+        with self._lock:
+            self._pending.pop(digest, None)
+            if pdf is None:
+                self._failed[digest] = time.monotonic()
+                return
+            self._entries[digest] = pdf
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _build(self, digest, content):
+        self.builds += 1
+        pdf = None
+        try:
+            pdf = self.renderer(content)
+        except Exception as e:
+            print(f"PDF generation error: {e}")
+        finally:
+            # Also on failure, so the build is no longer pending
+            self._store(digest, pdf)
+        return pdf
+
+    def _recently_failed(self, digest) -> bool:
+        failed_at = self._failed.get(digest)
+        if failed_at is None:
+            return False
+        if time.monotonic() - failed_at < self.failure_ttl:
+            return True
+        del self._failed[digest]
+        return False
+
+    def get_pdf(self, content: str):
+        digest = plan_digest(content)
+        with self._lock:
+            pdf = self._entries.get(digest)
+            if pdf is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return pdf
+            if self._recently_failed(digest):
+                return None
+            if self.background:
+                if digest not in self._pending:
+                    self._pending[digest] = self._pool.submit(self._build, digest, content)
+                return None
+        return self._build(digest, content)
+
+    def is_pending(self, content: str) -> bool:
+        with self._lock:
+            return plan_digest(content) in self._pending
+
+    def has_failed(self, content: str) -> bool:
+        """True if the last build of this content failed less than `failure_ttl` seconds ago."""
+        with self._lock:
+            return self._recently_failed(plan_digest(content))
+
+
+pdf_cache = PdfCache()
+
+
+def get_plan_pdf(content: str):
+    """PDF bytes for this plan HTML, rendered at most once per distinct content."""
+    return pdf_cache.get_pdf(content)
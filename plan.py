@@ -0,0 +1,199 @@
+import re
+import time
+
+from retrieval import FOLLOWUP_TOKEN_BUDGET, PlanIndex
+
+# ------------------------------------------------------
+# Section Titles (fixed sequence)
+# ------------------------------------------------------
+SECTION_TITLES = [
+    "Company Overview",
+    "Recent News",
+    "Products / Services",
+    "Competitors",
+    "Key Opportunities / Signals",
+    "Suggested Next Steps",
+]
+
+# Sections whose content depends on the user's role; the rest are the same for every role
+ROLE_DEPENDENT_SECTIONS = ["Key Opportunities / Signals", "Suggested Next Steps"]
+
+# Either quote style: the model does not always copy the prompt's single quotes
+SECTION_HEADING_RE = re.compile(r"<div class=(['\"])section-title\1>(.*?)</div>", re.S)
+
+# Title of the untitled section holding any content before the first heading
+PREAMBLE_TITLE = ""
+
+
+def order_titles(titles) -> list:
+    """The preamble first, then SECTION_TITLES in canonical order, then any other titles as given."""
+    titles = list(dict.fromkeys(titles))
+    ordered = [PREAMBLE_TITLE] if PREAMBLE_TITLE in titles else []
+    ordered += [title for title in SECTION_TITLES if title in titles]
+    return ordered + [title for title in titles if title != PREAMBLE_TITLE and title not in SECTION_TITLES]
+
+
+def parse_sections(plan_html: str) -> dict:
+    """
+    Split plan HTML into {title: body} in one pass over the headings.
+
+    Nothing is dropped: content before the first heading (or all of it, if there
+    are no headings) is kept under PREAMBLE_TITLE, headings outside SECTION_TITLES
+    become sections of their own, and a repeated heading's body is appended to
+    the first one. The result is in order_titles order.
+    """
+    found = {}
+    headings = list(SECTION_HEADING_RE.finditer(plan_html))
+    preamble = plan_html[:headings[0].start()] if headings else plan_html
+    if preamble.strip():
+        found[PREAMBLE_TITLE] = preamble.strip()
+    for i, match in enumerate(headings):
+        title = match.group(2).strip()
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(plan_html)
+        body = plan_html[match.end():end].strip()
+        found[title] = f"{found[title]}\n{body}" if title in found else body
+    return {title: found[title] for title in order_titles(found)}
+
+
+class PlanSection:
+    """One section of an account plan with its own version and cached HTML fragment."""
+
+    __slots__ = ("title", "body", "version", "_html")
+
+    def __init__(self, title: str, body: str):
+        self.title = title
+        self.body = body
+        self.version = 1
+        self._html = None
+
+    def update(self, body: str):
+        self.body = body
+        self.version += 1
+        self._html = None
+
+    def html(self) -> str:
+        if self._html is None:
+            heading = f"<div class='section-title'>{self.title}</div>\n" if self.title != PREAMBLE_TITLE else ""
+            self._html = f"{heading}{self.body}\n\n"
+        return self._html
+
+
+class AccountPlan:
+    """
+    Account plan document: ordered sections plus the company and context it was written for.
+
+    Updating a section only re-renders that section's fragment; the full HTML is
+    re-joined from cached fragments and itself cached until the next update.
+    The follow-up search index is likewise built on first use and dropped on update.
+    `generated_at` (epoch seconds) is when the plan was written, for showing its age.
+    `news_links` lists the news article links already reflected in Recent News
+    (None if unknown), so a news refresh only has to handle new articles.
+    """
+
+    __slots__ = ("company", "user_context", "version", "generated_at", "news_links", "_sections", "_html", "_index")
+
+    def __init__(self, sections: dict = None, company: str = None, user_context: str = None):
+        self.company = company
+        self.user_context = user_context
+        self.version = 1
+        self.generated_at = time.time()
+        self.news_links = None
+        self._sections = {}
+        self._html = None
+        self._index = None
+        for title in order_titles(sections or ()):
+            self._sections[title] = PlanSection(title, sections[title])
+
+    @classmethod
+    def from_html(cls, plan_html: str, company: str = None, user_context: str = None):
+        return cls(parse_sections(plan_html or ""), company=company, user_context=user_context)
+
+    @classmethod
+    def coerce(cls, plan):
+        """Accept an AccountPlan, plan HTML string or None and return an AccountPlan."""
+        if isinstance(plan, cls):
+            return plan
+        return cls.from_html(plan or "")
+
+    def __bool__(self):
+        return bool(self._sections)
+
+    def __contains__(self, title):
+        return title in self._sections
+
+    def __str__(self):
+        return self.to_html()
+
+    def get(self, title: str, default: str = None):
+        section = self._sections.get(title)
+        return section.body if section else default
+
+    def sections(self) -> dict:
+        """{title: body} in canonical order."""
+        return {title: section.body for title, section in self._sections.items()}
+
+    def section_version(self, title: str) -> int:
+        section = self._sections.get(title)
+        return section.version if section else 0
+
+    def update_section(self, title: str, body: str):
+        """Replace one section's body, touching only that section."""
+        section = self._sections.get(title)
+        if section is None:
+            # Keep canonical order when a missing section is added back
+            self._sections[title] = PlanSection(title, body)
+            self._sections = {t: self._sections[t] for t in order_titles(self._sections)}
+        else:
+            section.update(body)
+        self.version += 1
+        self._html = None
+        self._index = None
+
+    def to_html(self) -> str:
+        if self._html is None:
+            self._html = "".join(section.html() for section in self._sections.values())
+        return self._html
+
+    def to_dict(self) -> dict:
+        """JSON-safe snapshot (sections with their versions) for storing outside the process."""
+        return {
+            "company": self.company,
+            "user_context": self.user_context,
+            "version": self.version,
+            "generated_at": self.generated_at,
+            "news_links": self.news_links,
+            "sections": {title: {"body": s.body, "version": s.version} for title, s in self._sections.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Inverse of to_dict; section and plan versions are restored as they were."""
+        plan = cls({title: s["body"] for title, s in data.get("sections", {}).items()},
+                   company=data.get("company"), user_context=data.get("user_context"))
+        plan.version = data.get("version", 1)
+        plan.generated_at = data.get("generated_at", plan.generated_at)
+        plan.news_links = data.get("news_links")
+        for title, section in plan._sections.items():
+            section.version = data["sections"][title].get("version", 1)
+        return plan
+
+    def age(self) -> float:
+        """Seconds since the plan was generated."""
+        return max(0.0, time.time() - self.generated_at)
+
+    def context_text(self) -> str:
+        """Plain "Title: body" lines used as LLM context."""
+        return "\n".join(f"{title}: {section.body}" if title != PREAMBLE_TITLE else section.body
+                         for title, section in self._sections.items())
+
+    def relevant_context(self, question: str, budget_tokens: int = None) -> str:
+        """
+        "Title: text" lines holding only the plan sentences relevant to `question`,
+        within `budget_tokens` (default FOLLOWUP_TOKEN_BUDGET; 0 = the whole plan).
+        """
+        budget_tokens = FOLLOWUP_TOKEN_BUDGET if budget_tokens is None else budget_tokens
+        if budget_tokens <= 0:
+            return self.context_text()
+        if self._index is None:
+            self._index = PlanIndex(self.sections())
+        return self._index.render(self._index.select(question, budget_tokens))
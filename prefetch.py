@@ -0,0 +1,174 @@
+"""
+Warm-cache prefetcher for a watchlist of target accounts.
+
+Periodically re-researches and regenerates the plan for every watchlist entry
+(company + user_context) whose stored plan is older than PREFETCH_INTERVAL, and
+saves it in the warm plan store (cache.PlanStore). Interactive requests for those
+companies are then answered from the store instead of a cold generation. Each
+refresh re-runs the searches and the generation past their caches (and stores
+the new results in them), so a stored plan is never older than its generated_at.
+
+Refreshes run with at most PREFETCH_WORKERS at a time, start at no more than
+PREFETCH_RPM per minute, and only inside the PREFETCH_HOURS window (e.g. "1-6"
+for 01:00-06:59 local time), so they stay clear of interactive traffic.
+
+Usage:
+    python prefetch.py watchlist.csv [--once] [--workers 2] [--rpm 6] [--hours 1-6]
+
+The watchlist has the same format as batch.py input; a user_context cell may list
+several contexts separated by ";" (e.g. "sales;investor").
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agent import current_news_links, grounding_enabled
+from batch import read_companies, run_job
+from cache import get_plan_store, plan_store_key
+from plan import AccountPlan
+from ratelimit import TokenBucket
+from telemetry import metrics
+from utils import timestamp
+
+PREFETCH_INTERVAL = int(os.getenv("PREFETCH_INTERVAL", str(6 * 3600)))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+PREFETCH_RPM = float(os.getenv("PREFETCH_RPM", "6"))
+PREFETCH_HOURS = os.getenv("PREFETCH_HOURS", "")
+# How often the scheduler checks for plans that are due
+PREFETCH_TICK = float(os.getenv("PREFETCH_TICK", "60"))
+
+
+def read_watchlist(path: str):
+    """Watchlist rows as {"company", "user_context"} jobs, one per company and context."""
+    jobs = []
+    for row in read_companies(path):
+        for context in row["user_context"].split(";"):
+            if context.strip():
+                jobs.append({"company": row["company"], "user_context": context.strip()})
+    return jobs
+
+
+def in_window(hours: str, now: float = None) -> bool:
+    """True if the local hour is inside `hours` ("start-end", inclusive, may wrap midnight; "" = always)."""
+    if not hours:
+        return True
+    start, end = (int(h) for h in hours.split("-"))
+    hour = time.localtime(now).tm_hour
+    return start <= hour <= end if start <= end else hour >= start or hour <= end
+
+
+class Prefetcher:
+    """Keeps the warm plan store fresh for a list of {"company", "user_context"} jobs."""
+
+    def __init__(self, jobs, store=None, interval=PREFETCH_INTERVAL, workers=PREFETCH_WORKERS,
+                 rpm=PREFETCH_RPM, hours=PREFETCH_HOURS):
+        self.jobs = list(jobs)
+        self.store = store or get_plan_store()
+        if self.store is None:
+            raise ValueError("the warm plan store is disabled (PLAN_STORE_ENABLED=0)")
+        self.interval = interval
+        self.workers = workers
+        self.hours = hours
+        # Paces refresh starts; burst 1 so a run never starts a wave of generations at once
+        self.pacer = TokenBucket(rpm / 60, 1)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def due(self, now: float = None):
+        """Jobs whose plan is missing or older than `interval`, stalest first."""
+        now = time.time() if now is None else now
+        generated = self.store.generated_at()
+        ages = [(now - generated.get(plan_store_key(job["company"], job["user_context"]), 0), job) for job in self.jobs]
+        return [job for age, job in sorted(ages, key=lambda entry: -entry[0]) if age >= self.interval]
+
+    def refresh(self, job: dict) -> dict:
+        """Research + generate one plan and store it; returns the batch.run_job record."""
+        record = run_job(job, fresh=True)
+        plan = None
+        if record["status"] == "ok":
+            plan = AccountPlan.from_html(record["plan"], job["company"], job["user_context"])
+            if not plan:
+                # An empty generation must not replace the stored plan
+                record = {key: value for key, value in record.items() if key != "plan"}
+                record.update(status="error", error="plan generation returned no content")
+        if plan:
+            if grounding_enabled():
+                plan.news_links = current_news_links(job["company"])
+            self.store.put(job["company"], job["user_context"], plan.to_dict(), plan.generated_at)
+        else:
+            print(f"[{timestamp()}] Prefetch of {job['company']} ({job['user_context']}) failed: {record['error']}")
+        metrics.inc("prefetch_plans_total", status=record["status"])
+        return record
+
+    def run_once(self) -> dict:
+        """Refresh every due job, paced and bounded; stops early if the window closes or stop() is called."""
+        counts = {"ok": 0, "error": 0, "deferred": 0}
+        jobs = self.due()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = []
+            for i, job in enumerate(jobs):
+                if self._stop.is_set() or not in_window(self.hours):
+                    counts["deferred"] = len(jobs) - i
+                    break
+                delay = self.pacer.try_acquire()
+                while delay:
+                    if self._stop.wait(delay):
+                        break
+                    delay = self.pacer.try_acquire()
+                if self._stop.is_set():
+                    counts["deferred"] = len(jobs) - i
+                    break
+                futures.append(pool.submit(self.refresh, job))
+            for future in futures:
+                counts[future.result()["status"]] += 1
+        return counts
+
+    def run_forever(self, tick: float = PREFETCH_TICK):
+        """Check for due plans every `tick` seconds (inside the window) until stop() is called."""
+        while not self._stop.is_set():
+            if in_window(self.hours) and self.due():
+                counts = self.run_once()
+                print(f"[{timestamp()}] Prefetch run: {counts['ok']} refreshed, {counts['error']} failed, "
+                      f"{counts['deferred']} deferred")
+            self._stop.wait(tick)
+
+    def start(self, tick: float = PREFETCH_TICK) -> threading.Thread:
+        """Run the scheduler on a daemon thread (e.g. inside a long-running service)."""
+        self._thread = threading.Thread(target=self.run_forever, args=(tick,), name="prefetcher", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep prefetched account plans fresh for a watchlist.")
+    parser.add_argument("watchlist", help="CSV (company[,user_context]) or JSONL file")
+    parser.add_argument("--once", action="store_true", help="refresh what is due now (ignoring --hours), then exit")
+    parser.add_argument("--workers", type=int, default=PREFETCH_WORKERS, help="plans refreshed concurrently")
+    parser.add_argument("--rpm", type=float, default=PREFETCH_RPM, help="plan refreshes started per minute")
+    parser.add_argument("--hours", default=PREFETCH_HOURS, help='local-hour window, e.g. "1-6" (default: always)')
+    parser.add_argument("--interval", type=int, default=PREFETCH_INTERVAL, help="refresh plans older than this (s)")
+    args = parser.parse_args()
+
+    prefetcher = Prefetcher(read_watchlist(args.watchlist), interval=args.interval, workers=args.workers,
+                            rpm=args.rpm, hours=args.hours)
+    print(f"Watching {len(prefetcher.jobs)} plan(s); {len(prefetcher.due())} due now")
+    if args.once:
+        prefetcher.hours = ""
+        print(prefetcher.run_once())
+        return
+    try:
+        prefetcher.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+# ------------------------------------------------------
+# Per-provider defaults (overridable via env, e.g. GROQ_RPS=2)
+# ------------------------------------------------------
+# How often event-loop callers re-check for a free concurrency slot
+ASYNC_POLL_INTERVAL = float(os.getenv("RATELIMIT_ASYNC_POLL_INTERVAL", "0.02"))
+
+PROVIDER_DEFAULTS = {
+    # Groq free tier allows 30 requests/min; the burst covers one parallel plan (6 sections)
+    "groq": {"rps": 0.5, "burst": 6, "max_concurrency": 8},
+    "serpapi": {"rps": 5.0, "burst": 10, "max_concurrency": 8},
+}
+
+
+def _provider_setting(provider: str, name: str):
+    default = PROVIDER_DEFAULTS.get(provider, PROVIDER_DEFAULTS["groq"])[name]
+    raw = os.getenv(f"{provider.upper()}_{name.upper()}")
+    return type(default)(raw) if raw else default
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """True for provider 429s and timeouts, the signals that we are pushing too hard."""
+    if getattr(exc, "status_code", None) == 429:
+        return True
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    name = type(exc).__name__
+    return isinstance(exc, TimeoutError) or "RateLimit" in name or "Timeout" in name
+
+
+class RateLimitTimeout(TimeoutError):
+    """Raised when a caller waited longer than allowed for a rate-limit slot."""
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/sec refill, at most `burst` stored."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token and return 0, or return the seconds until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+
+class AdaptiveLimiter:
+    """
+    Rate limiter shared by every call site of one provider/model.
+
+    Requests must pass a token bucket (steady rate) and an AIMD concurrency window:
+    each success grows the window by 1/window (about +1 per round-trip), each 429 or
+    timeout halves it, so sustained throughput settles just under the provider limit.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, max_concurrency: int, min_concurrency: int = 1):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float = None):
+        """Block until both a concurrency slot and a rate token are available."""
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        with self._cond:
+            self.waiting += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic() if deadline else None
+                    if remaining is not None and remaining <= 0:
+                        raise RateLimitTimeout(f"{self.name}: no concurrency slot within {timeout}s")
+                    self._cond.wait(remaining)
+                self.in_flight += 1
+            except BaseException:
+                self.waiting -= 1
+                raise
+
+        try:
+            while True:
+                delay = self.bucket.try_acquire()
+                if not delay:
+                    break
+                if deadline and time.monotonic() + delay > deadline:
+                    raise RateLimitTimeout(f"{self.name}: no rate token within {timeout}s")
+                time.sleep(delay)
+        except BaseException:
+            self._abandon()
+            raise
+
+        self._acquired(start)
+
+    async def acquire_async(self, timeout: float = None):
+        """Event-loop variant of acquire: waits with asyncio.sleep instead of blocking the thread."""
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+        with self._cond:
+            self.waiting += 1
+        try:
+            while True:
+                with self._cond:
+                    if self.in_flight < int(self.limit):
+                        self.in_flight += 1
+                        break
+                if deadline and time.monotonic() >= deadline:
+                    raise RateLimitTimeout(f"{self.name}: no concurrency slot within {timeout}s")
+                await asyncio.sleep(ASYNC_POLL_INTERVAL)
+        except BaseException:
+            with self._cond:
+                self.waiting -= 1
+            raise
+
+        try:
+            while True:
+                delay = self.bucket.try_acquire()
+                if not delay:
+                    break
+                if deadline and time.monotonic() + delay > deadline:
+                    raise RateLimitTimeout(f"{self.name}: no rate token within {timeout}s")
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._abandon()
+            raise
+
+        self._acquired(start)
+
+    def _acquired(self, start):
+        waited = time.monotonic() - start
+        with self._cond:
+            self.waiting -= 1
+            self.requests += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def _abandon(self):
+        """Give back a slot taken by an acquire that then failed or was cancelled."""
+        with self._cond:
+            self.waiting -= 1
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def release(self, throttled: bool = False):
+        """Return the slot and adapt the window: halve on throttling, else grow additively."""
+        with self._cond:
+            if throttled:
+                self.throttled += 1
+                self.limit = max(self.min_concurrency, self.limit / 2)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def has_capacity(self) -> bool:
+        """True if a request could take a slot now without queueing behind others."""
+        with self._cond:
+            return self.in_flight < int(self.limit) and not self.waiting
+
+    @contextmanager
+    def slot(self, timeout: float = None):
+        """`with limiter.slot(): call_provider()` - acquires, then releases with AIMD feedback."""
+        self.acquire(timeout)
+        try:
+            yield
+        except BaseException as e:
+            self.release(throttled=is_throttle_error(e))
+            raise
+        else:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, timeout: float = None):
+        """`async with limiter.slot_async(): await call_provider()` - cancellation releases the slot."""
+        await self.acquire_async(timeout)
+        try:
+            yield
+        except asyncio.CancelledError:
+            # An abandoned request says nothing about provider pressure: free the slot, keep the window
+            self._release_slot()
+            raise
+        except BaseException as e:
+            self.release(throttled=is_throttle_error(e))
+            raise
+        else:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "avg_wait_s": self.total_wait / self.requests if self.requests else 0.0,
+                "max_wait_s": self.max_wait,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str, model: str = None) -> AdaptiveLimiter:
+    """Process-wide limiter for a provider (and model, where limits are per model)."""
+    name = f"{provider}:{model}" if model else provider
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                limiter = AdaptiveLimiter(
+                    name,
+                    rate=_provider_setting(provider, "rps"),
+                    burst=_provider_setting(provider, "burst"),
+                    max_concurrency=_provider_setting(provider, "max_concurrency"),
+                )
+                _limiters[name] = limiter
+    return limiter
+
+
+def limiter_stats() -> dict:
+    """{limiter_name: stats} for every limiter created so far."""
+    return {name: limiter.stats() for name, limiter in list(_limiters.items())}
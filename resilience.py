@@ -0,0 +1,102 @@
+import asyncio
+import os
+import random
+
+from models import model_stats
+from telemetry import metrics
+
+# ------------------------------------------------------
+# Retry and hedging policy for provider calls (overridable via env)
+# ------------------------------------------------------
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.25"))
+RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "4"))
+
+# Fire a duplicate request once an attempt runs longer than the model's recent p95 for the same task.
+# Streamed calls (full plans) are never hedged: a duplicate would regenerate the whole plan, and
+# their tail is already bounded by the first-chunk timeout, fallback and the task deadline.
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "1") != "0"
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# No hedging until this many successful calls have been observed for the model
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.2"))
+
+
+def _status_code(exc: BaseException):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Rate limits, server errors and dropped connections; not timeouts (those fall back) or client errors."""
+    status = _status_code(exc)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    return "Connection" in type(exc).__name__ or isinstance(exc, ConnectionError)
+
+
+def retry_after(exc: BaseException):
+    """Seconds from a Retry-After header on the error's response, if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(exc: BaseException, retry: int, retries: int = LLM_RETRIES):
+    """
+    Seconds to wait before retry number `retry` (0-based), or None if `exc` should not be retried.
+
+    Full jitter (uniform up to an exponentially growing cap) spreads out callers that
+    failed together; a provider's Retry-After is honoured as a floor.
+    """
+    if retry >= retries or not is_retryable(exc):
+        return None
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** retry))
+    return max(delay, retry_after(exc) or 0.0)
+
+
+def hedge_delay(model: str, task: str = None):
+    """Seconds after which to hedge a `task` call to `model`: their recent p95, or None (don't hedge)."""
+    if not HEDGE_ENABLED:
+        return None
+    p95 = model_stats.latency(model, HEDGE_PERCENTILE, min_samples=HEDGE_MIN_SAMPLES, task=task)
+    return None if p95 is None else max(p95, HEDGE_MIN_DELAY)
+
+
+async def hedged(start_attempt, hedge_after: float = None, name: str = "llm", can_hedge=None):
+    """
+    Await `start_attempt()`; if it is still running after `hedge_after` seconds (and
+    `can_hedge()`, when given, allows it), start a second identical attempt and return
+    whichever succeeds first (the other is cancelled).
+
+    Fails only when every started attempt failed, with the last error.
+    """
+    first = asyncio.ensure_future(start_attempt())
+    if hedge_after is None:
+        return await first
+
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done and (can_hedge is None or can_hedge()):
+            tasks.add(asyncio.ensure_future(start_attempt()))
+            metrics.inc("llm_hedges_total", model=name)
+        error = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        metrics.inc("llm_hedge_wins_total", model=name)
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+        if not first.done():
+            first.cancel()
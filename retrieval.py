@@ -0,0 +1,263 @@
+import math
+import os
+import re
+from collections import Counter
+
+# ------------------------------------------------------
+# Evidence packing settings
+# ------------------------------------------------------
+EVIDENCE_TOKEN_BUDGET = int(os.getenv("EVIDENCE_TOKEN_BUDGET", "1200"))
+
+# Plan context sent with a follow-up question (0 = always send the whole plan)
+FOLLOWUP_TOKEN_BUDGET = int(os.getenv("FOLLOWUP_TOKEN_BUDGET", "400"))
+
+# Keyword queries used to rank snippets for each plan section
+SECTION_QUERIES = {
+    "Company Overview": "company overview profile headquarters founded ceo revenue employees business financials market",
+    "Recent News": "news announced announces launch latest update report quarter deal acquisition week today",
+    "Products / Services": "products services platform offerings solutions segments software hardware brands customers",
+    "Competitors": "competitors rivals alternatives comparison versus market share compete competition",
+    "Key Opportunities / Signals": "growth expansion investment opportunity partnership hiring funding strategy demand trend",
+    "Suggested Next Steps": "strategy plans initiatives expansion partnership priorities roadmap outlook",
+}
+
+# search.COMPANY_QUERIES label whose results are presumed relevant to a section
+SECTION_SOURCES = {
+    "Company Overview": "overview",
+    "Recent News": "news",
+    "Products / Services": "products",
+    "Competitors": "competitors",
+}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "will", "with",
+}
+
+# Question words that say nothing about which part of a plan is relevant
+QUESTION_STOPWORDS = {
+    "about", "any", "are", "can", "did", "do", "does", "first", "how", "i", "me", "much", "many", "should",
+    "tell", "their", "them", "there", "they", "we", "what", "when", "where", "which", "who", "why", "you",
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Plan section bodies are light HTML (<li>, <br>, <strong>) from agent.markdown_to_html
+BLOCK_RE = re.compile(r"<br\s*/?>|</?(?:li|p|ul|ol|div)\b[^>]*>|\n", re.I)
+TAG_RE = re.compile(r"<[^>]+>")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(])")
+
+
+def tokenize(text: str):
+    """Lowercase word tokens without stopwords."""
+    return [tok for tok in TOKEN_RE.findall(text.lower()) if tok not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def format_evidence(item: dict) -> str:
+    """Render one search item as a single prompt line."""
+    line = f"- {item.get('title', '')}: {item.get('snippet', '')}"
+    if item.get("link"):
+        line += f" ({item['link']})"
+    return line
+
+
+class BM25:
+    """Okapi BM25 over a small, fixed list of tokenized documents."""
+
+    def __init__(self, docs, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_freqs = [Counter(doc) for doc in docs]
+        self.doc_lens = [len(doc) for doc in docs]
+        self.avg_len = (sum(self.doc_lens) / len(docs)) if docs else 0.0
+
+        df = Counter()
+        for freqs in self.doc_freqs:
+            df.update(freqs.keys())
+        n = len(docs)
+        self.idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+
+    def scores(self, query_tokens):
+        """BM25 score of every document for the query, in document order."""
+        terms = [t for t in set(query_tokens) if t in self.idf]
+        result = []
+        for freqs, length in zip(self.doc_freqs, self.doc_lens):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_len) if self.avg_len else self.k1
+            for term in terms:
+                tf = freqs.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            result.append(score)
+        return result
+
+
+def pack_evidence(items, query: str, budget_tokens: int, index: BM25 = None, source: str = None, exclude=None):
+    """
+    Rank items against `query` and greedily keep the best ones that fit `budget_tokens`.
+
+    Items with no term overlap are dropped unless they came from the matching `source`
+    query. Returned items keep their rank order (most relevant first).
+    """
+    if not items or budget_tokens <= 0:
+        return []
+    if index is None:
+        index = BM25([tokenize(f"{it.get('title', '')} {it.get('snippet', '')}") for it in items])
+
+    scores = index.scores(tokenize(query))
+    ranked = []
+    for position, (item, score) in enumerate(zip(items, scores)):
+        if exclude and position in exclude:
+            continue
+        if source and item.get("source") == source:
+            # Results of the section's own search query always count as relevant
+            score += 1.0
+        if score > 0:
+            ranked.append((score, position, item))
+    ranked.sort(key=lambda entry: (-entry[0], entry[1]))
+
+    packed = []
+    used = 0
+    for _, position, item in ranked:
+        cost = estimate_tokens(format_evidence(item))
+        if used + cost > budget_tokens:
+            continue
+        packed.append(item)
+        used += cost
+        if exclude is not None:
+            exclude.add(position)
+    return packed
+
+
+def pack_evidence_by_section(items, budget_tokens: int = None, sections=None):
+    """
+    Split one shared token budget across plan sections and pack evidence for each.
+
+    Each item is used at most once across sections, so the packed prompt never
+    repeats a snippet. Returns {section_title: [items]}.
+    """
+    budget_tokens = EVIDENCE_TOKEN_BUDGET if budget_tokens is None else budget_tokens
+    sections = list(sections or SECTION_QUERIES)
+    if not items or not sections:
+        return {}
+
+    index = BM25([tokenize(f"{it.get('title', '')} {it.get('snippet', '')}") for it in items])
+    remaining = budget_tokens
+    used = set()
+    packed = {}
+    for i, title in enumerate(sections):
+        # Budget a section leaves unused carries over to the sections after it
+        share = remaining // (len(sections) - i)
+        packed[title] = pack_evidence(
+            items,
+            SECTION_QUERIES.get(title, title),
+            share,
+            index=index,
+            source=SECTION_SOURCES.get(title),
+            exclude=used,
+        )
+        remaining -= sum(estimate_tokens(format_evidence(item)) for item in packed[title])
+    return packed
+
+
+def render_evidence(evidence_by_section: dict) -> str:
+    """Format packed evidence as a prompt block grouped by section ("" if empty)."""
+    blocks = []
+    for title, items in evidence_by_section.items():
+        if items:
+            blocks.append(f"[{title}]\n" + "\n".join(format_evidence(item) for item in items))
+    return "\n\n".join(blocks)
+
+
+# ------------------------------------------------------
+# Follow-up context: relevant plan passages under a token budget
+# ------------------------------------------------------
+def split_passages(body: str):
+    """Plain-text sentences and list items of one section body, in order."""
+    passages = []
+    for block in BLOCK_RE.split(body or ""):
+        text = " ".join(TAG_RE.sub("", block).split())
+        if text:
+            passages.extend(part for part in SENTENCE_RE.split(text) if part)
+    return passages
+
+
+def plan_terms(text: str):
+    """Tokens for matching questions to plan text: question words dropped, words cut to a 5-letter stem."""
+    return [tok[:5] for tok in tokenize(text) if tok not in QUESTION_STOPWORDS]
+
+
+class PlanIndex:
+    """
+    BM25 index over the sentences of an account plan, for picking follow-up context.
+
+    Terms are crude prefix stems (see plan_terms) so "employees" matches
+    "employs" without a stemmer dependency. A passage's score is its own BM25 score plus `section_weight` times its
+    section's score, so a question that names a section ("who are the
+    competitors?") pulls in that section even where its sentences don't repeat
+    the question's words.
+    """
+
+    def __init__(self, sections: dict, section_weight: float = 0.5):
+        self.section_weight = section_weight
+        self.titles = list(sections)
+        self.passages = []  # (section position, passage position, text)
+        section_docs = []
+        for s, (title, body) in enumerate(sections.items()):
+            section_docs.append(plan_terms(title) + plan_terms(TAG_RE.sub(" ", body or "")))
+            for p, text in enumerate(split_passages(body)):
+                self.passages.append((s, p, text))
+        self.sections_bm25 = BM25(section_docs)
+        self.passages_bm25 = BM25([plan_terms(text) for _, _, text in self.passages])
+        self.title_tokens = [estimate_tokens(f"{title}: ") for title in self.titles]
+        self.total_tokens = estimate_tokens(self.render(self.passages))
+
+    def select(self, question: str, budget_tokens: int):
+        """
+        Greedily keep the best-scoring passages that fit `budget_tokens`.
+
+        Returns [(section position, passage position, text)] in plan order. If
+        nothing matches the question, each section contributes its leading
+        passages in turn instead, so broad questions still see the whole plan.
+        """
+        if self.total_tokens <= budget_tokens:
+            return list(self.passages)
+
+        query = plan_terms(question)
+        section_scores = self.sections_bm25.scores(query)
+        passage_scores = self.passages_bm25.scores(query)
+        ranked = [
+            (score + self.section_weight * section_scores[s], i)
+            for i, ((s, _, _), score) in enumerate(zip(self.passages, passage_scores))
+        ]
+        if not any(score > 0 for score, _ in ranked):
+            # Round-robin over sections: first passage of each, then second, ...
+            order = sorted(range(len(self.passages)), key=lambda i: (self.passages[i][1], self.passages[i][0]))
+        else:
+            order = [i for score, i in sorted(ranked, key=lambda entry: (-entry[0], entry[1])) if score > 0]
+
+        chosen = []
+        used = 0
+        opened = set()
+        for i in order:
+            s = self.passages[i][0]
+            # +1 for the joining space; a section's first passage also pays for its "Title: " prefix
+            cost = estimate_tokens(self.passages[i][2]) + 1 + (0 if s in opened else self.title_tokens[s])
+            if used + cost > budget_tokens:
+                continue
+            chosen.append(i)
+            opened.add(s)
+            used += cost
+        return [self.passages[i] for i in sorted(chosen)]
+
+    def render(self, selected) -> str:
+        """Format selected passages as "Title: passage passage" lines."""
+        by_section = {}
+        for s, _, text in selected:
+            by_section.setdefault(s, []).append(text)
+        return "\n".join(f"{self.titles[s]}: {' '.join(texts)}" for s, texts in sorted(by_section.items()))
@@ -0,0 +1,193 @@
+import re
+from collections import namedtuple
+
+from plan import SECTION_TITLES
+
+# ------------------------------------------------------
+# User Context Keywords (first matching context wins, in this order)
+# ------------------------------------------------------
+USER_CONTEXTS = {
+    "sales": ["sales", "account executive", "business development", "selling", "sales rep", "account manager", "bdm"],
+    "student": ["student", "placement", "interview", "campus", "college", "intern", "graduate", "university"],
+    "investor": ["investor", "investment", "funding", "portfolio", "venture", "equity"],
+    "partner": ["partner", "vendor", "integration", "collaborate", "partnership"],
+    "competitor": ["competitor", "competitive", "versus", "vs", "competing"],
+    "recruiter": ["recruiter", "recruiting", "hiring", "hr", "talent"],
+}
+
+EDIT_COMMANDS = ["update", "change", "regenerate", "rewrite"]
+CREATE_COMMANDS = ["create", "generate", "make"]
+FOLLOWUP_KEYWORDS = ["what", "how", "which", "tell me", "show me", "opportunities", "useful", "relevant", "technologies", "tech stack"]
+
+# Every role regex below needs one of these phrases; if none occur, the regexes are skipped
+ROLE_TRIGGERS = ["i'm", "i am", "as a"]
+
+# ------------------------------------------------------
+# Precompiled message patterns
+# ------------------------------------------------------
+CONTEXT_REVEAL_RE = re.compile(
+    r"(?:how|what).*(?:useful|relevant|helpful|mean).*(?:for me|to me).*(?:as a|as an|i'm|i am)\s+(?:a\s+)?(\w+)"
+)
+CONTEXT_REVEAL_ALT_RE = re.compile(r"(?:i'm|i am|as a|as an)\s+(?:a\s+)?(\w+).*(?:what|how|tell me|explain)")
+ROLE_QUESTION_RE = re.compile(r"(?:as a|as an|i'm|i am)\s+(?:a\s+)?(\w+).*(?:what|how|which|tell|show)")
+ROLE_PLAN_RE = re.compile(
+    r"(?:i'm|i am|as a)\s+(?:a\s+)?(\w+).*?(?:create|generate|make|build).*?(?:plan|research).*?(?:for|about|of)\s+(.+)"
+)
+PLAN_FOR_RE = re.compile(r"(?:account\s+)?plan\s+(?:for|of|about|on)\s+(.+)")
+ROLE_STATED_RE = re.compile(r"(?:i'm|i am|as a)\s+(?:a\s+)?(\w+)")
+
+
+def _trie_pattern(words) -> str:
+    """Compile words into one prefix-factored regex so shared prefixes are matched once."""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def emit(node):
+        end = "" in node
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:
+            return "(?:" + body + ")?"
+        return body
+
+    return emit(trie)
+
+
+class KeywordAutomaton:
+    """
+    Multi-keyword matcher: all keywords are folded into one compiled trie regex and
+    every keyword occurrence is reported in a single left-to-right scan.
+
+    With `word_boundary=True` a keyword must start at a word boundary, so "hr" no
+    longer fires inside "three" while "sales" still matches "salesperson".
+    Without it, matching is plain substring search.
+    """
+
+    def __init__(self, keywords: dict, word_boundary: bool = False):
+        # keywords: {keyword: label}
+        self.labels = {kw.lower(): label for kw, label in keywords.items()}
+        body = _trie_pattern(sorted(self.labels, key=len, reverse=True))
+        if word_boundary:
+            body = rf"(?<![a-z0-9])(?:{body})"
+        # Lookahead capture reports one (longest) keyword per start position, overlaps included
+        self._regex = re.compile(rf"(?=({body}))")
+
+    def labels_in(self, text: str) -> set:
+        """Set of labels whose keywords occur in (already lowercased) text."""
+        return {self.labels[m.group(1)] for m in self._regex.finditer(text)}
+
+    def search(self, text: str) -> bool:
+        return self._regex.search(text) is not None
+
+
+Route = namedtuple("Route", ["intent", "context", "company", "section", "role"])
+Route.__new__.__defaults__ = (None, None, None)
+
+
+class IntentRouter:
+    """
+    Compiled replacement for the regex/keyword cascade in process_user_message.
+
+    route() returns a Route whose `intent` is one of:
+        context_switch, role_question, generate_plan, role_stated,
+        update_section, followup, default
+    and whose `context` is the user context the agent should return.
+    """
+
+    def __init__(self, user_contexts: dict = None, section_titles=None):
+        user_contexts = user_contexts or USER_CONTEXTS
+        section_titles = section_titles or SECTION_TITLES
+        self._context_priority = {context: i for i, context in enumerate(user_contexts)}
+        self._contexts = KeywordAutomaton(
+            {kw: context for context, kws in user_contexts.items() for kw in kws}, word_boundary=True
+        )
+        self._sections = KeywordAutomaton({title.lower(): title for title in section_titles})
+        self._section_order = {title: i for i, title in enumerate(section_titles)}
+        self._edit = KeywordAutomaton({cmd: cmd for cmd in EDIT_COMMANDS})
+        self._create = KeywordAutomaton({cmd: cmd for cmd in CREATE_COMMANDS})
+        self._followup = KeywordAutomaton({kw: kw for kw in FOLLOWUP_KEYWORDS})
+        self._triggers = KeywordAutomaton({t: t for t in ROLE_TRIGGERS})
+
+    def detect_context(self, text: str) -> str:
+        """Detect user role/context from a message ("general" if none)."""
+        found = self._contexts.labels_in(text.lower())
+        if not found:
+            return "general"
+        return min(found, key=self._context_priority.__getitem__)
+
+    def route(self, text: str, has_plan: bool = False, user_context: str = None) -> Route:
+        text_lower = text.lower().strip()
+        has_role = self._triggers.search(text_lower)
+
+        # 1️⃣ User reveals context after a plan exists
+        if has_role and has_plan:
+            match = CONTEXT_REVEAL_RE.search(text_lower) or CONTEXT_REVEAL_ALT_RE.search(text_lower)
+            if match:
+                new_context = self.detect_context(match.group(1))
+                if new_context != "general" and new_context != user_context:
+                    return Route("context_switch", new_context, role=match.group(1))
+
+            # 2️⃣ "As a [role], what opportunities..."
+            match = ROLE_QUESTION_RE.search(text_lower)
+            if match:
+                new_context = self.detect_context(match.group(1))
+                if new_context != "general":
+                    return Route("role_question", new_context, role=match.group(1))
+
+        # 3️⃣ Detect context only if not already set
+        if user_context is None:
+            detected = self.detect_context(text)
+            if detected != "general":
+                user_context = detected
+
+        # 4️⃣ Explicit role + company in the same message
+        if has_role:
+            match = ROLE_PLAN_RE.search(text_lower)
+            if match:
+                return Route(
+                    "generate_plan",
+                    self.detect_context(match.group(1)),
+                    company=match.group(2).strip().title(),
+                    role=match.group(1),
+                )
+
+        # 5️⃣ Standard "create account plan for X"
+        if "plan" in text_lower:
+            match = PLAN_FOR_RE.search(text_lower)
+            if match:
+                return Route("generate_plan", user_context or "general", company=match.group(1).strip().title())
+
+        # 6️⃣ Simple company name
+        if len(text.split()) <= 3 and text.replace(" ", "").replace("-", "").isalpha():
+            return Route("generate_plan", user_context or "general", company=text.strip().title())
+
+        # 7️⃣ User just stating their role
+        if has_role:
+            match = ROLE_STATED_RE.search(text_lower)
+            if match and not self._create.search(text_lower):
+                detected = self.detect_context(match.group(1))
+                if detected != "general":
+                    return Route("role_stated", detected, role=match.group(1))
+
+        # 8️⃣ Update a specific section
+        if self._edit.search(text_lower):
+            sections = self._sections.labels_in(text_lower)
+            if sections:
+                section = min(sections, key=self._section_order.__getitem__)
+                return Route("update_section", user_context, section=section)
+
+        # 9️⃣ Follow-up question
+        if has_plan and self._followup.search(text_lower):
+            return Route("followup", user_context)
+
+        # 🔟 Default
+        return Route("default", user_context)
+
+
+ROUTER = IntentRouter()
@@ -1,8 +1,53 @@
 import os
-from serpapi import GoogleSearch
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import httpx
+from cache import get_search_cache
+from dedup import NEAR_DUPLICATE_FILTER, NEAR_DUPLICATE_THRESHOLD, NearDuplicateFilter
+from ratelimit import get_limiter
+from singleflight import SINGLE_FLIGHT_ENABLED, SingleFlight
+from telemetry import metrics, propagate, span
+from transport import client
+from utils import clean_text
 
-def perform_search(query, topn=6, news=False):
-    """Single helper function to run web or news search."""
+# ------------------------------------------------------
+# Company research queries (fixed, deterministic order)
+# ------------------------------------------------------
+COMPANY_QUERIES = [
+    ("overview", "{company} company overview profile financials business", False),
+    ("products", "{company} products services list business segments", False),
+    ("competitors", "{company} competitors rivals alternatives comparison", False),
+    ("news", "{company} recent news latest update", True),
+]
+
+SEARCH_MAX_WORKERS = int(os.getenv("SEARCH_MAX_WORKERS", "4"))
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "15"))
+
+# Optional endpoint override (e.g. a local stand-in server for benchmarks)
+SERPAPI_BASE_URL = (os.getenv("SERPAPI_BASE_URL") or "https://serpapi.com").rstrip("/")
+
+
+search_flights = SingleFlight("search")
+
+# SerpAPI reports a query without results as an "error"; that answer is still valid and cacheable
+NO_RESULTS_ERROR = "hasn't returned any results"
+
+
+class SearchError(Exception):
+    """SerpAPI answered with an HTTP error or an error payload (e.g. bad key, quota exhausted)."""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        # Read by ratelimit.is_throttle_error, so a 429 still shrinks the limiter window
+        self.status_code = status_code
+
+
+def perform_search(query, topn=6, news=False, use_cache=True, force_refresh=False):
+    """
+    Single helper function to run web or news search (served from the search cache when fresh).
+
+    `force_refresh` skips the cache lookup but still stores the new results.
+    """
     api_key = os.getenv("SERPAPI_KEY")
     if not api_key:
         raise ValueError("SERPAPI_KEY missing in .env")
@@ -21,7 +66,33 @@ def perform_search(query, topn=6, news=False):
     if news:
         params["tbm"] = "nws"
 
-    results = GoogleSearch(params).get_dict()
+    with span("serpapi", news=news) as stage:
+        return _perform_search(params, topn, use_cache, force_refresh, stage)
+
+
+def _perform_search(params, topn, use_cache, force_refresh, stage):
+    cache = get_search_cache() if use_cache else None
+    if cache is not None and not force_refresh:
+        cached = cache.get(params)
+        if cached is not None:
+            stage.set(cached=True)
+            return cached
+
+    stage.set(cached=False)
+    with get_limiter("serpapi").slot():
+        # Over the shared keep-alive pool, so repeated searches skip the TCP/TLS handshake
+        resp = client("serpapi").get(f"{SERPAPI_BASE_URL}/search.json", params=params)
+        # Raised inside the slot so a 429 reaches the limiter as a throttle signal
+        try:
+            resp.raise_for_status()
+        except httpx.HTTPStatusError:
+            # Not the httpx error itself: its message carries the request URL, api_key included
+            raise SearchError(f"SerpAPI HTTP {resp.status_code}", resp.status_code) from None
+        results = resp.json()
+    error = results.get("error")
+    if error and NO_RESULTS_ERROR not in error:
+        # Never cache a failure as an empty result set
+        raise SearchError(f"SerpAPI error: {error}")
     items = []
 
     # In Google News, articles are in "organic_results"
@@ -32,41 +103,167 @@ def perform_search(query, topn=6, news=False):
             "link": r.get("link", "")
         })
 
+    if cache is not None:
+        cache.set(params, items)
+
     return items
 
 
-def clean_results(items):
-    """Remove duplicates + empty snippets."""
+def clean_results(items, near_duplicates=None, threshold=None, stats=None):
+    """
+    Remove empty snippets, exact duplicates and (by default) near-duplicates.
+
+    Near-duplicates are snippets at least `threshold` similar (default
+    NEAR_DUPLICATE_THRESHOLD, MinHash/LSH; see dedup.py) to an earlier kept item,
+    e.g. the same syndicated story returned by several queries; the first
+    occurrence is kept.
+    `stats`, if given, is filled with {input, kept, empty, exact, near, bytes_removed}.
+    """
+    if near_duplicates is None:
+        near_duplicates = NEAR_DUPLICATE_FILTER
+    near = None
+    if near_duplicates:
+        near = NearDuplicateFilter(NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold)
+    removed = {"empty": 0, "exact": 0, "near": 0}
+    removed_bytes = 0
     seen = set()
     cleaned = []
     for item in items:
         key = (item["title"], item["snippet"])
-        if item["snippet"] and key not in seen:
+        if not item["snippet"]:
+            reason = "empty"
+        elif key in seen:
+            reason = "exact"
+        elif near is not None and near.seen(f"{item['title']} {item['snippet']}"):
+            reason = "near"
+        else:
             cleaned.append(item)
             seen.add(key)
+            continue
+        removed[reason] += 1
+        removed_bytes += len(item["title"].encode("utf-8")) + len(item["snippet"].encode("utf-8"))
+
+    for reason, count in removed.items():
+        if count:
+            metrics.inc("search_results_removed_total", count, reason=reason)
+    if removed_bytes:
+        metrics.inc("search_result_bytes_removed_total", removed_bytes)
+    if stats is not None:
+        stats.update(input=len(items), kept=len(cleaned), bytes_removed=removed_bytes, **removed)
     return cleaned
 
 
-def search_company(company, topn=6):
-    """Perform multi-search for deeper company research."""
+def search_news(company, topn=6):
+    """
+    Re-run only the news query of search_company (same params, so the same cache
+    entry) and return its cleaned items tagged with source "news".
+    """
+    label, template, news = next(query for query in COMPANY_QUERIES if query[0] == "news")
+    items = perform_search(template.format(company=company), topn=topn, news=news)
+    return clean_results([dict(item, source=label) for item in items])
 
-    all_items = []
 
-    # ------------------- 1. General search -------------------
-    general_query = f"{company} company overview profile financials business"
-    all_items.extend(perform_search(general_query, topn=topn))
+def _timed_search(query, topn, news, force_refresh=False):
+    """Run one search and return (items, elapsed_seconds)."""
+    start = time.perf_counter()
+    items = perform_search(query, topn=topn, news=news, force_refresh=force_refresh)
+    return items, time.perf_counter() - start
+
+
+def search_company(company, topn=6, concurrent=True, max_workers=None, timeout=None, timings=None,
+                   force_refresh=False):
+    """
+    Perform multi-search for deeper company research.
+
+    Args:
+        company: Company name to research
+        topn: Results per sub-query
+        concurrent: Dispatch all sub-queries at once instead of one by one
+        max_workers: Cap on simultaneous sub-queries (default SEARCH_MAX_WORKERS)
+        timeout: Seconds each sub-query may take before it is dropped (default SEARCH_TIMEOUT)
+        timings: Optional dict, filled with {label: seconds or None if timed out or failed}
+        force_refresh: Query SerpAPI even where the search cache is fresh (results are still cached)
+
+    A sub-query that times out or fails is logged and contributes no items; the
+    error is raised only if every sub-query failed.
+
+    Identical concurrent calls (same normalized company and topn) share one lookup.
+
+    Returns:
+        Cleaned list of result items ({title, snippet, link, source}), merged in
+        COMPANY_QUERIES order
+    """
+    if timings is None:
+        timings = {}
+    with span("search", company=company):
+        if not SINGLE_FLIGHT_ENABLED:
+            return _search_company(company, topn, concurrent, max_workers, timeout, timings, force_refresh)
 
-    # ------------------- 2. Products & Services search -------------------
-    product_query = f"{company} products services list business segments"
-    all_items.extend(perform_search(product_query, topn=topn))
+        # Concurrent lookups of the same company share one set of SerpAPI calls
+        def run():
+            shared_timings = {}
+            items = _search_company(company, topn, concurrent, max_workers, timeout, shared_timings, force_refresh)
+            return items, shared_timings
 
-    # ------------------- 3. Competitor search -------------------
-    competitor_query = f"{company} competitors rivals alternatives comparison"
-    all_items.extend(perform_search(competitor_query, topn=topn))
+        items, shared_timings = search_flights.do((clean_text(company).lower(), topn, force_refresh), run)
+        timings.update(shared_timings)
+        return list(items)
 
-    # ------------------- 4. News search -------------------
-    news_query = f"{company} recent news latest update"
-    all_items.extend(perform_search(news_query, topn=topn, news=True))
+
+def _search_company(company, topn, concurrent, max_workers, timeout, timings, force_refresh=False):
+    max_workers = max_workers or SEARCH_MAX_WORKERS
+    timeout = timeout if timeout is not None else SEARCH_TIMEOUT
+
+    queries = [(label, template.format(company=company), news) for label, template, news in COMPANY_QUERIES]
+    results = {}
+    errors = []
+
+    def failed(label, error):
+        # One failed sub-query should not throw away the others' results
+        print(f"Search '{label}' for {company} failed: {type(error).__name__}: {error}")
+        metrics.inc("search_query_errors_total", query=label)
+        errors.append(error)
+        results[label], timings[label] = [], None
+
+    if not concurrent:
+        for label, query, news in queries:
+            try:
+                results[label], timings[label] = _timed_search(query, topn, news, force_refresh)
+            except Exception as e:
+                failed(label, e)
+    else:
+        workers = min(max_workers, len(queries))
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            started = time.perf_counter()
+            futures = [
+                (label, pool.submit(propagate(_timed_search), query, topn, news, force_refresh))
+                for label, query, news in queries
+            ]
+            for index, (label, future) in enumerate(futures):
+                # Queries beyond the concurrency cap start in later "waves"
+                wave = index // workers + 1
+                remaining = started + timeout * wave - time.perf_counter()
+                try:
+                    results[label], timings[label] = future.result(timeout=max(remaining, 0))
+                except FutureTimeout:
+                    print(f"Search '{label}' for {company} timed out after {timeout}s")
+                    future.cancel()
+                    results[label], timings[label] = [], None
+                except Exception as e:
+                    failed(label, e)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    if len(errors) == len(queries):
+        # Nothing to return (e.g. a missing or rejected key): let the caller see why
+        raise errors[0]
+
+    # Merge in fixed order so output does not depend on completion order
+    # Tag each item with its query label so callers can tell where evidence came from
+    all_items = []
+    for label, _, _ in queries:
+        all_items.extend(dict(item, source=label) for item in results.get(label, []))
 
     # Clean and return
     return clean_results(all_items)
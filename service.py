@@ -0,0 +1,360 @@
+"""
+Headless HTTP API over the agent, for CRM integrations and load-balanced deployments.
+
+Sessions are stored server-side in SQLite (sessions.py), so any worker process can
+serve any request. Connections are kept alive (HTTP/1.1) until idle for
+SERVICE_KEEPALIVE_TIMEOUT seconds; agent calls are cancelled after
+SERVICE_REQUEST_TIMEOUT seconds. Workers are forked processes sharing one listening
+socket, so throughput scales across cores.
+
+Usage:
+    python service.py [--host 0.0.0.0] [--port 8000] [--workers 4]
+
+Endpoints (JSON in and out unless noted):
+    POST   /sessions                      -> {"session_id"}
+    GET    /sessions/{id}                 -> user_context, plan_version, recent messages
+    DELETE /sessions/{id}
+    POST   /sessions/{id}/messages        {"text"} -> {"reply", "user_context", "plan_updated", "plan_version"}
+    GET    /sessions/{id}/plan            -> company, user_context, version, generated_at, age_s, sections, html
+    POST   /sessions/{id}/plan/sections   {"section", "content"?} -> regenerate (or replace) one section
+    GET    /sessions/{id}/plan.pdf        -> application/pdf
+    GET    /healthz
+    GET    /metrics                       -> Prometheus text (this worker process only)
+    GET    /models                        -> task routing table and per-model latency (this worker only)
+"""
+
+import argparse
+import json
+import os
+import re
+import signal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agent import NewsRefreshError, process_user_message, refresh_section
+from pdf_export import PdfCache
+from models import model_stats, routing_table
+from plan import SECTION_TITLES
+from sessions import SessionConflict, get_session_store
+from telemetry import metrics, span
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "0.0.0.0")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8000"))
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", str(os.cpu_count() or 1)))
+SERVICE_REQUEST_TIMEOUT = float(os.getenv("SERVICE_REQUEST_TIMEOUT", "120"))
+# Longer than typical load-balancer idle timeouts (60s), so the balancer closes first
+SERVICE_KEEPALIVE_TIMEOUT = float(os.getenv("SERVICE_KEEPALIVE_TIMEOUT", "75"))
+SERVICE_MAX_BODY = int(os.getenv("SERVICE_MAX_BODY", str(64 * 1024)))
+
+# Exports are built in the request thread; the Streamlit cache builds in the background instead
+pdf_cache = PdfCache(background=False)
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ------------------------------------------------------
+# Endpoint handlers: (match, body) -> (status, payload)
+# payload is a dict (sent as JSON) or (bytes, content_type)
+# ------------------------------------------------------
+def _load_session(match):
+    session = get_session_store().get(match.group("sid"))
+    if session is None:
+        raise ApiError(404, "unknown or expired session")
+    return session
+
+
+def _load_plan(session):
+    if not session.plan:
+        raise ApiError(404, "this session has no account plan yet")
+    return session.plan
+
+
+def _require_text(body: dict, field: str) -> str:
+    value = body.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise ApiError(400, f"'{field}' must be a non-empty string")
+    return value.strip()
+
+
+def create_session(match, body):
+    return 201, {"session_id": get_session_store().create().id}
+
+
+def get_session(match, body):
+    session = _load_session(match)
+    return 200, {
+        "session_id": session.id,
+        "user_context": session.user_context,
+        "plan_version": session.plan.version if session.plan else None,
+        "messages": [{"role": role, "text": text} for role, text in session.messages],
+    }
+
+
+def delete_session(match, body):
+    if not get_session_store().delete(match.group("sid")):
+        raise ApiError(404, "unknown session")
+    return 204, None
+
+
+def chat_turn(match, body):
+    text = _require_text(body, "text")
+    session = _load_session(match)
+    reply, updated_plan, new_context = process_user_message(
+        text, current_plan=session.plan, user_context=session.user_context, timeout=SERVICE_REQUEST_TIMEOUT
+    )
+    if updated_plan:
+        session.plan = updated_plan
+    if new_context:
+        session.user_context = new_context
+    session.add_message("user", text)
+    session.add_message("assistant", reply)
+    get_session_store().save(session)
+    return 200, {
+        "reply": reply,
+        "user_context": session.user_context,
+        "plan_updated": bool(updated_plan),
+        "plan_version": session.plan.version if session.plan else None,
+    }
+
+
+def get_plan(match, body):
+    plan = _load_plan(_load_session(match))
+    return 200, {
+        "company": plan.company,
+        "user_context": plan.user_context,
+        "version": plan.version,
+        "generated_at": plan.generated_at,
+        "age_s": round(plan.age(), 1),
+        "sections": [
+            {"title": title, "body": text, "version": plan.section_version(title)}
+            for title, text in plan.sections().items()
+        ],
+        "html": plan.to_html(),
+    }
+
+
+def update_section(match, body):
+    section = _require_text(body, "section")
+    if section not in SECTION_TITLES:
+        raise ApiError(400, f"'section' must be one of {SECTION_TITLES}")
+    session = _load_session(match)
+    plan = _load_plan(session)
+
+    content = body.get("content")
+    if content is None:
+        try:
+            refresh_section(plan, section, session.user_context, timeout=SERVICE_REQUEST_TIMEOUT)
+        except NewsRefreshError as e:
+            raise ApiError(502, f"couldn't refresh news: {e}") from None
+    elif isinstance(content, str):
+        plan.update_section(section, content)
+    else:
+        raise ApiError(400, "'content' must be a string")
+    get_session_store().save(session)
+    return 200, {"section": section, "body": plan.get(section), "version": plan.section_version(section),
+                 "plan_version": plan.version}
+
+
+def export_pdf(match, body):
+    plan = _load_plan(_load_session(match))
+    pdf = pdf_cache.get_pdf(plan.to_html())
+    if pdf is None:
+        raise ApiError(500, "PDF generation failed")
+    return 200, (pdf, "application/pdf")
+
+
+def healthz(match, body):
+    return 200, {"status": "ok", "pid": os.getpid()}
+
+
+def metrics_text(match, body):
+    return 200, (metrics.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+
+
+def models_info(match, body):
+    return 200, {"routing": routing_table(), "models": model_stats.snapshot()}
+
+
+SESSION = r"/sessions/(?P<sid>[0-9a-f]{32})"
+
+ROUTES = [
+    ("POST", re.compile(r"/sessions"), create_session),
+    ("GET", re.compile(SESSION), get_session),
+    ("DELETE", re.compile(SESSION), delete_session),
+    ("POST", re.compile(SESSION + r"/messages"), chat_turn),
+    ("GET", re.compile(SESSION + r"/plan"), get_plan),
+    ("POST", re.compile(SESSION + r"/plan/sections"), update_section),
+    ("GET", re.compile(SESSION + r"/plan\.pdf"), export_pdf),
+    ("GET", re.compile(r"/healthz"), healthz),
+    ("GET", re.compile(r"/metrics"), metrics_text),
+    ("GET", re.compile(r"/models"), models_info),
+]
+
+
+# ------------------------------------------------------
+# HTTP plumbing
+# ------------------------------------------------------
+class ServiceHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests; the socket timeout closes idle ones
+    protocol_version = "HTTP/1.1"
+    timeout = SERVICE_KEEPALIVE_TIMEOUT
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def log_message(self, format, *args):
+        # Per-request timings go to telemetry instead of stderr access lines
+        pass
+
+    def _route(self, method: str, path: str):
+        allowed = False
+        for route_method, pattern, handler in ROUTES:
+            match = pattern.fullmatch(path)
+            if match:
+                if route_method == method:
+                    return handler, match
+                allowed = True
+        raise ApiError(405 if allowed else 404, "method not allowed" if allowed else "not found")
+
+    def _read_body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > SERVICE_MAX_BODY:
+            self.close_connection = True
+            raise ApiError(413, f"request body larger than {SERVICE_MAX_BODY} bytes")
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise ApiError(400, "request body is not valid JSON")
+        if not isinstance(body, dict):
+            raise ApiError(400, "request body must be a JSON object")
+        return body
+
+    def _dispatch(self, method: str):
+        path = self.path.split("?", 1)[0].rstrip("/") or "/"
+        name = "unmatched"
+        with span("http_request", method=method) as stage:
+            try:
+                # Always consume the body first so a rejected request cannot desync a kept-alive connection
+                body = self._read_body()
+                handler, match = self._route(method, path)
+                name = handler.__name__
+                status, payload = handler(match, body)
+            except ApiError as e:
+                status, payload = e.status, {"error": str(e)}
+            except SessionConflict as e:
+                status, payload = 409, {"error": f"{e}; retry the request"}
+            except TimeoutError as e:
+                status, payload = 504, {"error": str(e)}
+            except Exception as e:
+                print(f"{method} {path} failed: {type(e).__name__}: {e}")
+                status, payload = 500, {"error": "internal error"}
+            stage.set(route=name, status_code=status)
+        metrics.inc("http_requests_total", route=name, status=status)
+        self._send(status, payload)
+
+    def _send(self, status: int, payload):
+        if payload is None:
+            body, content_type = b"", None
+        elif isinstance(payload, dict):
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        else:
+            body, content_type = payload
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+# ------------------------------------------------------
+# Worker processes
+# ------------------------------------------------------
+def serve(host: str = SERVICE_HOST, port: int = SERVICE_PORT, workers: int = SERVICE_WORKERS):
+    """
+    Bind once, then fork `workers` processes that all accept on the shared socket.
+
+    The parent only supervises: it restarts workers that die and stops them all on
+    SIGINT/SIGTERM. Falls back to a single in-process server where fork is unavailable.
+    """
+    server = ServiceServer((host, port), ServiceHandler)
+    print(f"Serving on http://{host}:{server.server_address[1]} with {workers} worker(s)")
+    if workers <= 1 or not hasattr(os, "fork"):
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        return pid
+
+    children = {spawn() for _ in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}; restarting")
+            children.add(spawn())
+    server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the account-plan agent over HTTP.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
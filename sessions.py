@@ -0,0 +1,140 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from plan import AccountPlan
+
+# ------------------------------------------------------
+# Server-side chat sessions (SQLite, shared by every worker process)
+# ------------------------------------------------------
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", ".cache/sessions.sqlite3")
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(24 * 3600)))
+SESSION_HISTORY_LIMIT = int(os.getenv("SESSION_HISTORY_LIMIT", "50"))
+
+
+class SessionConflict(Exception):
+    """Raised when a session changed between load and save (concurrent request on the same session)."""
+
+
+class Session:
+    """One conversation: user context, current plan, recent messages and a revision for optimistic locking."""
+
+    __slots__ = ("id", "user_context", "plan", "messages", "revision")
+
+    def __init__(self, session_id: str, user_context: str = None, plan: AccountPlan = None,
+                 messages: list = None, revision: int = 0):
+        self.id = session_id
+        self.user_context = user_context
+        self.plan = plan
+        self.messages = messages or []
+        self.revision = revision
+
+    def add_message(self, role: str, text: str):
+        self.messages.append([role, text])
+        del self.messages[:-SESSION_HISTORY_LIMIT]
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "user_context": self.user_context,
+            "plan": self.plan.to_dict() if self.plan else None,
+            "messages": self.messages,
+        })
+
+    @classmethod
+    def from_json(cls, session_id: str, raw: str, revision: int):
+        data = json.loads(raw)
+        plan = AccountPlan.from_dict(data["plan"]) if data.get("plan") else None
+        return cls(session_id, data.get("user_context"), plan, data.get("messages"), revision)
+
+
+class SessionStore:
+    """
+    Sessions persisted in SQLite so any worker process can serve any request.
+
+    save() only succeeds if the row still has the revision that was loaded; a
+    concurrent writer makes it raise SessionConflict instead of silently losing
+    one of the two updates. Sessions idle longer than `ttl` seconds are purged.
+    """
+
+    def __init__(self, path=SESSION_DB_PATH, ttl=SESSION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                revision INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at)")
+        self._conn.commit()
+
+    def create(self) -> Session:
+        session = Session(uuid.uuid4().hex)
+        with self._lock:
+            self._purge_expired()
+            self._conn.execute(
+                "INSERT INTO sessions (id, state, revision, updated_at) VALUES (?, ?, 0, ?)",
+                (session.id, session.to_json(), time.time()),
+            )
+            self._conn.commit()
+        return session
+
+    def get(self, session_id: str):
+        """The stored session, or None if unknown or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, revision, updated_at FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        if row is None or row[2] < time.time() - self.ttl:
+            return None
+        return Session.from_json(session_id, row[0], row[1])
+
+    def save(self, session: Session):
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE sessions SET state = ?, revision = revision + 1, updated_at = ? WHERE id = ? AND revision = ?",
+                (session.to_json(), time.time(), session.id, session.revision),
+            )
+            self._conn.commit()
+        if cursor.rowcount != 1:
+            raise SessionConflict(f"session {session.id} was modified by another request")
+        session.revision += 1
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def _purge_expired(self):
+        self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide store, opened on first use (after any worker fork)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore()
+    return _store
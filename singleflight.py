@@ -0,0 +1,139 @@
+import asyncio
+import os
+import threading
+import weakref
+
+from telemetry import metrics
+
+# Collapse identical concurrent requests into one upstream call (per process)
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT", "1") != "0"
+
+
+# ------------------------------------------------------
+# Thread single-flight (blocking callers, e.g. search_company)
+# ------------------------------------------------------
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Run at most one `fn` per key at a time; callers that arrive while it runs
+    block and receive the same result, or the same exception.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        metrics.inc("singleflight_calls_total", flight=self.name, role="leader" if leader else "follower")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+# ------------------------------------------------------
+# asyncio single-flight (coroutines, e.g. generate_plan_async)
+# ------------------------------------------------------
+class _AsyncCall:
+    __slots__ = ("task", "events", "listeners", "waiters")
+
+    def __init__(self):
+        self.task = None
+        self.events = []
+        self.listeners = []
+        self.waiters = 0
+
+    def emit(self, *args):
+        """Publish a progress event (e.g. a finished plan section) to every waiter."""
+        self.events.append(args)
+        for listener in list(self.listeners):
+            listener(args)
+
+
+class AsyncSingleFlight:
+    """
+    asyncio single-flight: concurrent calls with the same key await one shared task.
+
+    - Every waiter gets the shared result, or the shared exception.
+    - A cancelled waiter only stops waiting; the shared task is cancelled once no
+      waiter is left, so abandoning a request never hurts the others.
+    - Progress events sent through `emit` are replayed to late joiners and then
+      delivered live to each waiter's `on_event`. If a waiter's callback raises,
+      only that waiter fails.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = weakref.WeakKeyDictionary()  # event loop -> {key: _AsyncCall}
+
+    async def do(self, key, coro_fn, on_event=None):
+        """Await `coro_fn(emit)` for this key, sharing it with identical in-flight calls."""
+        loop = asyncio.get_running_loop()
+        calls = self._calls.setdefault(loop, {})
+        call = calls.get(key)
+        leader = call is None
+        if leader:
+            call = calls[key] = _AsyncCall()
+            call.task = loop.create_task(coro_fn(call.emit))
+            call.task.add_done_callback(lambda _: calls.pop(key, None) if calls.get(key) is call else None)
+        metrics.inc("singleflight_calls_total", flight=self.name, role="leader" if leader else "follower")
+        return await self._wait(calls, key, call, on_event, loop)
+
+    async def _wait(self, calls: dict, key, call: _AsyncCall, on_event, loop):
+        aborted = loop.create_future()
+
+        def listener(args):
+            if aborted.done():
+                return
+            try:
+                on_event(*args)
+            except BaseException as e:
+                aborted.set_exception(e)
+
+        call.waiters += 1
+        try:
+            if on_event is not None:
+                for args in call.events:
+                    listener(args)
+                call.listeners.append(listener)
+            await asyncio.wait({call.task, aborted}, return_when=asyncio.FIRST_COMPLETED)
+            if aborted.done():
+                return aborted.result()
+            return call.task.result()
+        finally:
+            if listener in call.listeners:
+                call.listeners.remove(listener)
+            call.waiters -= 1
+            if not call.waiters and not call.task.done():
+                # Unregister now, not in the done callback: a caller arriving before the
+                # cancellation lands must start a new task instead of joining this one
+                if calls.get(key) is call:
+                    del calls[key]
+                call.task.cancel()
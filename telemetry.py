@@ -0,0 +1,308 @@
+import contextvars
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ------------------------------------------------------
+# Settings
+# ------------------------------------------------------
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "1") != "0"
+
+# Metrics cover every call; only this fraction of traces is written out as JSON span logs
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+
+# JSON span logs go to this file (appended), else to stderr
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH")
+
+# Port for the Prometheus text endpoint (0 = do not serve)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+# ------------------------------------------------------
+# Metrics registry (Prometheus text format)
+# ------------------------------------------------------
+def _label_key(labels: dict):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    """Thread-safe counters and fixed-bucket histograms."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            hist[0][index] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition of everything recorded so far."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h[0]), h[1], h[2])) for key, h in self._histograms.items())
+
+        lines = []
+        last = None
+        for (name, labels), value in counters:
+            if name != last:
+                lines.append(f"# TYPE {name} counter")
+                last = name
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), (counts, total, count) in histograms:
+            if name != last:
+                lines.append(f"# TYPE {name} histogram")
+                last = name
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+# ------------------------------------------------------
+# Structured JSON span logs
+# ------------------------------------------------------
+_log_lock = threading.Lock()
+_log_file = None
+
+
+def _emit(record: dict):
+    global _log_file
+    line = json.dumps(record, default=str)
+    with _log_lock:
+        if TRACE_LOG_PATH and _log_file is None:
+            _log_file = open(TRACE_LOG_PATH, "a", encoding="utf-8")
+        stream = _log_file or sys.stderr
+        stream.write(line + "\n")
+        stream.flush()
+
+
+# ------------------------------------------------------
+# Spans
+# ------------------------------------------------------
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled", "attrs")
+
+    def __init__(self, name, trace_id, parent_id, sampled, attrs):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        """Attach attributes (e.g. intent, cache hit) to the span's log record."""
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    sampled = False
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span():
+    return _current_span.get()
+
+
+def _new_span(name: str, attrs: dict) -> Span:
+    parent = _current_span.get()
+    if parent is None:
+        return Span(name, uuid.uuid4().hex, None, random.random() < TRACE_SAMPLE_RATE, attrs)
+    return Span(name, parent.trace_id, parent.span_id, parent.sampled, attrs)
+
+
+def _finish(span_obj: Span, duration: float, status: str):
+    metrics.observe("stage_duration_seconds", duration, stage=span_obj.name, status=status)
+    if span_obj.sampled:
+        _emit({
+            "ts": round(time.time(), 3),
+            "trace_id": span_obj.trace_id,
+            "span_id": span_obj.span_id,
+            "parent_id": span_obj.parent_id,
+            "span": span_obj.name,
+            "duration_ms": round(duration * 1000, 3),
+            "status": status,
+            **span_obj.attrs,
+        })
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time one pipeline stage: `with span("search", company=c) as s: ...`.
+
+    Nests under the current span (or starts a new trace) and records
+    stage_duration_seconds{stage=name}. Not for use inside generators; see
+    record_llm_call for streamed work.
+    """
+    if not TELEMETRY_ENABLED:
+        yield NULL_SPAN
+        return
+
+    span_obj = _new_span(name, attrs)
+    token = _current_span.set(span_obj)
+    status = "ok"
+    start = time.perf_counter()
+    try:
+        yield span_obj
+    except BaseException as e:
+        status = "error"
+        span_obj.attrs["error"] = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _current_span.reset(token)
+        _finish(span_obj, duration, status)
+
+
+def propagate(fn):
+    """Bind fn to a copy of the caller's context so spans in pool threads join the caller's trace."""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+# ------------------------------------------------------
+# LLM calls
+# ------------------------------------------------------
+def usage_tokens(usage):
+    """(prompt_tokens, completion_tokens) from a Groq/OpenAI usage object or dict (None if absent)."""
+    if usage is None:
+        return None, None
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+
+def record_llm_call(model: str, duration: float, ttft: float = None, prompt_tokens: int = None,
+                    completion_tokens: int = None, stream: bool = False, cached: bool = False,
+                    status: str = "ok", task: str = None, **attrs):
+    """Record one completion: latency, time to first token and token usage."""
+    if not TELEMETRY_ENABLED:
+        return
+    source = "cache" if cached else "groq"
+    metrics.inc("llm_requests_total", model=model, source=source, status=status, task=task or "other")
+    metrics.observe("stage_duration_seconds", duration, stage="llm", status=status)
+    if not cached:
+        metrics.observe("llm_request_duration_seconds", duration, model=model, stream=str(stream).lower())
+        if ttft is not None:
+            metrics.observe("llm_time_to_first_token_seconds", ttft, model=model, stream=str(stream).lower())
+    if prompt_tokens:
+        metrics.inc("llm_tokens_total", prompt_tokens, model=model, kind="prompt")
+    if completion_tokens:
+        metrics.inc("llm_tokens_total", completion_tokens, model=model, kind="completion")
+
+    parent = _current_span.get()
+    if parent is not None and parent.sampled:
+        _emit({
+            "ts": round(time.time(), 3),
+            "trace_id": parent.trace_id,
+            "span_id": uuid.uuid4().hex[:16],
+            "parent_id": parent.span_id,
+            "span": "llm",
+            "duration_ms": round(duration * 1000, 3),
+            "status": status,
+            "model": model,
+            "task": task,
+            "stream": stream,
+            "cached": cached,
+            "ttft_ms": round(ttft * 1000, 3) if ttft is not None else None,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            **attrs,
+        })
+
+
+# ------------------------------------------------------
+# /metrics endpoint
+# ------------------------------------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = None, host: str = "0.0.0.0"):
+    """Serve GET /metrics from a daemon thread. Idempotent, so Streamlit reruns reuse one server."""
+    global _metrics_server
+    port = METRICS_PORT if port is None else port
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            try:
+                _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                print(f"Metrics endpoint not started on port {port}: {e}")
+                return None
+            _metrics_server.daemon_threads = True
+            threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+    return _metrics_server
@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import agent
+from plan import ROLE_DEPENDENT_SECTIONS, SECTION_TITLES, AccountPlan
+from ratelimit import get_limiter
+
+
+def make_plan():
+    return AccountPlan({title: f"<p>{title} facts</p>" for title in SECTION_TITLES},
+                       company="Acme", user_context="general")
+
+
+def fake_sections(monkeypatch, delay=0.05):
+    async def generate_role_section_async(title, company, user_context, context_text):
+        await asyncio.sleep(delay)
+        return f"<p>{title} for {user_context}</p>"
+
+    monkeypatch.setattr(agent, "generate_role_section_async", generate_role_section_async)
+
+
+def test_role_switch_survives_failed_summary(monkeypatch):
+    monkeypatch.setattr(agent, "ROLE_SWITCH_SUMMARY", True)
+    fake_sections(monkeypatch)
+
+    async def provide_context_specific_summary_async(plan, new_context):
+        raise RuntimeError("summary model unavailable")
+
+    monkeypatch.setattr(agent, "provide_context_specific_summary_async", provide_context_specific_summary_async)
+    new_plan, summary = asyncio.run(agent.switch_plan_context_async(make_plan(), "sales"))
+    assert summary is None
+    for title in ROLE_DEPENDENT_SECTIONS:
+        assert new_plan.get(title) == f"<p>{title} for sales</p>"
+
+
+def test_role_switch_preview_arrives_before_sections(monkeypatch):
+    monkeypatch.setattr(agent, "ROLE_SWITCH_SUMMARY", True)
+    fake_sections(monkeypatch)
+
+    async def provide_context_specific_summary_async(plan, new_context):
+        return f"{new_context} preview"
+
+    monkeypatch.setattr(agent, "provide_context_specific_summary_async", provide_context_specific_summary_async)
+    events = []
+    new_plan, summary = asyncio.run(agent.switch_plan_context_async(
+        make_plan(), "sales",
+        on_section=lambda title, body: events.append(title),
+        on_summary=lambda text: events.append(text),
+    ))
+    assert summary == "sales preview"
+    first_rewritten = min(events.index(title) for title in ROLE_DEPENDENT_SECTIONS)
+    assert events.index("sales preview") < first_rewritten
+
+
+def test_warm_plan_lookup_runs_off_the_event_loop(monkeypatch):
+    lookups = []
+
+    class Store:
+        def get(self, company, user_context):
+            lookups.append(threading.current_thread())
+            return make_plan().to_dict()
+
+    monkeypatch.setattr(agent, "get_plan_store", Store)
+    route = SimpleNamespace(company="Acme", context="general")
+
+    async def main():
+        loop_thread = threading.current_thread()
+        reply, new_plan, _ = await agent._handle_generate_plan(route, "plan for Acme", None, None)
+        return loop_thread, new_plan
+
+    loop_thread, new_plan = asyncio.run(main())
+    assert new_plan.sections() == make_plan().sections()
+    assert lookups and lookups[0] is not loop_thread
+
+
+def test_failed_news_search_is_reported_not_up_to_date(monkeypatch):
+    def search_news(company):
+        raise RuntimeError("SerpAPI HTTP 503")
+
+    monkeypatch.setattr(agent, "search_news", search_news)
+    monkeypatch.setattr(agent, "grounding_enabled", lambda: True)
+    plan = make_plan()
+    plan.news_links = ["https://example.com/old"]
+    version = plan.version
+    route = SimpleNamespace(section="Recent News", context="sales")
+
+    reply, new_plan, _ = asyncio.run(agent._handle_update_section(route, "update the news", plan, None))
+    assert reply == "Couldn't refresh news: SerpAPI HTTP 503"
+    assert new_plan.version == version
+    assert new_plan.news_links == ["https://example.com/old"]
+
+
+def test_empty_generation_is_reported_as_failure(monkeypatch):
+    async def generate_plan_async(company, user_context, on_section=None):
+        return "   "
+
+    monkeypatch.setattr(agent, "generate_plan_async", generate_plan_async)
+    monkeypatch.setattr(agent, "warm_plan", lambda company, user_context: None)
+    route = SimpleNamespace(company="Acme", context="general")
+
+    reply, new_plan, _ = asyncio.run(agent._handle_generate_plan(route, "plan for Acme", None, None))
+    assert new_plan is None
+    assert reply.startswith("Sorry, I couldn't generate an account plan for Acme")
+
+
+class SlowGroq:
+    """Stands in for AsyncGroq: every completion outlasts the caller's timeout."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(10)
+
+
+def test_completion_timeout_shrinks_limiter_window(monkeypatch):
+    monkeypatch.setattr(agent, "_groq", SlowGroq)
+    limiter = get_limiter("groq", "test-model")
+    limiter.limit = 8.0
+    throttled = limiter.throttled
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(agent._complete_once("test-model", "prompt", 10, "section", timeout=0.05))
+    assert limiter.throttled == throttled + 1
+    assert limiter.limit == 4.0
+    assert limiter.in_flight == 0
+
+
+class FakeGroq:
+    """Stands in for AsyncGroq: `behaviours[model]` lists, per call, seconds to wait and then a reply or an error."""
+
+    def __init__(self, behaviours):
+        self.behaviours = behaviours
+        self.calls = []
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, model, **kwargs):
+        script = self.behaviours[model]
+        delay, outcome = script[min(sum(m == model for m in self.calls), len(script) - 1)]
+        self.calls.append(model)
+        await asyncio.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=outcome))], usage=None)
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+def fake_groq(monkeypatch, behaviours, attempts, deadline=5.0):
+    groq = FakeGroq(behaviours)
+    monkeypatch.setattr(agent, "_groq", lambda: groq)
+    monkeypatch.setattr(agent, "route", lambda task: attempts)
+    monkeypatch.setattr(agent, "task_deadline", lambda task: deadline)
+    return groq
+
+
+def test_complete_falls_back_when_primary_times_out(monkeypatch):
+    groq = fake_groq(monkeypatch, {"primary": [(10, "late")], "backup": [(0, "backup answer")]},
+                     [("primary", 0.05), ("backup", 1.0)])
+    assert asyncio.run(agent._complete("prompt", 10, task="section")) == "backup answer"
+    assert groq.calls == ["primary", "backup"]
+
+
+def test_complete_retries_throttled_call_on_same_model(monkeypatch):
+    groq = fake_groq(monkeypatch, {"primary": [(0, Throttled("slow down")), (0, "answer")], "backup": [(0, "backup")]},
+                     [("primary", 1.0), ("backup", 1.0)])
+    assert asyncio.run(agent._complete("prompt", 10, task="section")) == "answer"
+    assert groq.calls == ["primary", "primary"]
+
+
+def test_complete_raises_once_deadline_passes(monkeypatch):
+    fake_groq(monkeypatch, {"primary": [(10, "late")], "backup": [(10, "late")]},
+              [("primary", 1.0), ("backup", 1.0)], deadline=0.2)
+    began = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        asyncio.run(agent._complete("prompt", 10, task="section"))
+    assert time.perf_counter() - began < 0.5
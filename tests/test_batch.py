@@ -0,0 +1,53 @@
+import json
+
+import batch
+
+
+def test_fresh_job_bypasses_search_and_response_caches(monkeypatch):
+    calls = {}
+
+    def search_company(company, force_refresh=False):
+        calls["search"] = force_refresh
+        return []
+
+    def generate_plan(company, user_context, force_refresh=False, evidence=None):
+        calls["generate"] = force_refresh
+        return "<div class='section-title'>Company Overview</div>\n<p>Acme</p>"
+
+    monkeypatch.setattr(batch, "grounding_enabled", lambda: True)
+    monkeypatch.setattr(batch, "search_company", search_company)
+    monkeypatch.setattr(batch, "generate_plan", generate_plan)
+
+    assert batch.run_job({"company": "Acme", "user_context": "sales"}, fresh=True)["status"] == "ok"
+    assert calls == {"search": True, "generate": True}
+    batch.run_job({"company": "Acme", "user_context": "sales"})
+    assert calls == {"search": False, "generate": False}
+
+
+def test_resume_drops_half_written_last_line(monkeypatch, tmp_path):
+    out = tmp_path / "plans.jsonl"
+    done = {"company": "Acme", "user_context": "sales", "status": "ok", "plan": "p", "timings": {}}
+    out.write_text(json.dumps(done) + "\n" + '{"company": "Globex", "user_con')
+
+    def run_job(job, fresh=False):
+        return {"company": job["company"], "user_context": job["user_context"], "status": "ok", "plan": "p",
+                "timings": {"total": 0.1}, "generated_at": "now"}
+
+    monkeypatch.setattr(batch, "run_job", run_job)
+    jobs = [{"company": "Acme", "user_context": "sales"}, {"company": "Globex", "user_context": "sales"}]
+    summary = batch.run_batch(jobs, str(out), progress_every=0)
+
+    records = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [record["company"] for record in records] == ["Acme", "Globex"]
+    assert summary["skipped"] == 1
+
+
+def test_drop_partial_line_keeps_complete_files(tmp_path):
+    out = tmp_path / "plans.jsonl"
+    out.write_text('{"a": 1}\n{"b": 2}\n')
+    batch.drop_partial_line(str(out))
+    assert out.read_text() == '{"a": 1}\n{"b": 2}\n'
+
+    out.write_text('{"a": 1')
+    batch.drop_partial_line(str(out))
+    assert out.read_text() == ""
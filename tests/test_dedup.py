@@ -0,0 +1,18 @@
+from dedup import NearDuplicateFilter
+
+
+def test_near_duplicate_is_detected():
+    near = NearDuplicateFilter(0.7)
+    story = "acme shares rose sharply after the company reported record quarterly revenue and raised its outlook"
+    assert not near.seen(story)
+    assert near.seen(story + " - Reuters")
+    assert not near.seen("globex announced a new chief executive officer following a long search process")
+
+
+def test_buckets_keep_only_recent_texts():
+    near = NearDuplicateFilter(0.7, bucket_limit=4)
+    # Every text shares "story", so short texts pile into the same densified band buckets
+    for i in range(200):
+        near.seen(f"story {i} alpha{i} beta{i} gamma{i}")
+    assert max(len(bucket) for buckets in near.buckets for bucket in buckets.values()) <= 4
+    assert near.seen("story 199 alpha199 beta199 gamma199")
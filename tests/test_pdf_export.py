@@ -0,0 +1,63 @@
+import time
+
+from pdf_export import PdfCache, PlanFlowableBuilder
+
+
+def failing_renderer(calls):
+    def render(content):
+        calls.append(content)
+        return None
+
+    return render
+
+
+def test_failed_build_is_not_retried_within_ttl():
+    calls = []
+    cache = PdfCache(renderer=failing_renderer(calls), failure_ttl=60)
+    assert cache.get_pdf("<p>plan</p>") is None
+    assert cache.get_pdf("<p>plan</p>") is None
+    assert calls == ["<p>plan</p>"]
+    assert cache.has_failed("<p>plan</p>")
+
+
+def test_failed_build_is_retried_after_ttl():
+    calls = []
+    cache = PdfCache(renderer=failing_renderer(calls), failure_ttl=0.01)
+    cache.get_pdf("<p>plan</p>")
+    time.sleep(0.02)
+    assert not cache.has_failed("<p>plan</p>")
+    cache.get_pdf("<p>plan</p>")
+    assert len(calls) == 2
+
+
+def test_background_build_that_raises_is_no_longer_pending():
+    def render(content):
+        raise RuntimeError("bad markup")
+
+    cache = PdfCache(background=True, renderer=render, failure_ttl=60)
+    assert cache.get_pdf("<p>plan</p>") is None
+    deadline = time.monotonic() + 5
+    while cache.is_pending("<p>plan</p>") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not cache.is_pending("<p>plan</p>")
+    assert cache.has_failed("<p>plan</p>")
+    assert cache.get_pdf("<p>plan</p>") is None
+    assert cache.builds == 1
+
+
+def build(html):
+    builder = PlanFlowableBuilder()
+    builder.feed(html)
+    return builder.finish()
+
+
+def test_unstyled_paragraph_is_one_plain_run():
+    (para,) = build("<p>Plain <b> </b>text &amp; more<em></em></p>")
+    assert para.text == "Plain text &amp; more"
+    assert len(para.frags) == 1
+
+
+def test_styled_paragraph_keeps_tags_and_merges_adjacent_runs():
+    (para,) = build("<li><strong>Lead</strong><strong> in</strong> rest</li>")
+    assert para.text == "<b>Lead in</b> rest"
+    assert len(para.frags) == 2
@@ -0,0 +1,38 @@
+from plan import PREAMBLE_TITLE, AccountPlan, parse_sections
+
+
+def test_double_quoted_headings_are_parsed():
+    plan = AccountPlan.from_html('<div class="section-title">Company Overview</div>\n<p>Acme makes anvils.</p>')
+    assert plan
+    assert plan.get("Company Overview") == "<p>Acme makes anvils.</p>"
+
+
+def test_unrecognized_and_leading_content_is_kept():
+    html = (
+        "<p>Prepared for the sales team.</p>\n"
+        "<div class='section-title'>Company Overview</div>\n<p>Acme makes anvils.</p>\n"
+        "<div class='section-title'>Products & Services</div>\n<ul><li>Anvils</li></ul>\n"
+    )
+    sections = parse_sections(html)
+    assert list(sections) == [PREAMBLE_TITLE, "Company Overview", "Products & Services"]
+    assert sections[PREAMBLE_TITLE] == "<p>Prepared for the sales team.</p>"
+    assert sections["Products & Services"] == "<ul><li>Anvils</li></ul>"
+
+    rendered = AccountPlan.from_html(html).to_html()
+    assert rendered.startswith("<p>Prepared for the sales team.</p>")
+    assert "<div class='section-title'>Products & Services</div>\n<ul><li>Anvils</li></ul>" in rendered
+
+
+def test_plan_without_headings_is_kept_raw():
+    plan = AccountPlan.from_html("<p>Acme makes anvils.</p>")
+    assert plan.to_html().strip() == "<p>Acme makes anvils.</p>"
+
+
+def test_empty_plan_is_false():
+    assert not AccountPlan.from_html("  \n")
+
+
+def test_update_keeps_extra_sections_after_canonical_ones():
+    plan = AccountPlan({"Notes": "<p>n</p>", "Competitors": "<p>c</p>"})
+    plan.update_section("Company Overview", "<p>o</p>")
+    assert list(plan.sections()) == ["Company Overview", "Competitors", "Notes"]
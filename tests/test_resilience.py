@@ -0,0 +1,88 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import resilience
+from models import ModelStats
+from resilience import hedged, retry_delay
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+
+
+def test_retry_delay_only_for_retryable_errors():
+    assert retry_delay(ProviderError(400), 0) is None
+    assert retry_delay(ValueError("bad prompt"), 0) is None
+    assert 0 <= retry_delay(ProviderError(429), 0) <= resilience.RETRY_BASE_DELAY
+    assert retry_delay(ProviderError(503), 1) <= resilience.RETRY_BASE_DELAY * 2
+    assert retry_delay(ConnectionError("reset"), 0) is not None
+
+
+def test_retry_delay_stops_after_retries_and_honours_retry_after():
+    assert retry_delay(ProviderError(429), 2, retries=2) is None
+    assert retry_delay(ProviderError(429, retry_after="3"), 0) >= 3.0
+
+
+def attempts(*behaviours):
+    """start_attempt() returning coroutines that sleep, then return or raise, in the given order."""
+    started = []
+
+    def start():
+        delay, outcome = behaviours[len(started)]
+        started.append(outcome)
+
+        async def run():
+            await asyncio.sleep(delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        return run()
+
+    return start, started
+
+
+def test_hedged_returns_fast_attempt_without_hedging():
+    start, started = attempts((0.0, "first"))
+    assert asyncio.run(hedged(start, hedge_after=0.1)) == "first"
+    assert started == ["first"]
+
+
+def test_hedge_wins_when_first_attempt_is_slow():
+    start, started = attempts((1.0, "slow"), (0.0, "hedge"))
+    began = time.perf_counter()
+    assert asyncio.run(hedged(start, hedge_after=0.05)) == "hedge"
+    assert time.perf_counter() - began < 0.5
+    assert started == ["slow", "hedge"]
+
+
+def test_hedged_fails_only_when_every_attempt_fails():
+    start, _ = attempts((0.1, RuntimeError("first")), (0.0, "hedge"))
+    assert asyncio.run(hedged(start, hedge_after=0.05)) == "hedge"
+
+    start, _ = attempts((0.1, RuntimeError("first")), (0.15, RuntimeError("second")))
+    with pytest.raises(RuntimeError, match="second"):
+        asyncio.run(hedged(start, hedge_after=0.05))
+
+
+def test_no_hedge_without_capacity():
+    start, started = attempts((0.1, "slow"), (0.0, "hedge"))
+    assert asyncio.run(hedged(start, hedge_after=0.01, can_hedge=lambda: False)) == "slow"
+    assert started == ["slow"]
+
+
+def test_hedge_delay_uses_the_task_window(monkeypatch):
+    stats = ModelStats()
+    for _ in range(30):
+        stats.record("heavy", 20.0, task="plan")
+        stats.record("heavy", 2.0, task="section")
+    monkeypatch.setattr(resilience, "model_stats", stats)
+    assert resilience.hedge_delay("heavy", "section") == pytest.approx(2.0)
+    assert resilience.hedge_delay("heavy", "plan") == pytest.approx(20.0)
+    assert resilience.hedge_delay("heavy", "followup") is None
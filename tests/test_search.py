@@ -0,0 +1,89 @@
+import httpx
+import pytest
+
+import search
+import transport
+from ratelimit import get_limiter
+
+
+def serve(monkeypatch, handler):
+    """Route the shared SerpAPI client to an in-process handler."""
+    monkeypatch.setenv("SERPAPI_KEY", "test-key")
+    monkeypatch.setitem(transport._clients, "serpapi", httpx.Client(transport=httpx.MockTransport(handler)))
+
+
+def test_429_shrinks_serpapi_limiter_window(monkeypatch):
+    serve(monkeypatch, lambda request: httpx.Response(429, json={"error": "Too many requests"}))
+    limiter = get_limiter("serpapi")
+    # Start above the floor so a halving is observable
+    monkeypatch.setattr(limiter, "limit", 4.0)
+    throttled = limiter.throttled
+
+    with pytest.raises(search.SearchError) as raised:
+        search.perform_search("Acme overview", use_cache=False)
+
+    assert raised.value.status_code == 429
+    assert "test-key" not in str(raised.value)
+    assert limiter.throttled == throttled + 1
+    assert limiter.limit == 2.0
+
+
+@pytest.mark.parametrize("concurrent", [True, False])
+def test_failed_sub_query_keeps_other_results(monkeypatch, concurrent):
+    def handler(request):
+        query = request.url.params["q"]
+        if "competitors" in query:
+            return httpx.Response(500, json={"error": "upstream failure"})
+        return httpx.Response(200, json={"organic_results": [
+            {"title": f"{query} result", "snippet": f"About {query}", "link": f"https://example.com/{hash(query)}"},
+        ]})
+
+    serve(monkeypatch, handler)
+    monkeypatch.setattr(search, "SINGLE_FLIGHT_ENABLED", False)
+    monkeypatch.setattr(search, "get_search_cache", lambda: None)
+    timings = {}
+
+    items = search.search_company("Acme", concurrent=concurrent, timings=timings)
+
+    assert {item["source"] for item in items} == {"overview", "products", "news"}
+    assert timings["competitors"] is None
+
+
+def test_search_company_raises_when_every_sub_query_fails(monkeypatch):
+    serve(monkeypatch, lambda request: httpx.Response(401, json={"error": "Invalid API key"}))
+    monkeypatch.setattr(search, "SINGLE_FLIGHT_ENABLED", False)
+    monkeypatch.setattr(search, "get_search_cache", lambda: None)
+
+    with pytest.raises(search.SearchError):
+        search.search_company("Acme")
+
+
+class MemoryCache:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, params):
+        return self.entries.get(repr(sorted(params.items())))
+
+    def set(self, params, items):
+        self.entries[repr(sorted(params.items()))] = items
+
+
+def test_force_refresh_skips_cache_lookup_but_stores_results(monkeypatch):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"organic_results": [
+            {"title": "Acme", "snippet": f"version {len(requests)}", "link": "https://example.com/acme"},
+        ]})
+
+    serve(monkeypatch, handler)
+    cache = MemoryCache()
+    monkeypatch.setattr(search, "get_search_cache", lambda: cache)
+
+    assert search.perform_search("Acme news")[0]["snippet"] == "version 1"
+    assert search.perform_search("Acme news")[0]["snippet"] == "version 1"
+    assert search.perform_search("Acme news", force_refresh=True)[0]["snippet"] == "version 2"
+    assert search.perform_search("Acme news")[0]["snippet"] == "version 2"
+    assert len(requests) == 2
@@ -0,0 +1,38 @@
+import asyncio
+
+from singleflight import AsyncSingleFlight
+
+
+def test_rerequest_after_cancel_starts_a_fresh_call():
+    flights = AsyncSingleFlight("test")
+    started = []
+
+    async def work(emit):
+        started.append(len(started))
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0)  # the last waiter has left; the shared task is being cancelled
+        return await flights.do("key", work)
+
+    assert asyncio.run(main()) == "done"
+    assert started == [0, 1]
+
+
+def test_followers_share_one_call():
+    flights = AsyncSingleFlight("test")
+    calls = []
+
+    async def work(emit):
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        return await asyncio.gather(*(flights.do("key", work) for _ in range(3)))
+
+    assert asyncio.run(main()) == [1, 1, 1]
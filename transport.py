@@ -0,0 +1,142 @@
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+
+import httpx
+
+from telemetry import metrics
+
+# ------------------------------------------------------
+# Shared HTTP connection pools (overridable via env)
+# ------------------------------------------------------
+# Connections per provider pool; idle ones are kept alive for reuse up to HTTP_KEEPALIVE_EXPIRY seconds
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+# Read/write timeout; callers also bound whole calls (SEARCH_TIMEOUT, LLM deadlines)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+# HTTP/2 (one multiplexed connection per host) when the server offers it over TLS and h2 is installed
+HTTP2_ENABLED = os.getenv("HTTP2", "1") != "0" and importlib.util.find_spec("h2") is not None
+
+_clients = {}
+_async_clients = weakref.WeakKeyDictionary()  # loop -> {provider: httpx.AsyncClient}
+_lock = threading.Lock()
+_stats = {}
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_POOL_SIZE,
+        max_keepalive_connections=HTTP_POOL_SIZE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+
+# ------------------------------------------------------
+# Connection reuse accounting (httpcore "trace" request extension)
+# ------------------------------------------------------
+class _ConnectionTrace:
+    """Notes whether a request had to open (and TLS-handshake) a new connection."""
+
+    def __init__(self):
+        self.connected = False
+        self.handshake = False
+
+    def __call__(self, event: str, info: dict):
+        if event == "connection.connect_tcp.complete":
+            self.connected = True
+        elif event == "connection.start_tls.complete":
+            self.handshake = True
+
+
+class _AsyncConnectionTrace(_ConnectionTrace):
+    async def __call__(self, event: str, info: dict):
+        super().__call__(event, info)
+
+
+def _count(provider: str, response: httpx.Response):
+    trace = response.request.extensions.get("trace")
+    if not isinstance(trace, _ConnectionTrace):
+        return
+    connection = "new" if trace.connected else "reused"
+    metrics.inc("upstream_requests_total", provider=provider, connection=connection,
+                http_version=response.http_version)
+    if trace.handshake:
+        metrics.inc("upstream_tls_handshakes_total", provider=provider)
+    with _lock:
+        entry = _stats.setdefault(provider, {"requests": 0, "new_connections": 0, "tls_handshakes": 0, "http2": 0})
+        entry["requests"] += 1
+        entry["new_connections"] += trace.connected
+        entry["tls_handshakes"] += trace.handshake
+        entry["http2"] += response.http_version == "HTTP/2"
+
+
+def _hooks(provider: str):
+    def on_request(request):
+        request.extensions["trace"] = _ConnectionTrace()
+
+    def on_response(response):
+        _count(provider, response)
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def _async_hooks(provider: str):
+    async def on_request(request):
+        request.extensions["trace"] = _AsyncConnectionTrace()
+
+    async def on_response(response):
+        _count(provider, response)
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+# ------------------------------------------------------
+# Clients
+# ------------------------------------------------------
+def client(provider: str) -> httpx.Client:
+    """Process-wide keep-alive client for `provider`, shared by every thread."""
+    with _lock:
+        http = _clients.get(provider)
+        if http is None:
+            http = _clients[provider] = httpx.Client(
+                http2=HTTP2_ENABLED, limits=_limits(), timeout=_timeout(), event_hooks=_hooks(provider),
+            )
+        return http
+
+
+def async_client(provider: str) -> httpx.AsyncClient:
+    """Keep-alive client for `provider` bound to the running loop; async pools must not cross loops."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        http = clients.get(provider)
+        if http is None:
+            http = clients[provider] = httpx.AsyncClient(
+                http2=HTTP2_ENABLED, limits=_limits(), timeout=_timeout(), event_hooks=_async_hooks(provider),
+            )
+        return http
+
+
+def pool_stats() -> dict:
+    """{provider: request/connection counts and the share of requests that reused a connection}."""
+    with _lock:
+        stats = {provider: dict(entry) for provider, entry in _stats.items()}
+    for entry in stats.values():
+        entry["reuse_ratio"] = 1 - entry["new_connections"] / entry["requests"] if entry["requests"] else None
+    return {"pool_size": HTTP_POOL_SIZE, "http2": HTTP2_ENABLED, "providers": stats}
+
+
+def close():
+    """Close the shared sync clients; async clients are dropped with their event loops."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for http in clients:
+        http.close()
@@ -1,5 +1,6 @@
 
 # utils.py
+import math
 import re
 from datetime import datetime
 
@@ -22,3 +23,23 @@ def extract_company_name(text: str) -> str | None:
         return match.group(1).strip().title()
     return None
 
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile (pct in 0-100) of a list of numbers; 0.0 if empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def format_age(seconds: float) -> str:
+    """Human-readable age, e.g. "just now", "5 min ago", "3 h ago", "2 days ago"."""
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min ago"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} h ago"
+    days = int(seconds // 86400)
+    return f"{days} day{'s' if days > 1 else ''} ago"